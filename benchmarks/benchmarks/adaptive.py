@@ -0,0 +1,99 @@
+import math
+from dataclasses import dataclass, field
+from typing import Callable
+
+from benchmarks.benchmark import Benchmark, BenchmarkResult
+from benchmarks.measurement import CoreSlot
+from config.options import ConfigOptions
+from util.stats import count_leading_outliers, mean_confidence_interval
+
+
+@dataclass
+class MeasurementSummary:
+    n_runs: int
+    n_warmup: int
+    mean: float
+    ci_half_width: float
+    confidence: float
+
+    @property
+    def relative_ci_half_width(self) -> float:
+        return self.ci_half_width / abs(self.mean) if self.mean else math.inf
+
+    @classmethod
+    def from_values(cls, values: list[float], n_warmup: int = 0, confidence: float = 0.95) -> "MeasurementSummary":
+        mean, half_width = mean_confidence_interval(values[n_warmup:], confidence)
+        return cls(n_runs=len(values), n_warmup=n_warmup, mean=mean, ci_half_width=half_width, confidence=confidence)
+
+
+@dataclass
+class StoppingRule:
+    """
+    Decides when enough runs have been measured: once the confidence
+    interval of the mean of the non-warmup runs is at most
+    `target_relative_ci` of the mean wide on either side, with at least
+    `min_runs` and at most `max_runs` runs in total. Leading runs that are
+    outliers with respect to the later runs are treated as warmup.
+    """
+    min_runs: int = field(default=3)
+    max_runs: int = field(default=30)
+    target_relative_ci: float = field(default=0.01)
+    confidence: float = field(default=0.95)
+    max_warmup_runs: int = field(default=3)
+    outlier_threshold: float = field(default=3.5)
+
+    def __post_init__(self):
+        if self.min_runs < 2:
+            raise ValueError(f"Adaptive measurement needs at least 2 runs to estimate a confidence interval, got min_runs={self.min_runs}")
+        if self.max_runs < self.min_runs:
+            raise ValueError(f"max_runs ({self.max_runs}) must not be smaller than min_runs ({self.min_runs})")
+
+    @classmethod
+    def from_options(cls, options: ConfigOptions) -> "StoppingRule":
+        return cls(
+            min_runs=options.adaptive_min_runs,
+            max_runs=options.adaptive_max_runs,
+            target_relative_ci=options.adaptive_target_relative_ci,
+            confidence=options.adaptive_confidence,
+        )
+
+    def count_warmup(self, values: list[float]) -> int:
+        return count_leading_outliers(values, self.outlier_threshold, self.max_warmup_runs)
+
+    def summarize(self, values: list[float]) -> MeasurementSummary:
+        return MeasurementSummary.from_values(values, self.count_warmup(values), self.confidence)
+
+    def should_stop(self, values: list[float]) -> bool:
+        if len(values) >= self.max_runs:
+            return True
+
+        summary = self.summarize(values)
+        if summary.n_runs - summary.n_warmup < self.min_runs:
+            return False
+
+        return summary.relative_ci_half_width <= self.target_relative_ci
+
+
+def run_benchmark(benchmark: Benchmark, stopping_rule: StoppingRule | None = None, slot: CoreSlot | None = None,
+                  on_run: Callable[[BenchmarkResult], None] = lambda run: None) -> list[BenchmarkResult]:
+    """
+    Measure the benchmark `n_runs` times, or until the stopping rule is met,
+    marking the runs it considers warmup. `on_run` sees every run as soon as
+    it finishes.
+    """
+    runs = []
+
+    def measure() -> None:
+        runs.append(benchmark.run(slot=slot))
+        on_run(runs[-1])
+
+    if stopping_rule is None or benchmark.n_runs == 0:
+        for _ in range(benchmark.n_runs):
+            measure()
+    else:
+        while not runs or not stopping_rule.should_stop([r.result for r in runs]):
+            measure()
+        for run in runs[:stopping_rule.count_warmup([r.result for r in runs])]:
+            run.warmup = True
+
+    return runs
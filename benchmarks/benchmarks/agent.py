@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import cache
+from pathlib import Path
+
+from benchmarks.benchmark import Benchmark
+from benchmarks.build_cache import BuildCache
+from util.color import ANSIColorCode as C
+from util.hashing import hash_json, hash_path
+
+# Keys that identify an entry of a configuration list, e.g. a type in
+# reflect-config.json or a method of that type
+IDENTITY_KEYS = ("name", "type", "pattern", "module", "bundle", "interfaces", "parameterTypes", "condition")
+ARCHIVE_NAME = "agent-config.tar"
+
+
+class AgentOutcome(Enum):
+    UP_TO_DATE = "up to date"
+    RESTORED = "restored from cache"
+    COLLECTED = "collected"
+    NOT_NEEDED = "not needed"
+
+
+@cache
+def _get_java_version(vm_binary: str) -> str:
+    return subprocess.check_output([vm_binary, "-version"], text=True, stderr=subprocess.STDOUT).strip()
+
+
+def agent_cache_inputs(benchmark: Benchmark, vm_binary: str) -> dict | None:
+    """
+    Everything that determines the configuration the agent collects for a
+    benchmark, or None if the benchmark does not use the agent.
+    """
+    inputs = benchmark.agent_cache_inputs()
+    if inputs is None:
+        return None
+
+    return {**inputs, "jvm": _get_java_version(vm_binary), "runs": benchmark.agent_runs}
+
+
+def _identity(entry) -> str:
+    if isinstance(entry, dict) and (keys := [key for key in IDENTITY_KEYS if key in entry]):
+        return json.dumps({key: entry[key] for key in keys}, sort_keys=True)
+
+    return json.dumps(entry, sort_keys=True)
+
+
+def _merge_values(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        merged = dict(a)
+        for key, value in b.items():
+            merged[key] = _merge_values(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(a, list) and isinstance(b, list):
+        merged = {_identity(entry): entry for entry in a}
+        for entry in b:
+            identity = _identity(entry)
+            merged[identity] = _merge_values(merged[identity], entry) if identity in merged else entry
+        return list(merged.values())
+    if isinstance(a, bool) and isinstance(b, bool):
+        return a or b
+
+    return b
+
+
+def merge_agent_configs(config_dirs: list[Path], output_dir: Path) -> None:
+    """
+    Merge the configurations of several agent runs into `output_dir`, so an
+    entry needed by any of the runs is kept. Entries of the JSON files are
+    merged by identity (a type, method or resource pattern), with the flags
+    of the same entry combined; other files are taken from the last run that
+    has them.
+    """
+    files = sorted({path.relative_to(config_dir) for config_dir in config_dirs for path in config_dir.rglob("*") if path.is_file()})
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    for file in files:
+        sources = [config_dir / file for config_dir in config_dirs if (config_dir / file).is_file()]
+        (output_dir / file).parent.mkdir(parents=True, exist_ok=True)
+        if file.suffix != ".json":
+            shutil.copy2(sources[-1], output_dir / file)
+            continue
+
+        merged = None
+        for source in sources:
+            with open(source, "r") as f:
+                content = json.load(f)
+            merged = content if merged is None else _merge_values(merged, content)
+        with open(output_dir / file, "w") as f:
+            json.dump(merged, f, indent=2)
+
+
+def _stamp_path(benchmark: Benchmark) -> Path:
+    return benchmark.config_dir.with_name(f".{benchmark.config_dir.name}.agent-inputs")
+
+
+def _replace_config_dir(benchmark: Benchmark, new_config_dir: Path, key: str) -> None:
+    old_config_dir = benchmark.config_dir.with_name(f"{benchmark.config_dir.name}.old-{os.getpid()}")
+    if benchmark.config_dir.exists():
+        benchmark.config_dir.rename(old_config_dir)
+    new_config_dir.rename(benchmark.config_dir)
+    shutil.rmtree(old_config_dir, ignore_errors=True)
+    _stamp_path(benchmark).write_text(key)
+
+
+def collect_agent_config(benchmark: Benchmark, vm_binary: str, merge_existing: bool = False) -> AgentOutcome:
+    """
+    Bring the agent configuration of a benchmark up to date with its jar, the
+    JVM and its arguments: keep it if none of these changed since it was
+    collected, restore it from the build cache if it was collected before,
+    or else run the agent once per set of arguments and merge the results.
+    With `merge_existing`, the configuration being replaced is merged in as
+    well, and is part of the cache key, since the result depends on it. A
+    failing agent run raises and leaves the current configuration in place.
+    """
+    inputs = agent_cache_inputs(benchmark, vm_binary)
+    if inputs is None:
+        return AgentOutcome.NOT_NEEDED
+
+    key = hash_json(inputs)
+    stamp_path = _stamp_path(benchmark)
+    if benchmark.config_dir.is_dir() and stamp_path.exists() and stamp_path.read_text() == key:
+        return AgentOutcome.UP_TO_DATE
+
+    merge_existing = merge_existing and benchmark.config_dir.is_dir()
+    cache_inputs = {**inputs, "existing_config": hash_path(benchmark.config_dir)} if merge_existing else inputs
+    cache_key = hash_json(cache_inputs)
+
+    work_dir = benchmark.config_dir.with_name(f"{benchmark.config_dir.name}.agent-{os.getpid()}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+    merged_dir = work_dir / "merged"
+
+    try:
+        cache = BuildCache.for_options(benchmark.options)
+        if cache is not None and cache.restore(cache_key, {ARCHIVE_NAME: work_dir / ARCHIVE_NAME}):
+            with tarfile.open(work_dir / ARCHIVE_NAME, "r") as archive:
+                archive.extractall(merged_dir, filter="data")
+            _replace_config_dir(benchmark, merged_dir, key)
+            return AgentOutcome.RESTORED
+
+        run_dirs = []
+        for i, benchmark_args in enumerate(benchmark.agent_runs):
+            run_dir = work_dir / f"run-{i}"
+            run_dir.mkdir()
+            returncode = benchmark.run_agent(vm_binary, output_dir=run_dir / "config", benchmark_args=benchmark_args, cwd=run_dir)
+            if returncode != 0:
+                raise RuntimeError(f"Agent run {i + 1} of {benchmark.name} failed (exit code {returncode}), see {benchmark.agent_log_path}; keeping the current configuration")
+            run_dirs.append(run_dir / "config")
+
+        if merge_existing:
+            run_dirs.insert(0, benchmark.config_dir)
+        merge_agent_configs(run_dirs, merged_dir)
+
+        if cache is not None:
+            with tarfile.open(work_dir / ARCHIVE_NAME, "w") as archive:
+                archive.add(merged_dir, arcname=".")
+            cache.store(cache_key, {ARCHIVE_NAME: work_dir / ARCHIVE_NAME}, cache_inputs)
+
+        _replace_config_dir(benchmark, merged_dir, key)
+        return AgentOutcome.COLLECTED
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def collect_agent_configs(benchmarks: list[Benchmark], vm_binary: str, max_workers: int | None = None, merge_existing: bool = False) -> dict[str, AgentOutcome | BaseException]:
+    """
+    Collect the agent configurations of all benchmarks concurrently, by
+    default all at once. Returns the outcome, or the error, per benchmark.
+    """
+    outcomes: dict[str, AgentOutcome | BaseException] = {}
+    if not benchmarks:
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(benchmarks), thread_name_prefix="agent") as executor:
+        futures = {benchmark.name: executor.submit(collect_agent_config, benchmark, vm_binary, merge_existing) for benchmark in benchmarks}
+        for name, future in futures.items():
+            try:
+                outcomes[name] = future.result()
+            except Exception as e:
+                outcomes[name] = e
+
+    return outcomes
+
+
+def print_agent_outcomes(outcomes: dict[str, AgentOutcome | BaseException]) -> None:
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, BaseException):
+            print(f"  {C.FAIL}{name}: {outcome}{C.ENDC}")
+        elif outcome != AgentOutcome.NOT_NEEDED:
+            print(f"  {C.GRAY}{name}: agent configuration {outcome.value}{C.ENDC}")
@@ -1,11 +1,13 @@
 from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
+from typing import ClassVar
 import re
 import subprocess
 
 from benchmarks.benchmark import Benchmark, BenchmarkUnit
 from util.color import ANSIColorCode as C
+from util.process import LineMatcher
 from benchmarks.compiler import Compiler
 from benchmarks.optimization_level import OptimizationLevel
 
@@ -14,8 +16,14 @@ from benchmarks.optimization_level import OptimizationLevel
 class BaristaBenchmark(Benchmark):
     context_path: Path = field(default = Path("/data/baristabench"))
     n_runs: int = field(default = 2)
+    warmup_iterations: int | None = field(default = None)
+    measure_iterations: int | None = field(default = None)
     unit: BenchmarkUnit = field(default = BenchmarkUnit.THROUGHPUT, init = False)
 
+    RESULT_PATTERN: ClassVar[str] = r".*Measures for throughput iteration (\d+):\n.*throughput *(\d+\.\d+) ops/s"
+    # Also matches the start of every iteration, to tell the warmup latencies from the measured ones
+    LATENCY_PATTERN: ClassVar[str | None] = r".*\b(?:Measures for throughput iteration (\d+):|(p\d+(?:\.\d+)?|max) *(\d+(?:\.\d+)?) ms\b)"
+
     def __post_init__(self):
         if not subprocess.run(["which", "python3"], stdout = subprocess.DEVNULL).returncode == 0:
             raise EnvironmentError("Python3 is not available in the PATH. Please install Python3.")
@@ -52,40 +60,86 @@ class BaristaBenchmark(Benchmark):
         return nib_file
 
     @staticmethod
-    def _extract_result(output: str) -> float:
-        warmup, final = re.findall(r".*Measures for throughput iteration 1:\n.*throughput *(\d+\.\d+) ops/s", output, re.MULTILINE)
+    def _stages(matches: list[tuple[str, ...]]) -> list[list[float]]:
+        """
+        Throughput of every iteration by stage (warmup, if any, then
+        measurement). Every stage numbers its iterations from 1.
+        """
+        stages = []
+        for iteration, throughput in matches:
+            if not stages or int(iteration) == 1:
+                stages.append([])
+            stages[-1].append(float(throughput))
+
+        return stages
+
+    @staticmethod
+    def _extract_result(matches: list[tuple[str, ...]]) -> float:
+        stages = BaristaBenchmark._stages(matches)
+        if len(stages) not in (1, 2):
+            raise ValueError(f"Expected an optional warmup and a measurement stage of throughput iterations in output, found {len(stages)}")
+        measured = stages[-1]
+
+        return sum(measured) / len(measured)
+
+    @staticmethod
+    def _extract_iterations(matches: list[tuple[str, ...]]) -> list[float]:
+        return [throughput for stage in BaristaBenchmark._stages(matches) for throughput in stage]
 
-        return float(final)
+    @staticmethod
+    def _extract_latency_percentiles(matches: list[tuple[str, ...]]) -> dict[str, float]:
+        # Only the latencies reported after the last stage started, i.e. by the measurement stage
+        percentiles = {}
+        for iteration, percentile, value in matches:
+            if iteration is not None:
+                if int(iteration) == 1:
+                    percentiles = {}
+            else:
+                percentiles[percentile] = float(value)
+
+        return percentiles
 
-    def run_agent(self, vm_binary: str = "java") -> int:
+    @property
+    def iteration_args(self) -> list[str]:
+        return [
+            *([f"--warmup-iteration-count={self.warmup_iterations}"] if self.warmup_iterations is not None else []),
+            *([f"--throughput-iteration-count={self.measure_iterations}"] if self.measure_iterations is not None else []),
+        ]
+
+    def run_agent(self, vm_binary: str = "java", output_dir: Path | None = None, benchmark_args: list[str] | None = None, cwd: Path | None = None) -> int:
         return 0 # We expect to already have a .nib file in the target directory
 
-    def build_native_image(self, compiler: Compiler, optimization_level = OptimizationLevel.O3, additional_build_args: list[str] = []) -> int:
+    def _build_input_paths(self) -> list[Path]:
+        return [self.nib_file_path]
+
+    def _get_build_command(self, compiler: Compiler, optimization_level = OptimizationLevel.O3, additional_build_args: list[str] = []) -> list[str]:
         command = [
             *compiler.get_command(self.options).split(),
             optimization_level.value,
             "-H:+PlatformInterfaceCompatibilityMode",
             *self.native_image_args,
+            *self.build_parallelism_args,
             *additional_build_args,
             "-march=native",
             f"--bundle-apply={self.nib_file_path.as_posix()}",
             "-o", self.name,
         ]
+
+        return [x for x in command if x]
+
+    def _build_native_image(self, compiler: Compiler, optimization_level = OptimizationLevel.O3, additional_build_args: list[str] = []) -> int:
+        command = self._get_build_command(compiler, optimization_level, additional_build_args)
         print(f"{C.GRAY}Building native image with command: {' '.join(command)}{C.ENDC}")
 
-        try:
-            output = subprocess.check_output(
-                [x for x in command if x],
-                text = True,
-                stderr = subprocess.STDOUT
-            )
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Failed to build native image: {e.output}") from e
-
-        if not (m := re.search(r"Bundle build output written to (.*)", output, re.MULTILINE)):
-            raise RuntimeError(f"Could not find bundle build output in command output: {output}")
+        bundle_output = LineMatcher(r"Bundle build output written to (.*)")
+        returncode = self._run_build_command(command, compiler, optimization_level, on_line = bundle_output.feed)
+        if returncode != 0:
+            raise RuntimeError(f"Failed to build native image (exit code {returncode}), see {self.build_log_path}")
+
+        if not bundle_output.matches:
+            raise RuntimeError(f"Could not find bundle build output in command output, see {self.build_log_path}")
         
-        binary_path = Path(m.group(1)) / 'default' / self.name
+        binary_path = Path(bundle_output.matches[-1][0].strip()) / 'default' / self.name
 
         if not binary_path.exists():
             raise FileNotFoundError(f"Binary does not exist after build: {binary_path}")
@@ -101,6 +155,7 @@ class BaristaBenchmark(Benchmark):
             "--mode", "native",
             self.name,
             *self.benchmark_runner_args,
+            *self.iteration_args,
             *self.benchmark_args,
             f"--app-args=\"{' '.join(additional_args)}\"" if additional_args else "",
             "-x", self.binary_path.absolute().as_posix(),
@@ -1,13 +1,28 @@
 import json
-import subprocess
 from abc import ABC, abstractmethod
+from datetime import datetime
 from enum import Enum
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field, fields, replace
 from pathlib import Path
+from typing import Callable, ClassVar
 from util.color import ANSIColorCode as C
+from util.hashing import hash_path
+from util.perf import HardwareCounters, PerfStat
+from util.process import LineMatcher, run_streaming
+from util.resources import ResourceUsage, StatusSample
+from util.stats import steady_state_start
+from util.telemetry import get_telemetry
+from util.elf import ElfError
+from util.system import available_cpus, cpu_model
+from benchmarks.binary_size import BinarySections, code_bytes_by_package
+from benchmarks.build_cache import BuildCache
+from benchmarks.build_stats import BuildOutputParser, BuildStats
 from benchmarks.compiler import Compiler
+from benchmarks.measurement import CoreSlot
 from config.options import ConfigOptions
 from benchmarks.optimization_level import OptimizationLevel
+from profiling.filter import ProfileFilter
+from profiling.merge import merge_profiles
 import shutil
 
 
@@ -25,11 +40,58 @@ class BenchmarkResult:
     name: str
     result: float
     binary_size: int
-    output: str = field(repr=False)
+    timestamp: datetime = field(default_factory=datetime.now)
+    warmup: bool = field(default=False)
+    resource_usage: ResourceUsage | None = field(default=None)
+    slot: int | None = field(default=None)
+    cpus: str | None = field(default=None)
+    status_samples: list[StatusSample] = field(default_factory=list, repr=False)
+    binary_sections: BinarySections | None = field(default=None)
+    hardware_counters: HardwareCounters | None = field(default=None)
+    iterations: list[float] = field(default_factory=list, repr=False)
+    steady_state_iteration: int | None = field(default=None)
+    latency_percentiles: dict[str, float] = field(default_factory=dict)
+    wall_time_seconds: float | None = field(default=None)
+
+    @property
+    def warmup_result(self) -> float | None:
+        """Mean of the iterations before the run reached steady state, if it did after some."""
+        if not self.steady_state_iteration:
+            return None
+
+        return sum(self.iterations[:self.steady_state_iteration]) / self.steady_state_iteration
+
+    @property
+    def steady_state_result(self) -> float | None:
+        """Mean of the iterations from the one the run reached steady state in."""
+        if self.steady_state_iteration is None:
+            return None
+
+        steady = self.iterations[self.steady_state_iteration:]
+        return sum(steady) / len(steady)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "timestamp": self.timestamp.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BenchmarkResult":
+        known_fields = {f.name for f in fields(cls)}
+        return cls(**{
+            **{k: v for k, v in data.items() if k in known_fields},
+            "timestamp": datetime.fromisoformat(data["timestamp"]),
+            "resource_usage": ResourceUsage(**data["resource_usage"]) if data.get("resource_usage") else None,
+            "status_samples": [StatusSample(**sample) for sample in data.get("status_samples", [])],
+            "binary_sections": BinarySections(**data["binary_sections"]) if data.get("binary_sections") else None,
+            "hardware_counters": HardwareCounters(**data["hardware_counters"]) if data.get("hardware_counters") else None,
+        })
 
 
 @dataclass
 class Benchmark(ABC):
+    RESULT_PATTERN: ClassVar[str]
+    # Latency percentiles reported by the benchmark as (percentile, milliseconds)
+    LATENCY_PATTERN: ClassVar[str | None] = None
+
     name: str
     context_path: Path
     unit: BenchmarkUnit
@@ -37,7 +99,12 @@ class Benchmark(ABC):
     native_image_args: list[str] = field(default_factory=list)
     benchmark_runner_args: list[str] = field(default_factory=list)
     benchmark_args: list[str] = field(default_factory=list)
+    profiling_args: list[list[str]] = field(default_factory=list)
     options: ConfigOptions = field(default_factory=ConfigOptions)
+    output_dir: Path | None = field(default=None)
+    build_command: list[str] | None = field(default=None, repr=False, compare=False)
+    build_stats: BuildStats | None = field(default=None, repr=False, compare=False)
+    binary_sections: BinarySections | None = field(default=None, repr=False, compare=False)
 
     @classmethod
     def from_config(cls, config: dict, options: ConfigOptions) -> "Benchmark":
@@ -53,23 +120,47 @@ class Benchmark(ABC):
                 raise ValueError(f"Missing required field '{field}' in benchmark config.")
 
         config = {k: v for k, v in config.items() if k != "type"}
-        from benchmarks.dacapobench import DacapoBenchmark
-        from benchmarks.baristabench import BaristaBenchmark
 
         if options.skip_run:
             config["n_runs"] = 0
 
+        return cls.class_for_type(benchmark_type)(options=options, **config)
+
+    @staticmethod
+    def class_for_type(benchmark_type: str) -> type["Benchmark"]:
+        from benchmarks.dacapobench import DacapoBenchmark
+        from benchmarks.baristabench import BaristaBenchmark
+
         match benchmark_type:
             case "dacapo":
-                return DacapoBenchmark(options=options, **config)
+                return DacapoBenchmark
             case "barista":
-                return BaristaBenchmark(options=options, **config)
+                return BaristaBenchmark
             case _:
-                raise ValueError(f"Unknown benchmark type: {config['type']}")
+                raise ValueError(f"Unknown benchmark type: {benchmark_type}")
+
+    @property
+    def work_dir(self) -> Path:
+        return self.output_dir if self.output_dir is not None else self.context_path
 
     @property
     def binary_path(self) -> Path:
-        return self.context_path / self.name
+        return self.work_dir / self.name
+
+    @property
+    def build_log_path(self) -> Path:
+        return self.work_dir / "build.log"
+
+    @property
+    def build_stats_path(self) -> Path:
+        return self.work_dir / "build-stats.json"
+
+    @property
+    def run_log_path(self) -> Path:
+        return self.work_dir / f"{self.name}.log"
+
+    def with_output_dir(self, output_dir: Path) -> "Benchmark":
+        return replace(self, output_dir=output_dir)
 
     def _get_binary_size(self):
         if not self.binary_path.exists():
@@ -77,65 +168,388 @@ class Benchmark(ABC):
 
         return self.binary_path.stat().st_size
 
+    def _get_code_bytes_by_package(self) -> dict[str, int]:
+        try:
+            return code_bytes_by_package(self.binary_path, self.options.binary_package_depth)
+        except (ElfError, OSError) as e:
+            print(f"{C.WARNING}Cannot attribute the code of {self.binary_path} to packages: {e}{C.ENDC}")
+            return {}
+
+    def _get_binary_sections(self) -> BinarySections | None:
+        try:
+            return BinarySections.read(self.binary_path)
+        except (ElfError, OSError) as e:
+            print(f"{C.WARNING}Cannot break down the size of {self.binary_path}: {e}{C.ENDC}")
+            return None
+
     @abstractmethod
-    def run_agent(self, vm_binary: str = "java") -> int:
+    def run_agent(self, vm_binary: str = "java", output_dir: Path | None = None, benchmark_args: list[str] | None = None, cwd: Path | None = None) -> int:
+        """
+        Run the benchmark on the JVM under the native-image agent, writing its
+        configuration to `output_dir` (by default the benchmark's
+        configuration directory).
+        """
         pass
 
+    def agent_cache_inputs(self) -> dict | None:
+        """
+        Inputs besides the JVM and the benchmark arguments that determine the
+        agent's configuration, or None if the benchmark does not use the agent.
+        """
+        return None
+
+    @property
+    def agent_runs(self) -> list[list[str]]:
+        """
+        Benchmark arguments to run the agent with: every set of arguments the
+        benchmark is run or profiled with.
+        """
+        runs = []
+        for benchmark_args in [self.benchmark_args, *self.profiling_args]:
+            if benchmark_args not in runs:
+                runs.append(benchmark_args)
+
+        return runs
+
     @abstractmethod
-    def build_native_image(self, compiler: Compiler = Compiler.CLOSED, optimization_level=OptimizationLevel.O3, additional_build_args: list[str] = []) -> int:
+    def _get_build_command(self, compiler: Compiler, optimization_level: OptimizationLevel, additional_build_args: list[str]) -> list[str]:
+        pass
+
+    @property
+    def build_parallelism_args(self) -> list[str]:
+        """
+        Limit native-image to the cores the build scheduler reserves for a
+        build when builds run concurrently, as it uses every CPU otherwise,
+        unless the benchmark sets the parallelism itself.
+        """
+        if self.options.build_workers <= 1 or any(arg.startswith("--parallelism") for arg in self.native_image_args):
+            return []
+
+        return [f"--parallelism={min(self.options.build_cores, available_cpus())}"]
+
+    @abstractmethod
+    def _build_native_image(self, compiler: Compiler, optimization_level: OptimizationLevel, additional_build_args: list[str]) -> int:
+        pass
+
+    @abstractmethod
+    def _build_input_paths(self) -> list[Path]:
+        """
+        Files and directories, besides the compiler and its arguments, whose
+        contents determine the built binary.
+        """
         pass
 
-    def build_pgo_optimized_binary(self, compiler: Compiler, additional_build_args: list[str] = []) -> None:
+    @staticmethod
+    def _hash_build_arg(arg: str) -> str:
+        key, sep, value = arg.rpartition("=")
+        if Path(value).is_absolute() and Path(value).exists():
+            return f"{key}{sep}sha256:{hash_path(Path(value))}"
+
+        return arg
+
+    def _build_cache_inputs(self, compiler: Compiler, optimization_level: OptimizationLevel, additional_build_args: list[str]) -> dict:
+        # The parallelism of a build does not change the binary
+        native_image_args = [arg for arg in self.native_image_args if not arg.startswith("--parallelism")]
+        additional_build_args = [arg for arg in additional_build_args if not arg.startswith("--parallelism")]
+
+        return {
+            "benchmark": self.name,
+            "type": type(self).__name__,
+            "cpu": cpu_model(),
+            "compiler": compiler.get_command(self.options),
+            "compiler_version": compiler.get_version(self.options),
+            "optimization_level": optimization_level.value,
+            "native_image_args": [self._hash_build_arg(arg) for arg in native_image_args],
+            "additional_build_args": [self._hash_build_arg(arg) for arg in additional_build_args],
+            "input_paths": {path.as_posix(): hash_path(path) if path.exists() else None for path in self._build_input_paths()},
+        }
+
+    def _run_build_command(self, command: list[str], compiler: Compiler, optimization_level: OptimizationLevel, on_line: Callable[[str], None] | None = None) -> int:
+        """
+        Run a native-image build command, logging its output to the build log
+        and recording the cost of the build in `build_stats`.
+        """
+        parser = BuildOutputParser()
+        telemetry = get_telemetry()
+        # Builds are named by their directory, which is the id of their job or profiling task
+        build = self.work_dir.name
+
+        def feed(line: str) -> None:
+            n_phases = len(parser.phases)
+            parser.feed(line)
+            if len(parser.phases) > n_phases:
+                name, phase = next(reversed(parser.phases.items()))
+                telemetry.emit("build_phase", build=build, benchmark=self.name, phase=name, seconds=phase.seconds, memory_bytes=phase.memory_bytes)
+            if on_line is not None:
+                on_line(line)
+
+        def on_sample(sample: StatusSample) -> None:
+            telemetry.set_gauge("build_rss_bytes", sample.rss_bytes, build=build)
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            process = run_streaming(command, self.build_log_path, cwd=self.work_dir, timeout=self.options.build_timeout_seconds, on_line=feed,
+                                    sample_interval=telemetry.sample_interval if telemetry.serves_metrics else None, on_sample=on_sample)
+        finally:
+            telemetry.remove_gauge("build_rss_bytes", build=build)
+        self.build_stats = parser.stats(process, compiler.name, optimization_level.value)
+        if process.returncode == 0 and self.options.binary_size_by_package:
+            self.build_stats.code_bytes_by_package = self._get_code_bytes_by_package()
+        self.build_stats.write(self.build_stats_path)
+
+        return process.returncode
+
+    def build_native_image(self, compiler: Compiler = Compiler.CLOSED, optimization_level=OptimizationLevel.O3, additional_build_args: list[str] = []) -> int:
+        self.build_command = self._get_build_command(compiler, optimization_level, additional_build_args)
+        self.build_stats = None
+        self.binary_sections = None
+
+        returncode = self._build_or_restore_native_image(compiler, optimization_level, additional_build_args)
+        # The sections are reported with every run, so the binary is only parsed once per build
+        if returncode == 0:
+            self.binary_sections = self._get_binary_sections()
+
+        return returncode
+
+    def _build_or_restore_native_image(self, compiler: Compiler, optimization_level: OptimizationLevel, additional_build_args: list[str]) -> int:
+        cache = BuildCache.for_options(self.options)
+        if cache is None:
+            return self._build_native_image(compiler, optimization_level, additional_build_args)
+
+        inputs = self._build_cache_inputs(compiler, optimization_level, additional_build_args)
+        key = cache.key(inputs)
+        if cache.restore(key, {"binary": self.binary_path, "build-stats.json": self.build_stats_path}):
+            print(f"{C.GRAY}Restored {self.binary_path} from build cache ({key[:12]}){C.ENDC}")
+            self.build_stats = replace(BuildStats.read(self.build_stats_path), cached=True)
+            if self.options.binary_size_by_package and not self.build_stats.code_bytes_by_package:
+                self.build_stats.code_bytes_by_package = self._get_code_bytes_by_package()
+                self.build_stats.write(self.build_stats_path)
+            return 0
+
+        returncode = self._build_native_image(compiler, optimization_level, additional_build_args)
+        cache.store(key, {"binary": self.binary_path, "build-stats.json": self.build_stats_path}, inputs)
+
+        return returncode
+
+    def profile_path(self, compiler: Compiler) -> Path:
+        return self.work_dir / f"{self.name}.iprof" if compiler == Compiler.CLOSED else self.work_dir / "profiler-data.json"
+
+    @property
+    def profile_variance_path(self) -> Path:
+        return self.work_dir / "profile-variance.csv"
+
+    def profiling_runs(self, compiler: Compiler) -> list[list[str]]:
+        """
+        Benchmark arguments of every run of the instrumented binary: one run
+        per entry of `profiling_args` if there are any, or else
+        `profiling_runs` runs with the benchmark's own arguments. Only the
+        first of them for compilers other than CUSTOM_OPEN, whose profiles
+        cannot be merged.
+        """
+        runs = self.profiling_args or [self.benchmark_args] * max(self.options.profiling_runs, 1)
+        return runs if compiler == Compiler.CUSTOM_OPEN else runs[:1]
+
+    def _collect_merged_profile(self, runs: list[list[str]], run_args: list[str], prof_file_path: Path) -> None:
+        """
+        Run the instrumented binary once per entry of `runs` and merge the
+        profiles into `prof_file_path`, reporting the variance of every call
+        site across the runs.
+        """
+        runs_dir = self.work_dir / "profiling-runs"
+        runs_dir.mkdir(parents=True, exist_ok=True)
+
+        run_profiles = []
+        for i, benchmark_args in enumerate(runs):
+            print(f"{C.GRAY}Running benchmark {self.name} to collect profiling data ({i + 1}/{len(runs)})...{C.ENDC}")
+            replace(self, benchmark_args=benchmark_args).run(log=True, additional_args=run_args)
+            if not prof_file_path.exists():
+                raise FileNotFoundError(f"Profiling run {i + 1} of {self.name} did not write {prof_file_path}")
+            run_profiles.append(prof_file_path.replace(runs_dir / f"{prof_file_path.stem}-{i}{prof_file_path.suffix}"))
+
+        variance = merge_profiles(run_profiles, prof_file_path, self.options.profile_merge_normalize, self.options.profile_merge_decay)
+        variance.to_csv(self.profile_variance_path, index=False)
+
+        hottest = variance.nlargest(100, "mean_count")
+        print(f"{C.GRAY}Merged {len(runs)} profiles of {self.name}: {len(variance)} call sites, median coefficient of variation of the {len(hottest)} hottest {hottest['cv'].median():.3f}{C.ENDC}")
+
+    def collect_profile(self, compiler: Compiler) -> Path:
         assert compiler in (Compiler.CLOSED, Compiler.CUSTOM_OPEN), "PGO optimization is only supported for CLOSED and CUSTOM_OPEN compilers."
 
-        prof_file_path = (self.context_path / f"{self.name}.iprof").as_posix() if compiler == Compiler.CLOSED else (self.context_path / f"profiler-data.json").as_posix()
+        prof_file_path = self.profile_path(compiler)
         profiling_binary_optimization_level = OptimizationLevel.NONE if compiler == Compiler.CLOSED else OptimizationLevel.O0
+        instrumentation_args = ["--pgo-instrument"] if compiler == Compiler.CLOSED else []
+        run_args = [f"-XX:ProfilesDumpFile={prof_file_path.as_posix()}"] if compiler == Compiler.CLOSED else []
+        runs = self.profiling_runs(compiler)
+        if len(self.profiling_runs(Compiler.CUSTOM_OPEN)) > len(runs):
+            print(f"{C.WARNING}Only profiles of the {Compiler.CUSTOM_OPEN.name} compiler can be merged, profiling {self.name} with one run{C.ENDC}")
+        profile_files = {"profile": prof_file_path, "profile-variance.csv": self.profile_variance_path} if len(runs) > 1 else {"profile": prof_file_path}
 
         if not self.options.skip_profiling:
-            # 1. Create instrumented binary
-            instrumentation_args = ["--pgo-instrument"] if compiler == Compiler.CLOSED else []
-            self.build_native_image(compiler, profiling_binary_optimization_level, instrumentation_args)
+            # The profile differs between runs of the instrumented binary, so it is
+            # cached on the inputs of the instrumented build and the profiling run.
+            cache = BuildCache.for_options(self.options)
+            cache_inputs = {
+                "instrumented": self._build_cache_inputs(compiler, profiling_binary_optimization_level, instrumentation_args),
+                "profiling_run": [*self.benchmark_runner_args, *runs[0], *[arg.replace(prof_file_path.as_posix(), "<profile>") for arg in run_args]],
+            } if cache is not None else None
+            if cache_inputs is not None and len(runs) > 1:
+                cache_inputs["merged_profiling_runs"] = {
+                    "benchmark_args": runs,
+                    "normalize": self.options.profile_merge_normalize,
+                    "decay": self.options.profile_merge_decay,
+                }
 
-            # 2. Run the instrumented binary to collect profiling data
-            print(f"{C.GRAY}Running benchmark {self.name} to collect profiling data...{C.ENDC}")
-            run_args = [f"-XX:ProfilesDumpFile={prof_file_path}"] if compiler == Compiler.CLOSED else []
-            self.run(log=True, additional_args=run_args)
+            if cache is not None and cache.restore(cache.key(cache_inputs), profile_files):
+                print(f"{C.GRAY}Restored {prof_file_path} from build cache{C.ENDC}")
+            else:
+                # 1. Create instrumented binary
+                self.build_native_image(compiler, profiling_binary_optimization_level, instrumentation_args)
+
+                # 2. Run the instrumented binary to collect profiling data
+                if len(runs) > 1:
+                    self._collect_merged_profile(runs, run_args, prof_file_path)
+                else:
+                    print(f"{C.GRAY}Running benchmark {self.name} to collect profiling data...{C.ENDC}")
+                    replace(self, benchmark_args=runs[0]).run(log=True, additional_args=run_args)
+
+                if cache is not None:
+                    cache.store(cache.key(cache_inputs), profile_files, cache_inputs)
 
         if self.options.dump_profiling_data:
-            prof_file_path = Path(prof_file_path)
             if not prof_file_path.exists():
                 raise FileNotFoundError(f"Profiling data file does not exist: {prof_file_path}")
             logged_prof_file_path = self.options.profiling_data_output_dir_path / f"{self.name}-{compiler.value}.json"
             shutil.copy(prof_file_path, logged_prof_file_path)
+            if len(runs) > 1 and self.profile_variance_path.exists():
+                shutil.copy(self.profile_variance_path, logged_prof_file_path.with_name(f"{self.name}-{compiler.value}-variance.csv"))
+
+        return prof_file_path
+
+    @property
+    def filtered_profile_path(self) -> Path:
+        return self.work_dir / "profiler-data-filtered.json"
+
+    def build_pgo_optimized_binary(self, compiler: Compiler, additional_build_args: list[str] = [], profile_path: Path | None = None,
+                                   profile_filter: ProfileFilter | None = None) -> None:
+        """
+        Build a binary optimized with the profile at `profile_path`, or with a
+        freshly collected profile if none is given, pruned by `profile_filter`
+        if one is given.
+        """
+        assert compiler in (Compiler.CLOSED, Compiler.CUSTOM_OPEN), "PGO optimization is only supported for CLOSED and CUSTOM_OPEN compilers."
+        if profile_filter is not None and compiler != Compiler.CUSTOM_OPEN:
+            raise ValueError(f"Profile filters only apply to the JSON profiles of the {Compiler.CUSTOM_OPEN.name} compiler")
+
+        if profile_path is None:
+            profile_path = self.collect_profile(compiler)
 
         if not self.options.skip_run:
+            if profile_filter is not None:
+                self.work_dir.mkdir(parents=True, exist_ok=True)
+                kept, total = profile_filter.apply(profile_path, self.filtered_profile_path)
+                print(f"{C.GRAY}Filtered the profile of {self.name} with '{profile_filter.name}': kept {kept} of {total} call sites{C.ENDC}")
+                profile_path = self.filtered_profile_path
+
             # 3. Build the optimized binary using the collected profiling data
+            prof_file_path = profile_path.absolute().as_posix()
             optimized_binary_args = [f"--pgo={prof_file_path}"] if compiler == Compiler.CLOSED else [f"-H:ProfileDataDumpFileName={prof_file_path}", "-J-DdisableVirtualInvokeProfilingPhase=true"]
             self.build_native_image(compiler, OptimizationLevel.NONE, optimized_binary_args + additional_build_args)
 
     @staticmethod
     @abstractmethod
-    def _extract_result(output: str) -> float:
+    def _extract_result(matches: list[tuple[str, ...]]) -> float:
         """
         Extract the result from the benchmark output.
-        This method should be implemented by subclasses to parse the output
-        and return the relevant numeric result.
+        This method should be implemented by subclasses to compute the
+        relevant numeric result from the groups of every match of
+        RESULT_PATTERN in the output.
         """
         pass
 
+    @staticmethod
+    def _extract_iterations(matches: list[tuple[str, ...]]) -> list[float]:
+        """
+        The value of every iteration of a run in order, warmup iterations
+        included, from the matches of RESULT_PATTERN. Benchmarks that run a
+        single iteration need not implement it.
+        """
+        return []
+
+    @staticmethod
+    def _extract_latency_percentiles(matches: list[tuple[str, ...]]) -> dict[str, float]:
+        """
+        Latency by percentile from the (percentile, value) matches of
+        LATENCY_PATTERN. The last value reported for a percentile wins.
+        """
+        return {percentile: float(value) for percentile, value in matches}
+
+    @property
+    def iteration_args(self) -> list[str]:
+        """Arguments that set the number of iterations of a run."""
+        return []
+
     @abstractmethod
     def _get_run_command(self, additional_args: list[str] = []) -> list[str]:
         pass
 
-    def run(self, log=True, additional_args: list[str] = []) -> BenchmarkResult:
-        command = self._get_run_command(additional_args)
-        output = subprocess.check_output([x for x in command if x], text=True, stderr=subprocess.STDOUT, cwd=self.context_path.as_posix())
-        result = BenchmarkResult(self.name, self._extract_result(output), self._get_binary_size(), output)
-        if log:
-            with open(self.context_path / f"{self.name}.log", "a") as log_file:
-                log_file.write(result.output)
+    @property
+    def single_threaded(self) -> bool:
+        """
+        Whether the benchmark runs its workload on one thread, so that it can
+        be measured next to others on its own cores.
+        """
+        return False
+
+    def _read_hardware_counters(self, perf_stat: PerfStat | None) -> HardwareCounters | None:
+        if perf_stat is None:
+            return None
+
+        try:
+            counters = perf_stat.read()
+            if multiplexed := counters.multiplexed:
+                print(f"{C.WARNING}Hardware counter(s) of {self.name} were multiplexed, their counts are scaled estimates: "
+                      f"{', '.join(f'{counter} counted {percent:.1f}% of the run' for counter, percent in multiplexed.items())}{C.ENDC}")
+            return counters
+        except OSError as e:
+            print(f"{C.WARNING}Cannot read the hardware counters of {self.name}: {e}{C.ENDC}")
+            return None
+        finally:
+            perf_stat.output_path.unlink(missing_ok=True)
+
+    def run(self, log=True, additional_args: list[str] = [], slot: CoreSlot | None = None) -> BenchmarkResult:
+        command = [x for x in self._get_run_command(additional_args) if x]
+        log_path = self.run_log_path if log else None
+        matcher = LineMatcher(self.RESULT_PATTERN)
+        latency_matcher = LineMatcher(self.LATENCY_PATTERN) if self.LATENCY_PATTERN else None
+
+        def feed(line: str) -> None:
+            matcher.feed(line)
+            if latency_matcher is not None:
+                latency_matcher.feed(line)
+
+        perf_stat = PerfStat.detect(self.work_dir / f"{self.name}.perf-stat-{slot.id if slot is not None else 0}") if self.options.hardware_counters else None
+        if perf_stat is not None:
+            command = perf_stat.wrap(command)
+
+        process = run_streaming(command, log_path, cwd=self.work_dir, timeout=self.options.run_timeout_seconds, on_line=feed,
+                                sample_interval=self.options.proc_status_sample_interval_seconds,
+                                cpus=slot.cpus if slot is not None else None, numa_node=slot.node if slot is not None else None)
+        hardware_counters = self._read_hardware_counters(perf_stat)
+        if process.returncode != 0:
+            raise RuntimeError(f"Benchmark {self.name} exited with code {process.returncode}" + (f", see {log_path}" if log_path else ""))
 
-        return result
+        try:
+            result = self._extract_result(matcher.matches)
+        except ValueError as e:
+            raise ValueError(f"{e}" + (f", see {log_path}" if log_path else "")) from e
+
+        iterations = self._extract_iterations(matcher.matches) or [result]
+        latency_percentiles = self._extract_latency_percentiles(latency_matcher.matches) if latency_matcher is not None else {}
+
+        return BenchmarkResult(self.name, result, self._get_binary_size(), resource_usage=process.resource_usage, status_samples=process.status_samples,
+                               slot=slot.id if slot is not None else None, cpus=slot.cpu_list if slot is not None else None, binary_sections=self.binary_sections,
+                               hardware_counters=hardware_counters, iterations=iterations, latency_percentiles=latency_percentiles, wall_time_seconds=process.wall_time_seconds,
+                               steady_state_iteration=steady_state_start(iterations, self.options.steady_state_window, self.options.steady_state_threshold) if len(iterations) > 1 else None)
 
 
 def read_benchmarks_from_file(file_path: Path, options: ConfigOptions) -> dict[str, Benchmark]:
@@ -150,3 +564,14 @@ def read_benchmarks_from_file(file_path: Path, options: ConfigOptions) -> dict[s
         benchmarks[benchmark.name] = benchmark
 
     return benchmarks
+
+
+def read_benchmark_units(file_path: Path) -> dict[str, BenchmarkUnit]:
+    """
+    The unit of the result of every benchmark in a benchmarks file, without
+    creating the benchmarks.
+    """
+    with open(file_path, "r") as f:
+        benchmarks_data = json.load(f) or []
+
+    return {config["name"]: Benchmark.class_for_type(config.get("type")).unit for config in benchmarks_data}
@@ -0,0 +1,126 @@
+import re
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+import numpy as np
+
+from util.elf import SHF_ALLOC, SHF_EXECINSTR, SHF_WRITE, SHT_DYNSYM, SHT_REL, SHT_RELA, SHT_RELR, SHT_STRTAB, SHT_SYMTAB, STT_FUNC, ElfFile, ElfSection
+
+# Native Image places the image heap in a section of its own
+IMAGE_HEAP_SECTIONS = (".svm_heap",)
+MANGLED_COMPONENT = re.compile(r"(\d+)")
+
+
+@dataclass
+class BinarySections:
+    """
+    Bytes of a binary by what its sections hold, adding up to the size of
+    the file: the ELF headers and the padding between sections count as
+    other bytes, and sections that take no space in the file (.bss) are not
+    counted.
+    """
+    code_bytes: int = field(default=0)
+    image_heap_bytes: int = field(default=0)
+    rodata_bytes: int = field(default=0)
+    data_bytes: int = field(default=0)
+    relocation_bytes: int = field(default=0)
+    symbol_bytes: int = field(default=0)
+    debug_bytes: int = field(default=0)
+    other_bytes: int = field(default=0)
+
+    @classmethod
+    def from_elf(cls, elf: ElfFile) -> "BinarySections":
+        sizes = cls()
+        for section in elf.sections:
+            name = f"{section_category(section)}_bytes"
+            setattr(sizes, name, getattr(sizes, name) + section.file_size)
+        sizes.other_bytes += max(elf.size - sizes.total_bytes, 0)
+
+        return sizes
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(getattr(self, column) for column in BINARY_SECTION_COLUMNS)
+
+    @classmethod
+    def read(cls, path: Path) -> "BinarySections":
+        with ElfFile(path) as elf:
+            return cls.from_elf(elf)
+
+
+BINARY_SECTION_COLUMNS = [f.name for f in fields(BinarySections)]
+
+
+def section_category(section: ElfSection) -> str:
+    if section.name in IMAGE_HEAP_SECTIONS:
+        return "image_heap"
+    if section.name.startswith(".debug") or section.name.startswith(".zdebug"):
+        return "debug"
+    if section.type in (SHT_RELA, SHT_REL, SHT_RELR):
+        return "relocation"
+    if section.type in (SHT_SYMTAB, SHT_DYNSYM) or (section.type == SHT_STRTAB and section.name in (".strtab", ".dynstr")):
+        return "symbol"
+    if section.flags & SHF_ALLOC and section.flags & SHF_EXECINSTR:
+        return "code"
+    if section.flags & SHF_ALLOC and section.flags & SHF_WRITE:
+        return "data"
+    if section.flags & SHF_ALLOC:
+        return "rodata"
+
+    return "other"
+
+
+def java_package(symbol: str, depth: int | None = None) -> str | None:
+    """
+    Java package of a method symbol, either as Native Image names it
+    ("java.util.HashMap::get") or mangled as with debug info
+    ("_ZN4java4util7HashMap3getE..."), cut to its first `depth` components.
+    """
+    if "::" in symbol:
+        components = symbol.split("::", 1)[0].split(".")[:-1]
+    elif symbol.startswith("_ZN"):
+        components, position = [], 3
+        while (m := MANGLED_COMPONENT.match(symbol, position)) is not None:
+            length = int(m.group(1))
+            components.append(symbol[m.end():m.end() + length])
+            position = m.end() + length
+        # The last two components are the class and the method
+        components = components[:-2]
+    else:
+        return None
+
+    if not components:
+        return None
+
+    return ".".join(components[:depth] if depth else components)
+
+
+def code_bytes_by_package(path: Path, depth: int | None = 2) -> dict[str, int]:
+    """
+    Bytes of code per Java package, from the function symbols of the binary.
+    Symbols without a size take up the space until the next symbol. Code
+    that no Java method symbol covers is counted as "<other>".
+    """
+    with ElfFile(path) as elf:
+        symbols, names = elf.symbols()
+        code_sections = {s.index: s for s in elf.sections if section_category(s) == "code"}
+
+    is_function = ((symbols["info"] & 0xF) == STT_FUNC) & np.isin(symbols["shndx"], list(code_sections))
+    indices = np.flatnonzero(is_function)
+    indices = indices[np.argsort(symbols["value"][indices], kind="stable")]
+    addresses, sizes = symbols["value"][indices].astype(np.int64), symbols["size"][indices].astype(np.int64)
+
+    # Size up to the next symbol, or to the end of the section for the last one
+    section_ends = np.array([code_sections[i].address + code_sections[i].size for i in symbols["shndx"][indices].tolist()], dtype=np.int64)
+    next_addresses = np.append(addresses[1:], section_ends[-1:] if len(addresses) else [])
+    sizes = np.where(sizes > 0, sizes, np.minimum(next_addresses, section_ends) - addresses)
+
+    packages: dict[str, int] = {}
+    for index, size in zip(indices.tolist(), sizes.tolist()):
+        if (package := java_package(names[index], depth)) is not None:
+            packages[package] = packages.get(package, 0) + size
+
+    total_code = sum(section.size for section in code_sections.values())
+    packages["<other>"] = max(total_code - sum(packages.values()), 0)
+
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
@@ -0,0 +1,159 @@
+import json
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from config.options import ConfigOptions
+from util.hashing import hash_json
+
+GB = 1024 ** 3
+DAY = 24 * 60 * 60
+
+
+@dataclass
+class BuildCacheStats:
+    hits: int = field(default=0)
+    misses: int = field(default=0)
+    stores: int = field(default=0)
+    evictions: int = field(default=0)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.hits} hit(s), {self.misses} miss(es) ({self.hit_rate:.0%} hit rate), {self.stores} stored, {self.evictions} evicted"
+
+
+class BuildCache:
+    """
+    Content-addressed store for build artifacts.
+
+    Entries are keyed by a hash of everything that went into a build and hold
+    one or more named artifacts (the binary, and for PGO builds the profile it
+    was optimized with). Entries that have not been used for `max_age` seconds
+    are evicted, after which the least recently used entries are evicted until
+    the cache fits in `max_size` bytes.
+    """
+
+    META_FILE_NAME = "meta.json"
+
+    _instances: dict[Path, "BuildCache"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, cache_dir: Path, max_size: int | None = None, max_age: float | None = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.stats = BuildCacheStats()
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def for_options(cls, options: ConfigOptions) -> "BuildCache | None":
+        if options.build_cache_dir is None:
+            return None
+
+        cache_dir = Path(options.build_cache_dir).absolute()
+        with cls._instances_lock:
+            if cache_dir not in cls._instances:
+                cls._instances[cache_dir] = cls(
+                    cache_dir,
+                    max_size=int(options.build_cache_max_gb * GB) if options.build_cache_max_gb is not None else None,
+                    max_age=options.build_cache_max_age_days * DAY if options.build_cache_max_age_days is not None else None,
+                )
+            return cls._instances[cache_dir]
+
+    @staticmethod
+    def key(inputs: dict) -> str:
+        return hash_json(inputs)
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _read_meta(self, entry_dir: Path) -> dict | None:
+        try:
+            with open(entry_dir / self.META_FILE_NAME, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, entry_dir: Path, meta: dict) -> None:
+        tmp_path = entry_dir / f"{self.META_FILE_NAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        tmp_path.replace(entry_dir / self.META_FILE_NAME)
+
+    def restore(self, key: str, destinations: dict[str, Path]) -> bool:
+        with self._lock:
+            entry_dir = self._entry_dir(key)
+            meta = self._read_meta(entry_dir)
+            if meta is None or not all((entry_dir / name).is_file() for name in destinations):
+                self.stats.misses += 1
+                return False
+
+            for name, destination in destinations.items():
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                if destination.is_symlink() or destination.exists():
+                    destination.unlink()
+                shutil.copy2(entry_dir / name, destination)
+
+            meta["last_used"] = time.time()
+            meta["hits"] = meta.get("hits", 0) + 1
+            self._write_meta(entry_dir, meta)
+            self.stats.hits += 1
+
+            return True
+
+    def store(self, key: str, artifacts: dict[str, Path], inputs: dict | None = None) -> None:
+        with self._lock:
+            entry_dir = self._entry_dir(key)
+            tmp_dir = entry_dir.with_name(f"{key}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+
+            size = 0
+            for name, artifact in artifacts.items():
+                if not artifact.exists():
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    raise FileNotFoundError(f"Cannot cache missing build artifact: {artifact}")
+                shutil.copy2(artifact, tmp_dir / name)
+                size += (tmp_dir / name).stat().st_size
+
+            now = time.time()
+            self._write_meta(tmp_dir, {"inputs": inputs, "size": size, "created": now, "last_used": now, "hits": 0})
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            tmp_dir.rename(entry_dir)
+            self.stats.stores += 1
+
+            self._evict()
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for meta_path in self.cache_dir.glob(f"*/*/{self.META_FILE_NAME}"):
+            if (meta := self._read_meta(meta_path.parent)) is not None:
+                entries.append((meta.get("last_used", 0), meta.get("size", 0), meta_path.parent))
+
+        entries.sort()
+        now = time.time()
+        total_size = sum(size for _, size, _ in entries)
+
+        for last_used, size, entry_dir in entries:
+            expired = self.max_age is not None and now - last_used > self.max_age
+            over_budget = self.max_size is not None and total_size > self.max_size
+            if not expired and not over_budget:
+                continue
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+            self.stats.evictions += 1
+
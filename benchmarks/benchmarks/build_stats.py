@@ -0,0 +1,103 @@
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from util.process import ProcessResult
+
+# Phases as printed by native-image, e.g.
+# [2/8] Performing analysis...  [******]                          (22.1s @ 0.71GB)
+PHASE_PATTERN = re.compile(r"^\[\d+/\d+\]\s+(?P<name>[^.\[]+?)\.\.\..*\((?P<seconds>\d+(?:\.\d+)?)s @ (?P<memory>\d+(?:\.\d+)?)GB\)")
+REACHABLE_PATTERN = re.compile(r"^\s*(?P<count>[\d,]+) reachable (?P<kind>types|fields|methods)\b")
+PEAK_RSS_PATTERN = re.compile(r"Peak RSS:\s*(?P<memory>\d+(?:\.\d+)?)\s*GB")
+
+PHASE_NAMES = {
+    "Initializing": "initializing",
+    "Performing analysis": "analysis",
+    "Building universe": "universe",
+    "Parsing methods": "parsing",
+    "Inlining methods": "inlining",
+    "Compiling methods": "compiling",
+    "Layouting methods": "layout",
+    "Creating image": "image_creation",
+}
+
+GB = 1024 ** 3
+
+
+@dataclass
+class BuildPhase:
+    seconds: float
+    memory_bytes: int
+
+
+@dataclass
+class BuildStats:
+    """
+    Cost of a native-image build: wall time and rusage of the builder
+    process tree, and the per-phase timings, memory and reachability counts
+    that native-image reports in its output.
+    """
+    compiler: str
+    optimization_level: str
+    wall_time_seconds: float
+    max_rss_bytes: int | None = field(default=None)
+    user_time_seconds: float | None = field(default=None)
+    system_time_seconds: float | None = field(default=None)
+    reported_peak_rss_bytes: int | None = field(default=None)
+    reachable_types: int | None = field(default=None)
+    reachable_fields: int | None = field(default=None)
+    reachable_methods: int | None = field(default=None)
+    phases: dict[str, BuildPhase] = field(default_factory=dict)
+    code_bytes_by_package: dict[str, int] = field(default_factory=dict)
+    cached: bool = field(default=False)
+
+    def write(self, path: Path) -> None:
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BuildStats":
+        return cls(**{**data, "phases": {name: BuildPhase(**phase) for name, phase in data["phases"].items()}})
+
+    @classmethod
+    def read(cls, path: Path) -> "BuildStats":
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+
+class BuildOutputParser:
+    """
+    Collects the phase timings and statistics from native-image output, one
+    line at a time.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, BuildPhase] = {}
+        self.reachable: dict[str, int] = {}
+        self.reported_peak_rss_bytes: int | None = None
+
+    def feed(self, line: str) -> None:
+        if m := PHASE_PATTERN.search(line):
+            name = m.group("name").strip()
+            self.phases[PHASE_NAMES.get(name, name.lower().replace(" ", "_"))] = BuildPhase(float(m.group("seconds")), int(float(m.group("memory")) * GB))
+        elif m := REACHABLE_PATTERN.search(line):
+            self.reachable[m.group("kind")] = int(m.group("count").replace(",", ""))
+        elif m := PEAK_RSS_PATTERN.search(line):
+            self.reported_peak_rss_bytes = int(float(m.group("memory")) * GB)
+
+    def stats(self, process: ProcessResult, compiler: str, optimization_level: str) -> BuildStats:
+        usage = process.resource_usage
+        return BuildStats(
+            compiler=compiler,
+            optimization_level=optimization_level,
+            wall_time_seconds=process.wall_time_seconds,
+            max_rss_bytes=usage.max_rss_bytes if usage is not None else None,
+            user_time_seconds=usage.user_time_seconds if usage is not None else None,
+            system_time_seconds=usage.system_time_seconds if usage is not None else None,
+            reported_peak_rss_bytes=self.reported_peak_rss_bytes,
+            reachable_types=self.reachable.get("types"),
+            reachable_fields=self.reachable.get("fields"),
+            reachable_methods=self.reachable.get("methods"),
+            phases=dict(self.phases),
+        )
@@ -0,0 +1,146 @@
+import json
+import shutil
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from benchmarks.benchmark import BenchmarkResult
+from benchmarks.binary_size import BinarySections
+from benchmarks.job import BenchmarkJob
+from benchmarks.planner import PGO_BUILD_ARGS
+from util.hashing import hash_file, hash_json
+
+
+def job_fingerprint(job: BenchmarkJob) -> str:
+    """
+    Hash of everything that determines a job's binary and measurements, so a
+    resumed campaign only reuses work done with the same inputs.
+    """
+    benchmark = job.benchmark
+    return hash_json({
+        "job": job.id,
+        "build": benchmark._build_cache_inputs(job.compiler, job.optimization_level, PGO_BUILD_ARGS.get(job.optimization_level, [])),
+        "profile_filter": asdict(job.profile_filter) if job.profile_filter is not None else None,
+        "profiling": {
+            "runs": benchmark.profiling_runs(job.compiler),
+            "normalize": benchmark.options.profile_merge_normalize,
+            "decay": benchmark.options.profile_merge_decay,
+        } if job.optimization_level in PGO_BUILD_ARGS else None,
+        "run": {
+            "benchmark_runner_args": benchmark.benchmark_runner_args,
+            "benchmark_args": benchmark.benchmark_args,
+            "iteration_args": benchmark.iteration_args,
+            "n_runs": benchmark.n_runs,
+        },
+        "adaptive": {
+            "enabled": benchmark.options.adaptive_runs,
+            "min_runs": benchmark.options.adaptive_min_runs,
+            "max_runs": benchmark.options.adaptive_max_runs,
+            "target_relative_ci": benchmark.options.adaptive_target_relative_ci,
+            "confidence": benchmark.options.adaptive_confidence,
+        },
+    })
+
+
+@dataclass
+class JobCheckpoint:
+    fingerprint: str
+    binary_sha256: str | None = field(default=None)
+    build_command: list[str] | None = field(default=None)
+    binary_sections: dict | None = field(default=None)
+    runs: list[dict] | None = field(default=None)
+
+    def restore_build(self, job: BenchmarkJob) -> None:
+        """Set what the build of the job left on its benchmark, as when it was built."""
+        job.benchmark.build_command = self.build_command
+        job.benchmark.binary_sections = BinarySections(**self.binary_sections) if self.binary_sections is not None else None
+
+
+class CampaignCheckpoint:
+    """
+    On-disk record of the progress of a campaign: the result store campaign
+    it writes to, the benchmarks whose agent has run, and per job whether its
+    binary was built and which runs were measured, written as soon as each
+    of those finishes.
+    """
+
+    CAMPAIGN_FILE_NAME = "campaign.json"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.campaign = self._read(self.directory / self.CAMPAIGN_FILE_NAME) or {"campaign_id": None, "agents": []}
+
+    @staticmethod
+    def _read(path: Path) -> dict | None:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _write(path: Path, data: dict) -> None:
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        tmp_path.replace(path)
+
+    def reset(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory.mkdir(parents=True)
+        self.campaign = {"campaign_id": None, "agents": []}
+
+    @property
+    def campaign_id(self) -> int | None:
+        return self.campaign["campaign_id"]
+
+    @campaign_id.setter
+    def campaign_id(self, campaign_id: int) -> None:
+        self.campaign["campaign_id"] = campaign_id
+        self._write(self.directory / self.CAMPAIGN_FILE_NAME, self.campaign)
+
+    def has_run_agent(self, benchmark_name: str) -> bool:
+        return benchmark_name in self.campaign["agents"]
+
+    def mark_agent_run(self, benchmark_name: str) -> None:
+        self.campaign["agents"].append(benchmark_name)
+        self._write(self.directory / self.CAMPAIGN_FILE_NAME, self.campaign)
+
+    def _job_path(self, job: BenchmarkJob) -> Path:
+        return self.directory / f"{job.id}.json"
+
+    def load(self, job: BenchmarkJob, fingerprint: str) -> JobCheckpoint | None:
+        data = self._read(self._job_path(job))
+        if data is None or data.get("fingerprint") != fingerprint:
+            return None
+
+        return JobCheckpoint(**data)
+
+    def is_built(self, job: BenchmarkJob, fingerprint: str) -> bool:
+        checkpoint = self.load(job, fingerprint)
+        if checkpoint is None or checkpoint.binary_sha256 is None or not job.benchmark.binary_path.exists():
+            return False
+        if hash_file(job.benchmark.binary_path) != checkpoint.binary_sha256:
+            return False
+
+        checkpoint.restore_build(job)
+        return True
+
+    def completed_runs(self, job: BenchmarkJob, fingerprint: str) -> list[BenchmarkResult] | None:
+        checkpoint = self.load(job, fingerprint)
+        if checkpoint is None or checkpoint.runs is None:
+            return None
+
+        checkpoint.restore_build(job)
+        return [BenchmarkResult.from_dict(run) for run in checkpoint.runs]
+
+    def mark_built(self, job: BenchmarkJob, fingerprint: str) -> None:
+        binary_sha256 = hash_file(job.benchmark.binary_path) if job.benchmark.binary_path.exists() else None
+        binary_sections = asdict(job.benchmark.binary_sections) if job.benchmark.binary_sections is not None else None
+        self._write(self._job_path(job), asdict(JobCheckpoint(fingerprint, binary_sha256, job.benchmark.build_command, binary_sections)))
+
+    def mark_measured(self, job: BenchmarkJob, fingerprint: str, runs: list[BenchmarkResult]) -> None:
+        checkpoint = self.load(job, fingerprint) or JobCheckpoint(fingerprint, build_command=job.benchmark.build_command,
+                                                                  binary_sections=asdict(job.benchmark.binary_sections) if job.benchmark.binary_sections is not None else None)
+        checkpoint.runs = [run.to_dict() for run in runs]
+        self._write(self._job_path(job), asdict(checkpoint))
@@ -1,6 +1,11 @@
 from enum import Enum
+from functools import cache
+import hashlib
+from pathlib import Path
+import subprocess
 
 from config.options import ConfigOptions
+from util.git import get_commit, get_diff
 
 
 class Compiler(Enum):
@@ -18,3 +23,23 @@ class Compiler(Enum):
                 return "mx -p /workspace/graal/substratevm native-image"
             case _:
                 raise ValueError(f"Unknown compiler: {self.name}")
+
+    def get_version(self, options: ConfigOptions) -> str:
+        return _get_native_image_version(self.get_command(options))
+
+
+@cache
+def _get_native_image_version(command: str) -> str:
+    """
+    Identify the native-image behind a command. For compilers built from
+    source with mx the reported version does not change between commits, so
+    the commit and uncommitted changes of the suite are included as well.
+    """
+    args = command.split()
+    version = subprocess.check_output([*args, "--version"], text = True, stderr = subprocess.STDOUT).strip()
+
+    if args[0] == "mx" and "-p" in args:
+        suite_dir = Path(args[args.index("-p") + 1])
+        version += f"\n{get_commit(suite_dir)} {hashlib.sha256(get_diff(suite_dir)).hexdigest()}"
+
+    return version
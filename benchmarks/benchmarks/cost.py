@@ -0,0 +1,278 @@
+import heapq
+import re
+from dataclasses import dataclass, field, replace
+from statistics import median
+
+from benchmarks.benchmark import BenchmarkUnit
+from benchmarks.job import BenchmarkJob
+from benchmarks.optimization_level import OptimizationLevel
+from benchmarks.planner import PGO_BUILD_ARGS
+from benchmarks.result_store import ResultStore
+from config.options import ConfigOptions
+from util.color import ANSIColorCode as C
+
+# Used for jobs of benchmarks that never ran before
+DEFAULT_BUILD_SECONDS = 10 * 60
+DEFAULT_RUN_SECONDS = 60
+# Fewest runs a budget shortens a job to, and the jobs it never drops
+MIN_BUDGET_RUNS = 2
+BASELINE_OPTIMIZATION_LEVEL = OptimizationLevel.O0
+DURATION_PATTERN = re.compile(r"^(?:(?P<hours>\d+(?:\.\d+)?)h)?(?:(?P<minutes>\d+(?:\.\d+)?)m)?(?:(?P<seconds>\d+(?:\.\d+)?)s)?$")
+
+
+def parse_duration(text: str) -> float:
+    """Seconds of a duration like "6h", "90m" or "1h30m"; a plain number is hours."""
+    try:
+        return float(text) * 3600
+    except ValueError:
+        pass
+
+    if not text or not (m := DURATION_PATTERN.match(text.strip())):
+        raise ValueError(f"Expected a duration like 6h, 90m or 1h30m, got '{text}'")
+
+    return 3600 * float(m.group("hours") or 0) + 60 * float(m.group("minutes") or 0) + float(m.group("seconds") or 0)
+
+
+def format_duration(seconds: float) -> str:
+    minutes = round(seconds / 60)
+    return f"{minutes // 60}h {minutes % 60:02d}m" if minutes >= 60 else f"{minutes}m"
+
+
+def profile_task_id(job: BenchmarkJob) -> str:
+    """Id of the profiling task a PGO job depends on, as in CampaignPlan."""
+    return f"{job.benchmark.name}-{job.compiler.value}-profile"
+
+
+def makespan(durations: dict[str, float], workers: int, dependencies: dict[str, list[str]] | None = None) -> float:
+    """
+    Time to run the tasks on `workers` parallel workers, starting the ready
+    task with the longest remaining chain of dependents first whenever a
+    worker is free.
+    """
+    dependencies = dependencies or {}
+    dependents: dict[str, list[str]] = {task: [] for task in durations}
+    for task, required in dependencies.items():
+        for dependency in required:
+            dependents[dependency].append(task)
+
+    chains: dict[str, float] = {}
+
+    def chain(task: str) -> float:
+        if task not in chains:
+            chains[task] = durations[task] + max((chain(dependent) for dependent in dependents[task]), default=0.0)
+        return chains[task]
+
+    waiting = {task: len(dependencies.get(task, [])) for task in durations}
+    ready = [(-chain(task), task) for task, count in waiting.items() if count == 0]
+    heapq.heapify(ready)
+    running: list[tuple[float, str]] = []
+    now = 0.0
+
+    while ready or running:
+        while ready and len(running) < workers:
+            _, task = heapq.heappop(ready)
+            heapq.heappush(running, (now + durations[task], task))
+        now, task = heapq.heappop(running)
+        for dependent in dependents[task]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                heapq.heappush(ready, (-chain(dependent), dependent))
+
+    return now
+
+
+class CostModel:
+    """
+    Durations of builds and runs from the history in the result store: the
+    median of the same job if it ran before, else of the same benchmark in
+    any configuration, else of everything, else a default.
+    """
+
+    def __init__(self, builds: list[dict], runs: list[dict]):
+        self._build_seconds = self._medians(builds, lambda row: [("job", row["task"]), ("benchmark", row["benchmark"]), ("all",)], "wall_time_seconds")
+        self._run_seconds = self._medians(
+            runs, lambda row: [("job", row["benchmark"], row["compiler"], row["optimization_level"]), ("benchmark", row["benchmark"]), ("all",)], "seconds")
+
+        runs_per_job: dict[tuple, int] = {}
+        for row in runs:
+            key = (row["campaign_id"], row["benchmark"], row["compiler"], row["optimization_level"])
+            runs_per_job[key] = runs_per_job.get(key, 0) + 1
+        counts: dict[tuple, list[int]] = {}
+        for (_, *job), count in runs_per_job.items():
+            counts.setdefault(tuple(job), []).append(count)
+        self._runs_per_job = {job: round(median(values)) for job, values in counts.items()}
+
+    @staticmethod
+    def _medians(rows: list[dict], keys, column: str) -> dict[tuple, float]:
+        values: dict[tuple, list[float]] = {}
+        for row in rows:
+            if row[column] is None:
+                continue
+            for key in keys(row):
+                values.setdefault(key, []).append(row[column])
+
+        return {key: median(durations) for key, durations in values.items()}
+
+    @classmethod
+    def from_store(cls, store: ResultStore) -> "CostModel":
+        builds = [dict(row) for row in store.connection.execute("SELECT task, benchmark, wall_time_seconds FROM builds WHERE cached = 0").fetchall()]
+        runs = []
+        for row in store.connection.execute("SELECT campaign_id, benchmark, compiler, optimization_level, unit, result, wall_time_seconds FROM runs WHERE warmup = 0").fetchall():
+            # Runs recorded without their wall time took at least as long as they measured
+            seconds = row["wall_time_seconds"]
+            if seconds is None and row["unit"] == BenchmarkUnit.EXECUTION_TIME.value:
+                seconds = row["result"] / 1000
+            runs.append({**dict(row), "seconds": seconds})
+
+        return cls(builds, runs)
+
+    @staticmethod
+    def _lookup(medians: dict[tuple, float], keys: list[tuple], default: float) -> tuple[float, str]:
+        for key in keys:
+            if key in medians:
+                return medians[key], key[0]
+
+        return default, "default"
+
+    def build_seconds(self, task: str, benchmark: str) -> tuple[float, str]:
+        return self._lookup(self._build_seconds, [("job", task), ("benchmark", benchmark), ("all",)], DEFAULT_BUILD_SECONDS)
+
+    def run_seconds(self, job: BenchmarkJob) -> tuple[float, str]:
+        return self._lookup(self._run_seconds, [("job", job.benchmark.name, job.compiler.name, job.optimization_level_label), ("benchmark", job.benchmark.name), ("all",)],
+                            DEFAULT_RUN_SECONDS)
+
+    def n_runs(self, job: BenchmarkJob, options: ConfigOptions) -> int:
+        """Runs of a job: as configured, or as many as adaptive measurement took before."""
+        if not options.adaptive_runs or job.benchmark.n_runs == 0:
+            return job.benchmark.n_runs
+
+        return self._runs_per_job.get((job.benchmark.name, job.compiler.name, job.optimization_level_label), options.adaptive_min_runs)
+
+
+@dataclass
+class JobEstimate:
+    job: BenchmarkJob
+    build_seconds: float
+    run_seconds: float
+    n_runs: int
+    # What the estimate is based on: the same job, the same benchmark, all
+    # history or the defaults
+    build_source: str
+    run_source: str
+
+    @property
+    def measure_seconds(self) -> float:
+        return self.run_seconds * self.n_runs
+
+    @property
+    def total_seconds(self) -> float:
+        return self.build_seconds + self.measure_seconds
+
+
+@dataclass
+class CampaignEstimate:
+    """
+    Estimated cost of every job of a campaign, in priority order, and the
+    wall time of the campaign: the builds in parallel on the build workers,
+    with the profiling of PGO jobs before their builds, followed by the
+    measurements, single-threaded ones in parallel on the measurement slots
+    and the others one at a time.
+    """
+    jobs: list[JobEstimate]
+    profile_seconds: dict[str, float] = field(default_factory=dict)
+    build_workers: int = field(default=1)
+    measurement_slots: int = field(default=1)
+
+    @classmethod
+    def for_jobs(cls, jobs: list[BenchmarkJob], model: CostModel, options: ConfigOptions, built_jobs: set[BenchmarkJob] = frozenset()) -> "CampaignEstimate":
+        estimates, profile_seconds = [], {}
+        for job in jobs:
+            run_seconds, run_source = model.run_seconds(job)
+            build_seconds, build_source = (0.0, "built") if job in built_jobs else model.build_seconds(job.id, job.benchmark.name)
+            estimates.append(JobEstimate(job, build_seconds, run_seconds, model.n_runs(job, options), build_source, run_source))
+
+            if job not in built_jobs and job.optimization_level in PGO_BUILD_ARGS and (task := profile_task_id(job)) not in profile_seconds:
+                instrumented_build_seconds, _ = model.build_seconds(task, job.benchmark.name)
+                profile_seconds[task] = instrumented_build_seconds + len(job.benchmark.profiling_runs(job.compiler)) * run_seconds
+
+        return cls(estimates, profile_seconds, options.build_workers, options.concurrent_measurements if options.pin_measurements else 1)
+
+    def with_jobs(self, jobs: list[JobEstimate]) -> "CampaignEstimate":
+        needed = {profile_task_id(estimate.job) for estimate in jobs if estimate.build_seconds and estimate.job.optimization_level in PGO_BUILD_ARGS}
+        return replace(self, jobs=jobs, profile_seconds={task: seconds for task, seconds in self.profile_seconds.items() if task in needed})
+
+    def remaining(self, built: set[BenchmarkJob], done: set[BenchmarkJob], profiled: set[str] = frozenset()) -> "CampaignEstimate":
+        """The estimate of what is left once the given jobs are built or done and the given profiling tasks ran."""
+        estimate = self.with_jobs([replace(e, build_seconds=0.0, build_source="built") if e.job in built else e for e in self.jobs if e.job not in done])
+        return replace(estimate, profile_seconds={task: seconds for task, seconds in estimate.profile_seconds.items() if task not in profiled})
+
+    @property
+    def build_wall_seconds(self) -> float:
+        durations = {**self.profile_seconds, **{estimate.job.id: estimate.build_seconds for estimate in self.jobs if estimate.build_seconds}}
+        dependencies = {
+            estimate.job.id: [profile_task_id(estimate.job)]
+            for estimate in self.jobs if estimate.job.id in durations and profile_task_id(estimate.job) in self.profile_seconds
+        }
+        return makespan(durations, self.build_workers, dependencies)
+
+    @property
+    def measure_wall_seconds(self) -> float:
+        parallel = {estimate.job.id: estimate.measure_seconds for estimate in self.jobs if estimate.job.benchmark.single_threaded}
+        exclusive = sum(estimate.measure_seconds for estimate in self.jobs if not estimate.job.benchmark.single_threaded)
+        return makespan(parallel, self.measurement_slots) + exclusive
+
+    @property
+    def wall_seconds(self) -> float:
+        return self.build_wall_seconds + self.measure_wall_seconds
+
+    def longest_first(self) -> list[BenchmarkJob]:
+        return [estimate.job for estimate in sorted(self.jobs, key=lambda estimate: estimate.total_seconds, reverse=True)]
+
+
+def fit_to_budget(estimate: CampaignEstimate, budget_seconds: float, shorten: bool = True, min_runs: int = MIN_BUDGET_RUNS) -> tuple[CampaignEstimate, dict[BenchmarkJob, int], list[BenchmarkJob]]:
+    """
+    Fit a campaign into `budget_seconds` of wall time, lowest priority job
+    (the last in the estimate) first: first run jobs fewer times, down to
+    `min_runs`, then drop jobs, except those at the baseline optimization
+    level the speedups are relative to. Returns the estimate of what is
+    left, the new number of runs of the shortened jobs and the dropped jobs.
+    """
+    jobs = list(estimate.jobs)
+    shortened: dict[BenchmarkJob, int] = {}
+
+    def over_budget() -> bool:
+        return estimate.with_jobs(jobs).wall_seconds > budget_seconds
+
+    if shorten:
+        for i in reversed(range(len(jobs))):
+            while jobs[i].n_runs > min_runs and over_budget():
+                jobs[i] = replace(jobs[i], n_runs=jobs[i].n_runs - 1)
+                shortened[jobs[i].job] = jobs[i].n_runs
+
+    dropped = []
+    for i in reversed(range(len(jobs))):
+        if not over_budget():
+            break
+        if jobs[i].job.optimization_level != BASELINE_OPTIMIZATION_LEVEL:
+            dropped.append(jobs.pop(i).job)
+            shortened.pop(dropped[-1], None)
+
+    return estimate.with_jobs(jobs), shortened, dropped
+
+
+def print_estimate(estimate: CampaignEstimate, limit: int | None = None) -> None:
+    """Print the jobs of the estimate, longest first (only the `limit` longest), and the total wall time."""
+    by_job = {estimate.job: estimate for estimate in estimate.jobs}
+    longest = estimate.longest_first()
+    for job in longest[:limit]:
+        job_estimate = by_job[job]
+        print(f"  {C.GRAY}{job.id:<56} build: {format_duration(job_estimate.build_seconds):>8} ({job_estimate.build_source:<9})"
+              f"  runs: {job_estimate.n_runs:>2} × {job_estimate.run_seconds:>7.1f}s ({job_estimate.run_source:<9})  total: {format_duration(job_estimate.total_seconds):>8}{C.ENDC}")
+    if limit is not None and len(longest) > limit:
+        print(f"  {C.GRAY}... and {len(longest) - limit} more job(s){C.ENDC}")
+    if estimate.profile_seconds:
+        print(f"  {C.GRAY}{len(estimate.profile_seconds)} profiling task(s): {format_duration(sum(estimate.profile_seconds.values()))}{C.ENDC}")
+
+    print(f"{C.OKBLUE}Estimated wall time of {len(estimate.jobs)} job(s): {format_duration(estimate.wall_seconds)} "
+          f"(building {format_duration(estimate.build_wall_seconds)} on {estimate.build_workers} worker(s), "
+          f"measuring {format_duration(estimate.measure_wall_seconds)} on {estimate.measurement_slots} slot(s)){C.ENDC}")
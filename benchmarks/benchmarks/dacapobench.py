@@ -1,9 +1,11 @@
 from dataclasses import dataclass, field
 from pathlib import Path
-import re
+from typing import ClassVar
 import subprocess
 from benchmarks.benchmark import Benchmark, BenchmarkUnit
 from util.color import ANSIColorCode as C
+from util.hashing import hash_path
+from util.process import run_streaming
 from benchmarks.compiler import Compiler
 from benchmarks.optimization_level import OptimizationLevel
 
@@ -13,8 +15,11 @@ class DacapoBenchmark(Benchmark):
     version: str = field(default = "23.11-MR2")
     context_path: Path = field(default = Path("/data/dacapobench"))
     n_runs: int = field(default = 5)
+    iterations: int | None = field(default = None)
     unit: BenchmarkUnit = field(default = BenchmarkUnit.EXECUTION_TIME, init = False)
 
+    RESULT_PATTERN: ClassVar[str] = r".* in (\d+) msec .*"
+
     @property
     def launcher_dir(self) -> Path:
         return self.context_path / f"dacapo-{self.version}-chopin" / "launchers"
@@ -28,39 +33,78 @@ class DacapoBenchmark(Benchmark):
         return self.context_path / f"{self.name}-config"
 
     @staticmethod
-    def _extract_result(output: str) -> float:
-        if m := re.search(r".* in (\d+) msec .*", output, re.MULTILINE):
-            return float(m.group(1))
+    def _extract_result(matches: list[tuple[str, ...]]) -> float:
+        # With several iterations, the last one is the timed one
+        if matches:
+            return float(matches[-1][0])
+
+        raise ValueError("Could not extract execution time from output")
 
-        raise ValueError(f"Could not extract execution time from output: {output}")
+    @staticmethod
+    def _extract_iterations(matches: list[tuple[str, ...]]) -> list[float]:
+        return [float(match[0]) for match in matches]
+
+    @property
+    def iteration_args(self) -> list[str]:
+        return ["-n", str(self.iterations)] if self.iterations is not None else []
+
+    @property
+    def single_threaded(self) -> bool:
+        args = self.benchmark_args
+        return any(arg in ("-t", "--thread-count") and args[i + 1:i + 2] == ["1"] for i, arg in enumerate(args)) or "--thread-count=1" in args
+
+    @property
+    def agent_log_path(self) -> Path:
+        return self.context_path / f"{self.name}-agent.log"
 
-    def run_agent(self, vm_binary: str = "java") -> int:
-        return subprocess.call([
+    def run_agent(self, vm_binary: str = "java", output_dir: Path | None = None, benchmark_args: list[str] | None = None, cwd: Path | None = None) -> int:
+        return run_streaming([
             vm_binary,
-            f"-agentlib:native-image-agent=config-output-dir={self.config_dir.absolute().as_posix()}",
-            "-jar", self.jar_path.as_posix(), 
-            self.name
-        ], stderr = subprocess.STDOUT, stdout = subprocess.DEVNULL, cwd = self.context_path.as_posix())
+            f"-agentlib:native-image-agent=config-output-dir={(output_dir or self.config_dir).absolute().as_posix()}",
+            "-jar", self.jar_path.absolute().as_posix(),
+            self.name,
+            *(benchmark_args if benchmark_args is not None else self.benchmark_args),
+        ], self.agent_log_path, cwd = cwd or self.context_path, timeout = self.options.agent_timeout_seconds).returncode
+
+    def agent_cache_inputs(self) -> dict | None:
+        return {"benchmark": self.name, "version": self.version, "jar": hash_path(self.jar_path)}
 
-    def build_native_image(self, compiler: Compiler, optimization_level = OptimizationLevel.O3, additional_build_args = []) -> int:
+    def _build_input_paths(self) -> list[Path]:
+        return [self.jar_path, self.config_dir]
+
+    def _get_build_command(self, compiler: Compiler, optimization_level = OptimizationLevel.O3, additional_build_args = []) -> list[str]:
         command = [
             *compiler.get_command(self.options).split(),
             optimization_level.value,
             "-H:+PlatformInterfaceCompatibilityMode",
-            f"-H:ConfigurationFileDirectories=./{self.config_dir.relative_to(self.context_path).as_posix()}",
+            f"-H:ConfigurationFileDirectories={self.config_dir.absolute().as_posix()}",
             *self.native_image_args,
+            *self.build_parallelism_args,
             *additional_build_args,
-            "-jar", self.jar_path.as_posix(),
+            "-jar", self.jar_path.absolute().as_posix(),
             "-march=native",
+            "-o", self.name,
         ]
+
+        return [x for x in command if x]
+
+    def _build_native_image(self, compiler: Compiler, optimization_level = OptimizationLevel.O3, additional_build_args = []) -> int:
+        command = self._get_build_command(compiler, optimization_level, additional_build_args)
         print(f"{C.GRAY}Building native image with command: {' '.join(command)}{C.ENDC}")
-        return subprocess.call(command, stderr = subprocess.STDOUT, cwd = self.context_path.as_posix())
+
+        returncode = self._run_build_command(command, compiler, optimization_level)
+
+        if returncode != 0:
+            raise RuntimeError(f"Failed to build native image (exit code {returncode}), see {self.build_log_path}")
+
+        return returncode
 
     def _get_run_command(self, additional_args: list[str] = []) -> list[str]:
         return [
             self.binary_path.absolute().as_posix(),
             *self.benchmark_runner_args,
             self.name,
+            *self.iteration_args,
             *self.benchmark_args,
             *additional_args
         ]
@@ -73,6 +117,6 @@ class FopBenchmark(DacapoBenchmark):
         fop_config = self.config_dir / "empty"
         subprocess.call(["touch", fop_config.as_posix()])
 
-        self.native_image_args.extend([
-            f"-Djava.util.logging.config.file={fop_config.as_posix()}"
-        ])
+        logging_config_arg = f"-Djava.util.logging.config.file={fop_config.as_posix()}"
+        if logging_config_arg not in self.native_image_args:
+            self.native_image_args.append(logging_config_arg)
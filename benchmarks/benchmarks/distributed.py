@@ -0,0 +1,361 @@
+import base64
+import fcntl
+import gzip
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Iterator
+
+from benchmarks.adaptive import StoppingRule, run_benchmark
+from benchmarks.agent import collect_agent_config
+from benchmarks.benchmark import Benchmark, BenchmarkResult, read_benchmarks_from_file
+from benchmarks.job import BenchmarkJob
+from benchmarks.measurement import MeasurementExecutor
+from benchmarks.planner import PGO_BUILD_ARGS, build_job
+from benchmarks.compiler import Compiler
+from config.config import Config
+from config.options import ConfigOptions
+from util.color import ANSIColorCode as C
+
+PROTOCOL_VERSION = 2
+HEARTBEAT_INTERVAL = 30.0
+HEARTBEAT_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+MAX_ATTEMPTS = 3
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"Expected an address of the form host:port, got '{address}'")
+
+    return host or "0.0.0.0", int(port)
+
+
+class _ReusableTCPServer(socketserver.ThreadingTCPServer):
+    # A restarted coordinator can bind its port again while old connections linger
+    allow_reuse_address = True
+
+
+class Connection:
+    """
+    Newline-delimited JSON messages over a socket. Sending is thread-safe.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile("r", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def send(self, message: dict) -> None:
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        with self.lock:
+            self.sock.sendall(data)
+
+    def receive(self) -> dict | None:
+        line = self.reader.readline()
+        return json.loads(line) if line else None
+
+    def close(self) -> None:
+        self.reader.close()
+        self.sock.close()
+
+
+@dataclass
+class JobOutcome:
+    """
+    What a worker sent back for a job: its runs and the command its binary
+    was built with, the builds it did for it and the profiles it dumped, or
+    the error it failed with.
+    """
+    job: BenchmarkJob
+    worker: str
+    host: str
+    runs: list[BenchmarkResult] = field(default_factory=list)
+    build_command: list[str] | None = field(default=None)
+    builds: list[dict] = field(default_factory=list)
+    profiles: dict[str, bytes] = field(default_factory=dict, repr=False)
+    error: str | None = field(default=None)
+
+
+class Coordinator:
+    """
+    Hands out jobs to workers that connect over TCP and collects what they
+    send back. The jobs of a worker that disconnects or stops sending
+    heartbeats are given to another worker, up to `max_attempts` times.
+
+    Protocol (one JSON object per line):
+      worker -> {"type": "hello", "protocol": 2, "worker": id, "host": hostname}
+      coordinator -> {"type": "welcome", "campaign_id": id, "config": config file contents}
+      worker -> {"type": "ready"}
+      coordinator -> {"type": "job", "job": job id, "n_runs": runs} | {"type": "done"}
+      worker -> {"type": "result", "job": job id, "runs": [...], "build_command": [...], "builds": [...], "profiles": {...}}
+              | {"type": "error", "job": job id, "error": message}
+              | {"type": "heartbeat"} (at any time)
+    """
+
+    def __init__(self, jobs: list[BenchmarkJob], campaign_id: int, config: dict, address: tuple[str, int],
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+        self.jobs = {job.id: job for job in jobs}
+        self.campaign_id = campaign_id
+        self.config = config
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+
+        self.pending = deque(jobs)
+        self.attempts: Counter[str] = Counter()
+        self.remaining = len(jobs)
+        self.workers: set[str] = set()
+        self.condition = threading.Condition()
+        self._outcomes: queue.Queue[JobOutcome] = queue.Queue()
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                coordinator._handle(Connection(self.request))
+
+        self.server = _ReusableTCPServer(address, Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def __enter__(self) -> "Coordinator":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        with self.condition:
+            self.remaining = 0
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _next_job(self, worker: str) -> BenchmarkJob | None:
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending or self.remaining == 0)
+            if self.remaining == 0:
+                return None
+            return self.pending.popleft()
+
+    def _finish(self, outcome: JobOutcome) -> None:
+        with self.condition:
+            self.remaining -= 1
+            self._outcomes.put(outcome)
+            self.condition.notify_all()
+
+    def _reassign(self, worker: str, host: str, job: BenchmarkJob, reason: str) -> None:
+        with self.condition:
+            self.attempts[job.id] += 1
+            if self.attempts[job.id] < self.max_attempts:
+                print(f"{C.WARNING}Worker {worker} failed ({reason}), reassigning {job.id}{C.ENDC}")
+                self.pending.appendleft(job)
+                self.condition.notify_all()
+                return
+
+        self._finish(JobOutcome(job, worker, host, error=f"Gave up after {self.max_attempts} worker failures, last: {reason}"))
+
+    def _handle(self, connection: Connection) -> None:
+        hello = connection.receive()
+        if hello is None or hello.get("type") != "hello" or hello.get("protocol") != PROTOCOL_VERSION:
+            connection.send({"type": "rejected", "reason": f"Expected a hello message with protocol version {PROTOCOL_VERSION}"})
+            return
+
+        worker, host = hello["worker"], hello["host"]
+        with self.condition:
+            if worker in self.workers:
+                connection.send({"type": "rejected", "reason": f"A worker named {worker} is already connected"})
+                return
+            self.workers.add(worker)
+
+        print(f"{C.OKBLUE}Worker {worker} connected from {host}{C.ENDC}")
+        connection.sock.settimeout(self.heartbeat_timeout)
+        job, reason = None, "disconnected"
+        try:
+            connection.send({"type": "welcome", "campaign_id": self.campaign_id, "config": self.config})
+            while (message := connection.receive()) is not None:
+                match message["type"]:
+                    case "heartbeat":
+                        continue
+                    case "ready":
+                        job = self._next_job(worker)
+                        if job is None:
+                            connection.send({"type": "done"})
+                            return
+                        connection.send({"type": "job", "job": job.id, "n_runs": job.benchmark.n_runs})
+                    case "result" | "error" if job is not None and message.get("job") == job.id:
+                        self._finish(JobOutcome(
+                            job, worker, host,
+                            runs=[BenchmarkResult.from_dict(run) for run in message.get("runs", [])],
+                            build_command=message.get("build_command"),
+                            builds=message.get("builds", []),
+                            profiles={name: gzip.decompress(base64.b64decode(data)) for name, data in message.get("profiles", {}).items()},
+                            error=message.get("error"),
+                        ))
+                        job = None
+                    case _:
+                        raise ValueError(f"Unexpected message from worker {worker}: {message['type']}")
+        except (OSError, ValueError) as e:
+            reason = str(e) or type(e).__name__
+        except Exception as e:
+            # E.g. a malformed result, which is logged as it points at a bug in the worker
+            reason = f"{type(e).__name__}: {e}"
+            print(f"{C.FAIL}Error while handling worker {worker}: {reason}{C.ENDC}")
+        finally:
+            with self.condition:
+                self.workers.discard(worker)
+            # On any exception, or the campaign would wait for the job forever
+            if job is not None:
+                self._reassign(worker, host, job, reason)
+
+        print(f"{C.WARNING}Worker {worker} disconnected{C.ENDC}")
+
+    def outcomes(self, workers_alive=lambda: True) -> Iterator[JobOutcome]:
+        """
+        Yield the outcome of every job as it arrives. Raises RuntimeError if
+        `workers_alive` reports that no worker will connect anymore while
+        jobs are left.
+        """
+        while True:
+            with self.condition:
+                if self.remaining == 0 and self._outcomes.empty():
+                    return
+            try:
+                yield self._outcomes.get(timeout=1.0)
+            except queue.Empty:
+                with self.condition:
+                    if not self.workers and not workers_alive():
+                        raise RuntimeError(f"No workers left with {self.remaining} job(s) to do")
+
+
+class Worker:
+    """
+    Builds and measures the jobs a coordinator hands out, one at a time,
+    and sends the results back. Binaries are built in a directory of their
+    own per worker, so several workers can share a machine; pinned
+    measurements then only use the worker's `slot_share` of the core slots.
+    """
+
+    def __init__(self, address: tuple[str, int], worker_id: str | None = None, slot_share: tuple[int, int] | None = None):
+        self.address = address
+        self.slot_share = slot_share
+        self.host = socket.gethostname()
+        self.worker_id = worker_id or f"{self.host}-{os.getpid()}"
+        self.profiles: dict[tuple[str, Compiler], Path] = {}
+        self.agents_run: set[str] = set()
+
+    def _job_for_worker(self, job: BenchmarkJob, n_runs: int | None = None) -> BenchmarkJob:
+        """
+        The job built in this worker's own directory, run `n_runs` times if
+        the coordinator changed that (to fit a budget).
+        """
+        benchmark = job.benchmark.with_output_dir(self._build_root(job.benchmark) / job.id)
+        return replace(job, benchmark=replace(benchmark, n_runs=n_runs) if n_runs is not None else benchmark)
+
+    def _build_root(self, benchmark: Benchmark) -> Path:
+        return benchmark.context_path / "builds" / self.worker_id
+
+    def _run_agent_once(self, benchmark: Benchmark, options: ConfigOptions) -> None:
+        """
+        Bring the agent configuration of a benchmark up to date once per
+        worker, holding a lock since workers on the same machine share its
+        configuration directory.
+        """
+        if benchmark.name in self.agents_run:
+            return
+
+        with open(benchmark.context_path / f".{benchmark.name}-agent.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            outcome = collect_agent_config(benchmark, options.java_bin_path.as_posix(), options.agent_merge_existing_config)
+            print(f"{C.GRAY}Agent configuration of {benchmark.name} {outcome.value}{C.ENDC}")
+        self.agents_run.add(benchmark.name)
+
+    @staticmethod
+    def _build_record(task: str, benchmark: Benchmark) -> dict:
+        return {"task": task, "benchmark": benchmark.name, "build_command": benchmark.build_command, "stats": asdict(benchmark.build_stats)}
+
+    def execute(self, job: BenchmarkJob, config: Config, campaign_id: int) -> dict:
+        options = config.options
+        if not options.skip_agent:
+            self._run_agent_once(job.benchmark, options)
+
+        builds, profiles = [], {}
+        profile_path = None
+        if job.optimization_level in PGO_BUILD_ARGS:
+            key = (job.benchmark.name, job.compiler)
+            if key not in self.profiles:
+                task = f"{job.benchmark.name}-{job.compiler.value}-profile"
+                profiling_benchmark = job.benchmark.with_output_dir(self._build_root(job.benchmark) / task)
+                self.profiles[key] = profiling_benchmark.collect_profile(job.compiler)
+                if profiling_benchmark.build_stats is not None:
+                    builds.append(self._build_record(task, profiling_benchmark))
+                dumped_profile = options.profiling_data_output_dir_path / f"{job.benchmark.name}-{job.compiler.value}.json"
+                if options.dump_profiling_data and dumped_profile.exists():
+                    profiles[dumped_profile.name] = base64.b64encode(gzip.compress(dumped_profile.read_bytes())).decode("ascii")
+            profile_path = self.profiles[key]
+
+        build_job(job, profile_path)
+        if job.benchmark.build_stats is not None:
+            builds.append(self._build_record(job.id, job.benchmark))
+
+        stopping_rule = StoppingRule.from_options(options) if options.adaptive_runs else None
+        with MeasurementExecutor.from_options(options, self.slot_share) as executor:
+            runs = executor.submit(lambda slot: run_benchmark(job.benchmark, stopping_rule, slot), exclusive=not job.benchmark.single_threaded).result()
+
+        return {"type": "result", "job": job.id, "runs": [run.to_dict() for run in runs], "build_command": job.benchmark.build_command, "builds": builds,
+                "profiles": profiles}
+
+    def run(self) -> None:
+        connection = Connection(socket.create_connection(self.address))
+        stop_heartbeat = threading.Event()
+
+        def heartbeat() -> None:
+            while not stop_heartbeat.wait(HEARTBEAT_INTERVAL):
+                try:
+                    connection.send({"type": "heartbeat"})
+                except OSError:
+                    return
+
+        try:
+            connection.send({"type": "hello", "protocol": PROTOCOL_VERSION, "worker": self.worker_id, "host": self.host})
+            welcome = connection.receive()
+            if welcome is None or welcome["type"] != "welcome":
+                raise RuntimeError(f"Coordinator rejected worker {self.worker_id}: {welcome.get('reason') if welcome else 'connection closed'}")
+            threading.Thread(target=heartbeat, daemon=True).start()
+
+            config = Config(**welcome["config"])
+            campaign_id = welcome["campaign_id"]
+            if config.options.dump_profiling_data:
+                config.options.profiling_data_output_dir_path.mkdir(parents=True, exist_ok=True)
+            benchmarks = read_benchmarks_from_file(config.options.benchmarks_file_path, config.options)
+            jobs = {job.id: job for jobs in config.create_jobs(benchmarks).values() for job in jobs}
+            config.check_installations()
+            print(f"{C.OKBLUE}Worker {self.worker_id} joined campaign {campaign_id} at {self.address[0]}:{self.address[1]}{C.ENDC}")
+
+            while True:
+                connection.send({"type": "ready"})
+                message = connection.receive()
+                if message is None or message["type"] == "done":
+                    break
+
+                job_id = message["job"]
+                print(f"{C.BOLD}Worker {self.worker_id}{C.ENDC} running {job_id}")
+                try:
+                    if job_id not in jobs:
+                        raise ValueError(f"Job {job_id} is not in the campaign config of this worker")
+                    response = self.execute(self._job_for_worker(jobs[job_id], message.get("n_runs")), config, campaign_id)
+                except Exception as e:
+                    print(f"{C.FAIL}Error while processing {job_id}: {e}{C.ENDC}")
+                    response = {"type": "error", "job": job_id, "error": str(e) or type(e).__name__}
+                connection.send(response)
+        finally:
+            stop_heartbeat.set()
+            connection.close()
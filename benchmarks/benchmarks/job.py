@@ -1,12 +1,11 @@
-from collections import defaultdict
-from dataclasses import dataclass, field
-import json
-
-from pathlib import Path
+from dataclasses import dataclass, field, replace
 
 from benchmarks.optimization_level import OptimizationLevel
 from benchmarks.benchmark import Benchmark
 from benchmarks.compiler import Compiler
+from profiling.filter import ProfileFilter
+
+PROFILE_FILTER_LEVELS = (OptimizationLevel.CUSTOM_PGO, OptimizationLevel.CUSTOM_PGO_O3, OptimizationLevel.CUSTOM_PGO_FULL, OptimizationLevel.CUSTOM_PGO_FULL_O3)
 
 
 @dataclass(frozen=True)
@@ -14,22 +13,48 @@ class BenchmarkJob:
     benchmark: Benchmark = field(hash=False)
     optimization_level: OptimizationLevel
     compiler: Compiler
+    profile_filter: ProfileFilter | None = field(default=None)
+
+    @property
+    def id(self) -> str:
+        job_id = f"{self.benchmark.name}-{self.compiler.value}-{self.optimization_level.name.lower()}"
+        return f"{job_id}-{self.profile_filter.name}" if self.profile_filter is not None else job_id
+
+    @property
+    def optimization_level_label(self) -> str:
+        """
+        Optimization level as recorded in the results, which names the
+        profile filter of pruned-profile variants.
+        """
+        if self.profile_filter is None:
+            return self.optimization_level.value
+        return f"{self.optimization_level.value} [{self.profile_filter.name}]"
+
+    @classmethod
+    def create(cls, benchmark: Benchmark, optimization_level: OptimizationLevel, compiler: Compiler, profile_filter: ProfileFilter | None = None) -> "BenchmarkJob":
+        """
+        Create a job whose benchmark builds and runs in its own directory, so
+        jobs of the same benchmark never overwrite each other's binaries.
+        """
+        if profile_filter is not None and (compiler != Compiler.CUSTOM_OPEN or optimization_level not in PROFILE_FILTER_LEVELS):
+            raise ValueError(f"Profile filter '{profile_filter.name}' only applies to the custom PGO levels of the {Compiler.CUSTOM_OPEN.name} compiler, not {compiler.name} {optimization_level.name}")
+
+        job = cls(benchmark=benchmark, optimization_level=optimization_level, compiler=compiler, profile_filter=profile_filter)
+        output_dir = benchmark.context_path / "builds" / job.id
+
+        return replace(job, benchmark=benchmark.with_output_dir(output_dir))
+
+
+def parse_job_level(level: str, profile_filters: dict[str, ProfileFilter]) -> tuple[OptimizationLevel, ProfileFilter | None]:
+    """
+    Parse an optimization level of a config file, optionally followed by the
+    name of a profile filter, e.g. "CUSTOM_PGO_O3:top4".
+    """
+    level_name, _, filter_name = level.partition(":")
+    if not filter_name:
+        return OptimizationLevel[level_name], None
+    if filter_name not in profile_filters:
+        raise ValueError(f"Unknown profile filter '{filter_name}' in '{level}', defined filters: {', '.join(profile_filters) or 'none'}")
+
+    return OptimizationLevel[level_name], profile_filters[filter_name]
 
-
-def read_jobs_from_config_file(config_file_path: Path, benchmarks: dict[str, Benchmark]) -> dict[str, list[BenchmarkJob]]:
-    with open(config_file_path, "r") as f:
-        config = json.load(f)
-
-    jobs = defaultdict(list)
-    for benchmark_name in config.get("benchmarks", []):
-        for compiler, optimization_levels in config.get("optimization_levels_by_compiler", {}).items():
-            for optimization_level in optimization_levels:
-                jobs[benchmark_name].append(
-                    BenchmarkJob(
-                        benchmark=benchmarks[benchmark_name],
-                        optimization_level=OptimizationLevel[optimization_level],
-                        compiler=Compiler[compiler]
-                    )
-                )
-
-    return jobs
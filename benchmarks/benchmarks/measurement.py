@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from config.options import ConfigOptions
+from util.system import format_cpu_list, physical_cores
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class CoreSlot:
+    """
+    A set of whole physical cores (with all of their SMT siblings) on one
+    NUMA node that measurements can be pinned to.
+    """
+    id: int
+    node: int | None
+    cpus: tuple[int, ...]
+
+    @property
+    def cpu_list(self) -> str:
+        return format_cpu_list(self.cpus)
+
+    @classmethod
+    def combine(cls, slots: list["CoreSlot"]) -> "CoreSlot":
+        nodes = {slot.node for slot in slots}
+        return cls(
+            id=-1,
+            node=nodes.pop() if len(nodes) == 1 else None,
+            cpus=tuple(sorted(cpu for slot in slots for cpu in slot.cpus)),
+        )
+
+
+def partition_core_slots(cores_per_slot: int = 1, reserved_cores: int = 1) -> list[CoreSlot]:
+    """
+    Partition the physical cores into slots of `cores_per_slot` cores that
+    do not cross NUMA nodes, leaving the first `reserved_cores` cores (which
+    usually handle interrupts) for the rest of the system.
+    """
+    if cores_per_slot < 1:
+        raise ValueError(f"A core slot needs at least one core, got {cores_per_slot}")
+
+    cores_by_node: dict[int | None, list[tuple[int, ...]]] = {}
+    for node, siblings in physical_cores()[reserved_cores:]:
+        cores_by_node.setdefault(node, []).append(siblings)
+
+    slots = []
+    for node, cores in cores_by_node.items():
+        for i in range(0, len(cores) - cores_per_slot + 1, cores_per_slot):
+            slots.append(CoreSlot(len(slots), node, tuple(cpu for core in cores[i:i + cores_per_slot] for cpu in core)))
+
+    return slots
+
+
+def parse_slot_share(text: str) -> tuple[int, int]:
+    """Parse "INDEX/COUNT", the share of the core slots of one of COUNT workers on a machine."""
+    index, _, count = text.partition("/")
+    if not (index.isdigit() and count.isdigit()) or not int(index) < int(count):
+        raise ValueError(f"Expected a share of the core slots of the form INDEX/COUNT with INDEX < COUNT, got '{text}'")
+
+    return int(index), int(count)
+
+
+class MeasurementExecutor:
+    """
+    Runs measurements concurrently, each pinned to its own core slot.
+
+    At most `max_concurrent` measurements run at a time, each on a slot of
+    its own. Exclusive measurements (for benchmarks that use more than one
+    thread) wait until every slot is free and run pinned to all of them; no
+    other measurement starts while one is waiting. Without slots,
+    measurements run one at a time without pinning.
+    """
+
+    def __init__(self, slots: list[CoreSlot] | None = None, max_concurrent: int | None = None):
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError(f"Number of concurrent measurements must be at least 1, got {max_concurrent}")
+
+        self.slots = slots
+        self.max_concurrent = max_concurrent
+        self._free = list(slots) if slots else []
+        self._exclusive_waiting = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="measure")
+
+    @classmethod
+    def from_options(cls, options: ConfigOptions, share: tuple[int, int] | None = None) -> "MeasurementExecutor":
+        """
+        An executor for the measurements of the campaign, on every core slot
+        or, for one of several workers on the same machine, on the
+        (INDEX, COUNT) `share` of them: the INDEX-th of COUNT contiguous
+        blocks of slots, so that the workers never measure on the same cores
+        and keep to as few NUMA nodes as they can.
+        """
+        if not options.pin_measurements:
+            if options.concurrent_measurements > 1:
+                raise ValueError("Concurrent measurements need pin_measurements, so that runs do not share cores")
+            return cls()
+
+        slots = partition_core_slots(options.measurement_cores_per_slot, options.measurement_reserved_cores)
+        if share is not None:
+            index, count = share
+            slots = slots[len(slots) * index // count:len(slots) * (index + 1) // count]
+        if not slots:
+            raise EnvironmentError(f"Not enough cores for a slot of {options.measurement_cores_per_slot} core(s) after reserving {options.measurement_reserved_cores}"
+                                   + (f" for worker {share[0]} of {share[1]} on this machine" if share is not None else ""))
+
+        return cls(slots, options.concurrent_measurements)
+
+    @property
+    def concurrency(self) -> int:
+        if not self.slots:
+            return 1
+
+        return min(len(self.slots), self.max_concurrent) if self.max_concurrent is not None else len(self.slots)
+
+    def _acquire(self, exclusive: bool) -> CoreSlot | None:
+        if not self.slots:
+            return None
+
+        with self._condition:
+            if exclusive:
+                self._exclusive_waiting += 1
+                self._condition.wait_for(lambda: len(self._free) == len(self.slots))
+                self._exclusive_waiting -= 1
+                self._free.clear()
+                return CoreSlot.combine(self.slots)
+
+            # Every slot is free or taken by a running measurement
+            self._condition.wait_for(lambda: len(self.slots) - len(self._free) < self.concurrency and not self._exclusive_waiting)
+            return self._free.pop(0)
+
+    def _release(self, slot: CoreSlot | None) -> None:
+        if slot is None:
+            return
+
+        with self._condition:
+            self._free.extend(self.slots if slot.id == -1 else [slot])
+            self._free.sort(key=lambda s: s.id)
+            self._condition.notify_all()
+
+    def submit(self, measure: Callable[[CoreSlot | None], T], exclusive: bool = False) -> Future:
+        def run() -> T:
+            slot = self._acquire(exclusive)
+            try:
+                return measure(slot)
+            finally:
+                self._release(slot)
+
+        return self._executor.submit(run)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "MeasurementExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown()
@@ -0,0 +1,151 @@
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.benchmark import Benchmark
+from benchmarks.compiler import Compiler
+from benchmarks.job import BenchmarkJob
+from benchmarks.optimization_level import OptimizationLevel
+from benchmarks.scheduler import BuildScheduler
+
+PGO_BUILD_ARGS: dict[OptimizationLevel, list[str]] = {
+    OptimizationLevel.PGO: [],  # Closed source PGO determines optimization level itself
+    OptimizationLevel.CUSTOM_PGO: ["-O0"],
+    OptimizationLevel.CUSTOM_PGO_O3: ["-O3"],
+    OptimizationLevel.CUSTOM_PGO_FULL: ["-J-DcombinedInlining=true", "-O0"],
+    OptimizationLevel.CUSTOM_PGO_FULL_O3: ["-J-DcombinedInlining=true", "-O3"],
+}
+
+
+def build_job(job: BenchmarkJob, profile_path: Path | None = None) -> None:
+    if job.optimization_level in PGO_BUILD_ARGS:
+        job.benchmark.build_pgo_optimized_binary(job.compiler, additional_build_args=PGO_BUILD_ARGS[job.optimization_level], profile_path=profile_path,
+                                                 profile_filter=job.profile_filter)
+    else:
+        job.benchmark.build_native_image(
+            job.compiler,
+            job.optimization_level,
+            additional_build_args=["-J-DdisableVirtualInvokeProfilingPhase=true"],
+        )
+
+
+@dataclass(eq=False)
+class PlannedTask:
+    id: str
+    action: Callable[[], object] = field(repr=False)
+    dependencies: list["PlannedTask"] = field(default_factory=list)
+    job: BenchmarkJob | None = field(default=None)
+    benchmark: Benchmark | None = field(default=None, repr=False)
+
+
+class DependencyFailedError(RuntimeError):
+    pass
+
+
+@dataclass
+class CampaignPlan:
+    """
+    Dependency graph of the build work in a campaign.
+
+    Every PGO job of a benchmark and compiler shares one instrumented build
+    and profiling run, which is planned as its own task that the optimized
+    builds depend on.
+    """
+    tasks: list[PlannedTask] = field(default_factory=list)
+
+    @property
+    def build_tasks(self) -> dict[BenchmarkJob, PlannedTask]:
+        return {task.job: task for task in self.tasks if task.job is not None}
+
+    @classmethod
+    def from_jobs(cls, jobs_by_benchmark: dict[str, list[BenchmarkJob]]) -> "CampaignPlan":
+        plan = cls()
+        profile_tasks: dict[tuple[str, Compiler], tuple[PlannedTask, Benchmark]] = {}
+
+        for name, jobs in jobs_by_benchmark.items():
+            for job in jobs:
+                if job.optimization_level not in PGO_BUILD_ARGS:
+                    plan.tasks.append(PlannedTask(job.id, lambda job=job: build_job(job), job=job, benchmark=job.benchmark))
+                    continue
+
+                if (name, job.compiler) not in profile_tasks:
+                    profiling_benchmark = job.benchmark.with_output_dir(job.benchmark.context_path / "builds" / f"{name}-{job.compiler.value}-profile")
+                    profile_task = PlannedTask(f"{name}-{job.compiler.value}-profile", lambda b=profiling_benchmark, c=job.compiler: b.collect_profile(c), benchmark=profiling_benchmark)
+                    profile_tasks[(name, job.compiler)] = (profile_task, profiling_benchmark)
+                    plan.tasks.append(profile_task)
+
+                profile_task, profiling_benchmark = profile_tasks[(name, job.compiler)]
+                profile_path = profiling_benchmark.profile_path(job.compiler)
+                plan.tasks.append(PlannedTask(job.id, lambda job=job, p=profile_path: build_job(job, p), dependencies=[profile_task], job=job, benchmark=job.benchmark))
+
+        return plan
+
+    def order_longest_first(self, seconds: Callable[[PlannedTask], float]) -> None:
+        """
+        Order the tasks by the estimated time from their start to the end of
+        the last task that depends on them, longest first, so the longest
+        chains of builds start before short builds take up the workers.
+        """
+        dependents: dict[PlannedTask, list[PlannedTask]] = {task: [] for task in self.tasks}
+        for task in self.tasks:
+            for dependency in task.dependencies:
+                dependents[dependency].append(task)
+
+        chains: dict[PlannedTask, float] = {}
+
+        def chain(task: PlannedTask) -> float:
+            if task not in chains:
+                chains[task] = seconds(task) + max((chain(dependent) for dependent in dependents[task]), default=0.0)
+            return chains[task]
+
+        self.tasks.sort(key=chain, reverse=True)
+
+    def execute(self, scheduler: BuildScheduler, on_done: Callable[[PlannedTask, BaseException | None], None] = lambda task, error: None,
+                on_start: Callable[[PlannedTask], None] = lambda task: None) -> dict[PlannedTask, BaseException]:
+        """
+        Run every task on the scheduler as soon as all of its dependencies
+        have succeeded. Tasks that depend on a failed task are not run and
+        fail with a `DependencyFailedError`. `on_start` is called on the
+        worker thread once the scheduler admits a task. Returns the failed
+        tasks.
+        """
+
+        def start(task: PlannedTask) -> object:
+            on_start(task)
+            return task.action()
+
+        errors: dict[PlannedTask, BaseException] = {}
+        finished: set[PlannedTask] = set()
+        pending = list(self.tasks)
+        running: dict[Future, PlannedTask] = {}
+
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for task in list(pending):
+                    if failed := [d for d in task.dependencies if d in errors]:
+                        pending.remove(task)
+                        errors[task] = DependencyFailedError(f"Dependency {failed[0].id} failed: {errors[failed[0]]}")
+                        finished.add(task)
+                        on_done(task, errors[task])
+                        progressed = True
+                    elif all(d in finished for d in task.dependencies):
+                        pending.remove(task)
+                        running[scheduler.submit(start, task)] = task
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Tasks have dependencies outside of the plan: {', '.join(task.id for task in pending)}")
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                if (error := future.exception()) is not None:
+                    errors[task] = error
+                finished.add(task)
+                on_done(task, error)
+
+        return errors
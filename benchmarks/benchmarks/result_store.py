@@ -0,0 +1,422 @@
+import csv
+import json
+import socket
+import sqlite3
+from dataclasses import asdict, fields
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.adaptive import MeasurementSummary
+from benchmarks.benchmark import BenchmarkResult
+from benchmarks.binary_size import BINARY_SECTION_COLUMNS
+from benchmarks.build_stats import BuildStats
+from benchmarks.job import BenchmarkJob
+from util.git import get_graal_commit
+from util.perf import HARDWARE_COUNTER_COLUMNS
+from util.resources import ResourceUsage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    host TEXT NOT NULL,
+    graal_commit TEXT,
+    config_path TEXT,
+    config TEXT
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    timestamp TEXT NOT NULL,
+    host TEXT NOT NULL,
+    graal_commit TEXT,
+    benchmark TEXT NOT NULL,
+    compiler TEXT NOT NULL,
+    compiler_command TEXT NOT NULL,
+    optimization_level TEXT NOT NULL,
+    build_args TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    result REAL NOT NULL,
+    binary_size INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS iterations (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    iteration INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, iteration)
+);
+
+CREATE TABLE IF NOT EXISTS latency_percentiles (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    percentile TEXT NOT NULL,
+    milliseconds REAL NOT NULL,
+    PRIMARY KEY (run_id, percentile)
+);
+
+CREATE TABLE IF NOT EXISTS status_samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    elapsed_seconds REAL NOT NULL,
+    rss_bytes INTEGER NOT NULL,
+    threads INTEGER NOT NULL,
+    processes INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    timestamp TEXT NOT NULL,
+    host TEXT NOT NULL,
+    task TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    compiler TEXT NOT NULL,
+    optimization_level TEXT NOT NULL,
+    build_args TEXT NOT NULL,
+    cached INTEGER NOT NULL,
+    wall_time_seconds REAL NOT NULL,
+    max_rss_bytes INTEGER,
+    user_time_seconds REAL,
+    system_time_seconds REAL,
+    reported_peak_rss_bytes INTEGER,
+    reachable_types INTEGER,
+    reachable_fields INTEGER,
+    reachable_methods INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS build_phases (
+    build_id INTEGER NOT NULL REFERENCES builds(id),
+    phase TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    memory_bytes INTEGER NOT NULL,
+    PRIMARY KEY (build_id, phase)
+);
+
+CREATE TABLE IF NOT EXISTS build_packages (
+    build_id INTEGER NOT NULL REFERENCES builds(id),
+    package TEXT NOT NULL,
+    code_bytes INTEGER NOT NULL,
+    PRIMARY KEY (build_id, package)
+);
+
+CREATE TABLE IF NOT EXISTS job_summaries (
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    benchmark TEXT NOT NULL,
+    compiler TEXT NOT NULL,
+    optimization_level TEXT NOT NULL,
+    n_runs INTEGER NOT NULL,
+    n_warmup INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    ci_half_width REAL NOT NULL,
+    confidence REAL NOT NULL,
+    PRIMARY KEY (campaign_id, benchmark, compiler, optimization_level)
+);
+
+CREATE INDEX IF NOT EXISTS runs_by_configuration ON runs (benchmark, compiler, optimization_level);
+CREATE INDEX IF NOT EXISTS runs_by_campaign ON runs (campaign_id);
+CREATE INDEX IF NOT EXISTS runs_by_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS status_samples_by_run ON status_samples (run_id);
+CREATE INDEX IF NOT EXISTS builds_by_campaign ON builds (campaign_id);
+"""
+
+# Columns added after the first version of the schema, so existing databases
+# get them too.
+ADDED_COLUMNS = [
+    ("runs", "warmup", "INTEGER NOT NULL DEFAULT 0"),
+    ("runs", "max_rss_bytes", "INTEGER"),
+    ("runs", "user_time_seconds", "REAL"),
+    ("runs", "system_time_seconds", "REAL"),
+    ("runs", "major_faults", "INTEGER"),
+    ("runs", "minor_faults", "INTEGER"),
+    ("runs", "voluntary_context_switches", "INTEGER"),
+    ("runs", "involuntary_context_switches", "INTEGER"),
+    ("runs", "peak_sampled_rss_bytes", "INTEGER"),
+    ("runs", "slot", "INTEGER"),
+    ("runs", "cpus", "TEXT"),
+    ("runs", "worker", "TEXT"),
+    ("builds", "worker", "TEXT"),
+    ("job_summaries", "worker", "TEXT"),
+    *(("runs", column, "INTEGER") for column in BINARY_SECTION_COLUMNS),
+    *(("runs", column, "INTEGER") for column in HARDWARE_COUNTER_COLUMNS),
+    ("runs", "counters_enabled_percent", "REAL"),
+    ("runs", "steady_state_iteration", "INTEGER"),
+    ("runs", "warmup_result", "REAL"),
+    ("runs", "steady_state_result", "REAL"),
+    ("runs", "wall_time_seconds", "REAL"),
+]
+
+RESOURCE_USAGE_COLUMNS = [f.name for f in fields(ResourceUsage)]
+
+CSV_FIELDNAMES = ["benchmark", "optimization_level", "result", "binary_size", "compiler", *RESOURCE_USAGE_COLUMNS, *BINARY_SECTION_COLUMNS, *HARDWARE_COUNTER_COLUMNS, "counters_enabled_percent",
+                 "steady_state_iteration", "warmup_result", "steady_state_result", "slot", "cpus", "host", "worker"]
+
+
+class ResultStore:
+    """
+    Append-only SQLite database of every measured run of every campaign.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self._add_missing_columns()
+        self.host = socket.gethostname()
+        self.graal_commit = get_graal_commit()
+
+    def _add_missing_columns(self) -> None:
+        with self.connection:
+            for table, column, declaration in ADDED_COLUMNS:
+                existing = {row["name"] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def start_campaign(self, config_path: Path | None = None, config: dict | None = None) -> int:
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO campaigns (started_at, host, graal_commit, config_path, config) VALUES (?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(), self.host, self.graal_commit, config_path.as_posix() if config_path else None, json.dumps(config, default=str) if config is not None else None),
+            )
+        return cursor.lastrowid
+
+    def finish_campaign(self, campaign_id: int) -> None:
+        with self.connection:
+            self.connection.execute("UPDATE campaigns SET finished_at = ? WHERE id = ?", (datetime.now().isoformat(), campaign_id))
+
+    def add_runs(self, campaign_id: int, job: BenchmarkJob, runs: list[BenchmarkResult], host: str | None = None, worker: str | None = None) -> None:
+        """
+        Record the runs of a job, measured on `host` by `worker` if they were
+        measured by a distributed worker rather than by this process.
+        """
+        compiler_command = job.compiler.get_command(job.benchmark.options)
+        build_args = json.dumps(job.benchmark.build_command or [])
+
+        with self.connection:
+            for run in runs:
+                resource_usage = asdict(run.resource_usage) if run.resource_usage is not None else {}
+                binary_sections = asdict(run.binary_sections) if run.binary_sections is not None else {}
+                hardware_counters = asdict(run.hardware_counters) if run.hardware_counters is not None else {}
+                cursor = self.connection.execute(
+                    f"""
+                    INSERT INTO runs (campaign_id, timestamp, host, graal_commit, benchmark, compiler, compiler_command, optimization_level, build_args, unit, result, binary_size, warmup,
+                                      steady_state_iteration, warmup_result, steady_state_result, wall_time_seconds, slot, cpus, worker, {", ".join(RESOURCE_USAGE_COLUMNS)}, {", ".join(BINARY_SECTION_COLUMNS)},
+                                      {", ".join(HARDWARE_COUNTER_COLUMNS)}, counters_enabled_percent)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {", ".join("?" * (len(RESOURCE_USAGE_COLUMNS) + len(BINARY_SECTION_COLUMNS) + len(HARDWARE_COUNTER_COLUMNS)))})
+                    """,
+                    (campaign_id, run.timestamp.isoformat(), host or self.host, self.graal_commit, job.benchmark.name, job.compiler.name, compiler_command,
+                     job.optimization_level_label, build_args, job.benchmark.unit.value, run.result, run.binary_size, run.warmup,
+                     run.steady_state_iteration, run.warmup_result, run.steady_state_result, run.wall_time_seconds, run.slot, run.cpus, worker, *(resource_usage.get(column) for column in RESOURCE_USAGE_COLUMNS),
+                     *(binary_sections.get(column) for column in BINARY_SECTION_COLUMNS), *(hardware_counters.get(column) for column in HARDWARE_COUNTER_COLUMNS),
+                     run.hardware_counters.min_enabled_percent if run.hardware_counters is not None else None),
+                )
+                self.connection.executemany(
+                    "INSERT INTO iterations (run_id, iteration, value) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, i, value) for i, value in enumerate(run.iterations or [run.result])],
+                )
+                self.connection.executemany(
+                    "INSERT INTO latency_percentiles (run_id, percentile, milliseconds) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, percentile, milliseconds) for percentile, milliseconds in run.latency_percentiles.items()],
+                )
+                self.connection.executemany(
+                    "INSERT INTO status_samples (run_id, elapsed_seconds, rss_bytes, threads, processes) VALUES (?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, sample.elapsed_seconds, sample.rss_bytes, sample.threads, sample.processes) for sample in run.status_samples],
+                )
+
+    def add_build(self, campaign_id: int, task: str, benchmark: str, build_command: list[str] | None, stats: BuildStats,
+                  host: str | None = None, worker: str | None = None) -> None:
+        """
+        Record the cost of a native image build (restored from the build
+        cache if `stats.cached`).
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                """
+                INSERT INTO builds (campaign_id, timestamp, host, worker, task, benchmark, compiler, optimization_level, build_args, cached, wall_time_seconds, max_rss_bytes,
+                                    user_time_seconds, system_time_seconds, reported_peak_rss_bytes, reachable_types, reachable_fields, reachable_methods)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (campaign_id, datetime.now().isoformat(), host or self.host, worker, task, benchmark, stats.compiler, stats.optimization_level, json.dumps(build_command or []),
+                 stats.cached, stats.wall_time_seconds, stats.max_rss_bytes, stats.user_time_seconds, stats.system_time_seconds, stats.reported_peak_rss_bytes,
+                 stats.reachable_types, stats.reachable_fields, stats.reachable_methods),
+            )
+            self.connection.executemany(
+                "INSERT INTO build_phases (build_id, phase, seconds, memory_bytes) VALUES (?, ?, ?, ?)",
+                [(cursor.lastrowid, name, phase.seconds, phase.memory_bytes) for name, phase in stats.phases.items()],
+            )
+            self.connection.executemany(
+                "INSERT INTO build_packages (build_id, package, code_bytes) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, package, code_bytes) for package, code_bytes in stats.code_bytes_by_package.items()],
+            )
+
+    def builds(self, campaign_id: int | None = None) -> list[dict]:
+        """
+        Every recorded build, with its phases as `phase_<name>_seconds` and
+        `phase_<name>_memory_bytes`.
+        """
+        where, parameters = ("WHERE campaign_id = ?", (campaign_id,)) if campaign_id is not None else ("", ())
+        builds = {row["id"]: dict(row) for row in self.connection.execute(f"SELECT * FROM builds {where} ORDER BY id", parameters).fetchall()}
+        for row in self.connection.execute(f"SELECT * FROM build_phases WHERE build_id IN (SELECT id FROM builds {where})", parameters).fetchall():
+            builds[row["build_id"]][f"phase_{row['phase']}_seconds"] = row["seconds"]
+            builds[row["build_id"]][f"phase_{row['phase']}_memory_bytes"] = row["memory_bytes"]
+
+        return list(builds.values())
+
+    def build_packages(self, campaign_id: int | None = None) -> list[dict]:
+        """
+        Bytes of code per Java package of every recorded build that has them,
+        one row per build and package, largest package first.
+        """
+        where, parameters = ("WHERE b.campaign_id = ?", (campaign_id,)) if campaign_id is not None else ("", ())
+        rows = self.connection.execute(
+            f"""
+            SELECT b.id AS build_id, b.task, b.benchmark, b.compiler, b.optimization_level, p.package, p.code_bytes
+            FROM build_packages p JOIN builds b ON b.id = p.build_id {where}
+            ORDER BY b.id, p.code_bytes DESC
+            """,
+            parameters,
+        ).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def add_summary(self, campaign_id: int, job: BenchmarkJob, summary: MeasurementSummary, worker: str | None = None) -> None:
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO job_summaries (campaign_id, benchmark, compiler, optimization_level, n_runs, n_warmup, mean, ci_half_width, confidence, worker)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (campaign_id, job.benchmark.name, job.compiler.name, job.optimization_level_label, summary.n_runs, summary.n_warmup, summary.mean, summary.ci_half_width, summary.confidence, worker),
+            )
+
+    def summaries(self, campaign_id: int) -> list[dict]:
+        return [dict(row) for row in self.connection.execute("SELECT * FROM job_summaries WHERE campaign_id = ?", (campaign_id,)).fetchall()]
+
+    def query(
+        self,
+        benchmark: str | None = None,
+        compiler: str | None = None,
+        optimization_level: str | None = None,
+        campaign_id: int | None = None,
+        host: str | None = None,
+        worker: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        include_warmup: bool = True,
+    ) -> list[dict]:
+        conditions, parameters = [], []
+        if not include_warmup:
+            conditions.append("warmup = 0")
+        for column, value in (("benchmark", benchmark), ("compiler", compiler), ("optimization_level", optimization_level), ("campaign_id", campaign_id), ("host", host), ("worker", worker)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(since.isoformat())
+        if until is not None:
+            conditions.append("timestamp < ?")
+            parameters.append(until.isoformat())
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(f"SELECT * FROM runs {where} ORDER BY id", parameters).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def iterations(self, run_id: int) -> list[float]:
+        rows = self.connection.execute("SELECT value FROM iterations WHERE run_id = ? ORDER BY iteration", (run_id,)).fetchall()
+        return [row["value"] for row in rows]
+
+    def iteration_rows(self, campaign_id: int | None = None, include_warmup: bool = False) -> list[dict]:
+        """
+        Every iteration of the matching runs with the configuration of its
+        run and whether the run was in steady state by then.
+        """
+        conditions, parameters = [], []
+        if campaign_id is not None:
+            conditions.append("r.campaign_id = ?")
+            parameters.append(campaign_id)
+        if not include_warmup:
+            conditions.append("r.warmup = 0")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(
+            f"""
+            SELECT r.id AS run_id, r.benchmark, r.compiler, r.optimization_level, r.host, i.iteration, i.value,
+                   r.steady_state_iteration IS NOT NULL AND i.iteration >= r.steady_state_iteration AS steady_state
+            FROM iterations i JOIN runs r ON r.id = i.run_id {where}
+            ORDER BY r.id, i.iteration
+            """,
+            parameters,
+        ).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def latency_percentiles(self, run_id: int) -> dict[str, float]:
+        rows = self.connection.execute("SELECT percentile, milliseconds FROM latency_percentiles WHERE run_id = ? ORDER BY rowid", (run_id,)).fetchall()
+        return {row["percentile"]: row["milliseconds"] for row in rows}
+
+    def status_samples(self, run_id: int) -> list[dict]:
+        rows = self.connection.execute("SELECT elapsed_seconds, rss_bytes, threads, processes FROM status_samples WHERE run_id = ? ORDER BY elapsed_seconds", (run_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def campaigns(self) -> list[dict]:
+        return [dict(row) for row in self.connection.execute("SELECT * FROM campaigns ORDER BY id").fetchall()]
+
+    def latest_campaign_id(self) -> int | None:
+        row = self.connection.execute("SELECT MAX(id) AS id FROM campaigns").fetchone()
+        return row["id"]
+
+    def export_csv(self, output_file: Path, include_warmup: bool = False, **filters) -> int:
+        """
+        Write the matching runs in the CSV layout read by plot_data.py and
+        return the number of rows written.
+        """
+        rows = self.query(include_warmup=include_warmup, **filters)
+        with open(output_file, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return len(rows)
+
+    def export_iterations_csv(self, output_file: Path, campaign_id: int | None = None, include_warmup: bool = False) -> int:
+        """
+        Write every iteration of the matching runs, one row per iteration,
+        and return the number of rows written.
+        """
+        rows = self.iteration_rows(campaign_id, include_warmup)
+        with open(output_file, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=["run_id", "benchmark", "compiler", "optimization_level", "host", "iteration", "value", "steady_state"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return len(rows)
+
+    def export_builds_csv(self, output_file: Path, campaign_id: int | None = None, packages: bool = False) -> int:
+        """
+        Write the recorded builds, one row per build with a column per phase,
+        or with `packages` one row per build and Java package with its bytes
+        of code, and return the number of rows written.
+        """
+        rows = self.build_packages(campaign_id) if packages else self.builds(campaign_id)
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row)) or ["id"]
+        with open(output_file, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return len(rows)
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from config.options import ConfigOptions
+from util.system import available_cpus, available_memory_bytes, total_memory_bytes
+
+T = TypeVar("T")
+
+GB = 1024 ** 3
+
+
+class BuildScheduler:
+    """
+    Runs native-image builds on a pool of worker threads.
+
+    A build is only admitted when the cores and memory reserved by the builds
+    that are already running leave room for one more, and when the machine
+    actually has that much memory available right now. A single build is
+    always admitted so that an undersized machine still makes progress.
+    """
+
+    def __init__(self, max_workers: int = 1, memory_per_build: int = 8 * GB, cores_per_build: int = 4, poll_interval: float = 5.0):
+        if max_workers < 1:
+            raise ValueError(f"Number of build workers must be at least 1, got {max_workers}")
+
+        self.max_workers = max_workers
+        self.memory_per_build = memory_per_build
+        self.cores_per_build = min(cores_per_build, available_cpus())
+        self.poll_interval = poll_interval
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="native-image-build")
+        self._condition = threading.Condition()
+        self._running = 0
+        self._reserved_memory = 0
+        self._reserved_cores = 0
+
+    @classmethod
+    def from_options(cls, options: ConfigOptions) -> "BuildScheduler":
+        return cls(
+            max_workers=options.build_workers,
+            memory_per_build=int(options.build_memory_gb * GB),
+            cores_per_build=options.build_cores,
+        )
+
+    def _can_admit(self) -> bool:
+        if self._running == 0:
+            return True
+        if self._reserved_cores + self.cores_per_build > available_cpus():
+            return False
+
+        unreserved_memory = total_memory_bytes() - self._reserved_memory
+        return min(unreserved_memory, available_memory_bytes()) >= self.memory_per_build
+
+    def _acquire(self) -> None:
+        with self._condition:
+            while not self._can_admit():
+                self._condition.wait(timeout=self.poll_interval)
+            self._running += 1
+            self._reserved_memory += self.memory_per_build
+            self._reserved_cores += self.cores_per_build
+
+    def _release(self) -> None:
+        with self._condition:
+            self._running -= 1
+            self._reserved_memory -= self.memory_per_build
+            self._reserved_cores -= self.cores_per_build
+            self._condition.notify_all()
+
+    def _run_admitted(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        self._acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._release()
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> Future[T]:
+        return self._executor.submit(self._run_admitted, fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self) -> "BuildScheduler":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
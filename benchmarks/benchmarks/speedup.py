@@ -0,0 +1,221 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.benchmark import BenchmarkUnit
+from benchmarks.binary_size import BINARY_SECTION_COLUMNS
+from benchmarks.optimization_level import OptimizationLevel
+from util.stats import t_quantile, t_two_sided_p
+
+CSV_DTYPES = {
+    "benchmark": "category",
+    "optimization_level": "category",
+    "compiler": "category",
+    "host": "category",
+    "result": "float64",
+    "binary_size": "float64",
+}
+GROUP_COLUMNS = ["compiler", "benchmark", "optimization_level"]
+# Results of different hosts are never averaged together or compared
+HOST_COLUMN = "host"
+GEOMEAN = "geomean"
+# Fewer runs than this are too few to bootstrap: resamples of two values
+# take only a handful of distinct means and make the interval far too narrow
+MIN_BOOTSTRAP_RUNS = 5
+COMPARISON_COLUMNS = ["benchmark", "speedup", "ci_low", "ci_high", "p_value", "n_baseline", "n_candidate", "method"]
+
+Configuration = tuple[str, str]
+
+
+def read_results_csv(path: Path) -> pd.DataFrame:
+    """
+    Read a results CSV with typed columns. Older result files call the
+    result column after the execution time and have no breakdown of the
+    binary size by section or host.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    result_column = "result" if "result" in header else "execution_time"
+    section_columns = [column for column in BINARY_SECTION_COLUMNS if column in header]
+    host_columns = [HOST_COLUMN] if HOST_COLUMN in header else []
+
+    df = pd.read_csv(
+        path,
+        usecols=[*GROUP_COLUMNS, *host_columns, result_column, "binary_size", *section_columns],
+        dtype={**CSV_DTYPES, result_column: "float64", **{column: "float64" for column in section_columns}},
+        engine="c",
+    )
+
+    return df.rename(columns={result_column: "result"})
+
+
+def read_iterations_csv(path: Path) -> pd.DataFrame:
+    """Read an iterations CSV with typed columns, one row per iteration of a run."""
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(
+        path,
+        dtype={**{column: dtype for column, dtype in CSV_DTYPES.items() if column in header}, "run_id": "int64", "iteration": "int64", "value": "float64", "steady_state": "int8"},
+        engine="c",
+    )
+
+
+def group_columns(df: pd.DataFrame) -> list[str]:
+    """The columns results are grouped by, the host included if they record it."""
+    return [*GROUP_COLUMNS, HOST_COLUMN] if HOST_COLUMN in df.columns else GROUP_COLUMNS
+
+
+def split_by_host(df: pd.DataFrame) -> list[tuple[str | None, pd.DataFrame]]:
+    """The results of every host, or all of them as one for results that do not record the host."""
+    if HOST_COLUMN not in df.columns:
+        return [(None, df)]
+
+    return [(host, group) for host, group in df.groupby(HOST_COLUMN, observed=True)]
+
+
+def parse_configuration(text: str) -> Configuration:
+    """
+    Parse "COMPILER:LEVEL", where the level is an OptimizationLevel name
+    (O3, CUSTOM_PGO_FULL_O3), optionally followed by a profile filter as in
+    the config file (CUSTOM_PGO_O3:top4), or its value as stored in results
+    (-O3).
+    """
+    compiler, sep, level = text.partition(":")
+    if not sep:
+        raise ValueError(f"Expected COMPILER:OPTIMIZATION_LEVEL, got '{text}'")
+    level_name, _, filter_name = level.partition(":")
+    if level_name in OptimizationLevel.__members__:
+        level = OptimizationLevel[level_name].value + (f" [{filter_name}]" if filter_name else "")
+
+    return compiler, level
+
+
+def bootstrap_means(values: np.ndarray, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Means of `n_resamples` resamples (with replacement) of the values, drawn
+    at once as an (n_resamples, len(values)) index matrix.
+    """
+    indices = rng.integers(0, len(values), size=(n_resamples, len(values)))
+    return values[indices].mean(axis=1)
+
+
+def _p_value(log_ratios: np.ndarray) -> float:
+    """
+    Two-sided bootstrap p-value of no speedup (a log ratio of 0).
+    """
+    below = np.count_nonzero(log_ratios <= 0)
+    above = np.count_nonzero(log_ratios >= 0)
+    return min(1.0, 2 * (min(below, above) + 1) / (len(log_ratios) + 1))
+
+
+def _summarize(name: str, point: float, log_ratios: np.ndarray, confidence: float, n_baseline: int, n_candidate: int) -> dict:
+    alpha = (1 - confidence) / 2
+    low, high = np.exp(np.quantile(log_ratios, [alpha, 1 - alpha]))
+    return {
+        "benchmark": name,
+        "speedup": point,
+        "ci_low": low,
+        "ci_high": high,
+        "p_value": _p_value(log_ratios),
+        "n_baseline": n_baseline,
+        "n_candidate": n_candidate,
+        "method": "bootstrap",
+    }
+
+
+def _log_mean_variance(values: np.ndarray) -> tuple[float, int]:
+    """
+    Variance of the log of the mean of the values by the delta method
+    (infinite for a single value), and the number of values.
+    """
+    if len(values) < 2:
+        return np.inf, len(values)
+
+    return values.var(ddof=1) / (len(values) * values.mean() ** 2), len(values)
+
+
+def _summarize_welch(name: str, point: float, variances: list[tuple[float, int]], confidence: float, n_baseline: int, n_candidate: int) -> dict:
+    """
+    Speedup with a Welch t-interval and p-value of the log ratio `point`,
+    whose variance is the sum of the (variance, sample size) components,
+    with Welch-Satterthwaite degrees of freedom. Used for samples too small
+    to bootstrap; unbounded with fewer than two runs in any sample.
+    """
+    row = {"benchmark": name, "speedup": np.exp(point), "ci_low": 0.0, "ci_high": np.inf, "p_value": 1.0,
+           "n_baseline": n_baseline, "n_candidate": n_candidate, "method": "welch-t"}
+    if min(n for _, n in variances) < 2:
+        return row
+
+    se = np.sqrt(sum(v for v, _ in variances))
+    if se == 0:
+        return {**row, "ci_low": np.exp(point), "ci_high": np.exp(point), "p_value": 1.0 if point == 0 else 0.0}
+
+    df = max(1, int(se ** 4 / sum(v ** 2 / (n - 1) for v, n in variances if v > 0)))
+    half_width = t_quantile(0.5 + confidence / 2, df) * se
+
+    return {**row, "ci_low": np.exp(point - half_width), "ci_high": np.exp(point + half_width), "p_value": t_two_sided_p(point / se, df)}
+
+
+def compare(
+    df: pd.DataFrame,
+    baseline: Configuration,
+    candidate: Configuration,
+    units: dict[str, BenchmarkUnit],
+    n_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: int | None = 0,
+) -> pd.DataFrame:
+    """
+    Speedup of `candidate` over `baseline` per benchmark measured by both:
+    the ratio of the mean results (inverted for execution times, so that
+    above 1 is always faster), with a percentile bootstrap confidence
+    interval and p-value, and their geometric mean across benchmarks, which
+    is resampled by combining the resamples of every benchmark. Benchmarks
+    with fewer than MIN_BOOTSTRAP_RUNS runs on either side get a Welch
+    t-interval instead (method "welch-t"), and so does the geometric mean
+    if it includes any of them, from the variances of every benchmark.
+    The results must all be from the same host, see `split_by_host`.
+    """
+    if HOST_COLUMN in df.columns and (hosts := df[HOST_COLUMN].dropna().unique()).size > 1:
+        raise ValueError(f"Cannot compare results measured on different hosts ({', '.join(sorted(map(str, hosts)))}), compare them one host at a time")
+
+    rng = np.random.default_rng(seed)
+    groups = {key: group["result"].to_numpy() for key, group in df.groupby(GROUP_COLUMNS, observed=True)}
+
+    benchmarks = sorted({b for (c, b, l) in groups if (c, l) == baseline} & {b for (c, b, l) in groups if (c, l) == candidate})
+    rows, points, resampled, variances = [], [], [], []
+    for benchmark in benchmarks:
+        baseline_values = groups[(baseline[0], benchmark, baseline[1])]
+        candidate_values = groups[(candidate[0], benchmark, candidate[1])]
+        # Throughput is higher-is-better, every other unit lower-is-better
+        sign = 1 if units.get(benchmark) == BenchmarkUnit.THROUGHPUT else -1
+
+        point = sign * (np.log(candidate_values.mean()) - np.log(baseline_values.mean()))
+        log_ratios = sign * (np.log(bootstrap_means(candidate_values, n_resamples, rng)) - np.log(bootstrap_means(baseline_values, n_resamples, rng)))
+
+        benchmark_variances = [_log_mean_variance(baseline_values), _log_mean_variance(candidate_values)]
+        if min(len(baseline_values), len(candidate_values)) < MIN_BOOTSTRAP_RUNS:
+            rows.append(_summarize_welch(benchmark, point, benchmark_variances, confidence, len(baseline_values), len(candidate_values)))
+        else:
+            rows.append(_summarize(benchmark, np.exp(point), log_ratios, confidence, len(baseline_values), len(candidate_values)))
+        points.append(point)
+        resampled.append(log_ratios)
+        variances += benchmark_variances
+
+    if rows:
+        n_baseline, n_candidate = sum(r["n_baseline"] for r in rows), sum(r["n_candidate"] for r in rows)
+        if any(r["method"] == "welch-t" for r in rows):
+            # The mean of the log ratios: the variance of every sample scaled by 1/k^2
+            k = len(points)
+            rows.append(_summarize_welch(GEOMEAN, np.mean(points), [(v / k ** 2, n) for v, n in variances], confidence, n_baseline, n_candidate))
+        else:
+            rows.append(_summarize(GEOMEAN, np.exp(np.mean(points)), np.mean(resampled, axis=0), confidence, n_baseline, n_candidate))
+
+    result = pd.DataFrame(rows, columns=COMPARISON_COLUMNS)
+    result.insert(0, "candidate", f"{candidate[0]}:{candidate[1]}")
+    result.insert(0, "baseline", f"{baseline[0]}:{baseline[1]}")
+
+    return result
+
+
+def configurations(df: pd.DataFrame) -> list[Configuration]:
+    return sorted(df.groupby(["compiler", "optimization_level"], observed=True).size().index)
@@ -0,0 +1,66 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.benchmark import read_benchmark_units
+from benchmarks.speedup import GEOMEAN, MIN_BOOTSTRAP_RUNS, compare, configurations, parse_configuration, read_results_csv, split_by_host
+from config.options import ConfigOptions
+from util.color import ANSIColorCode as C
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bootstrap speedups, confidence intervals and p-values between (compiler, optimization level) pairs.")
+    parser.add_argument("data_file", type=Path, help="CSV file with the results, as exported by run_benchmarks.py")
+    parser.add_argument("--baseline", type=parse_configuration, required=True, help="COMPILER:LEVEL to compare against, e.g. CLOSED:PGO or OPEN:-O3")
+    parser.add_argument("--candidate", type=parse_configuration, action="append", help="COMPILER:LEVEL to compare (default: every other pair in the data)")
+    parser.add_argument("--benchmarks-file", type=Path, default=ConfigOptions().benchmarks_file_path, help="Benchmarks file the units of the benchmarks are taken from")
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level used to highlight results")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Also write the comparisons to this CSV file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    df = read_results_csv(args.data_file)
+    units = read_benchmark_units(args.benchmarks_file)
+    available = configurations(df)
+    if args.baseline not in available:
+        raise ValueError(f"No results for {args.baseline[0]}:{args.baseline[1]}, available: {', '.join(f'{c}:{l}' for c, l in available)}")
+    candidates = args.candidate or [configuration for configuration in available if configuration != args.baseline]
+
+    comparisons = []
+    hosts = split_by_host(df)
+    for host, host_df in hosts:
+        for candidate in candidates:
+            comparison = compare(host_df, args.baseline, candidate, units, args.resamples, args.confidence, args.seed)
+            if host is not None:
+                comparison.insert(2, "host", host)
+            comparisons.append(comparison)
+
+            on_host = f" on {host}" if len(hosts) > 1 else ""
+            print(f"{C.BOLD}{candidate[0]}:{candidate[1]}{C.ENDC} vs {C.BOLD}{args.baseline[0]}:{args.baseline[1]}{C.ENDC}{on_host}")
+            if comparison.empty:
+                print(f"  {C.WARNING}No benchmarks measured with both{C.ENDC}")
+            for row in comparison.itertuples():
+                color = C.OKGREEN if row.p_value < args.alpha and row.ci_low > 1 else C.FAIL if row.p_value < args.alpha and row.ci_high < 1 else ""
+                name = f"{row.benchmark:<24}"
+                name = f"{C.BOLD}{name}{C.ENDC}" if row.benchmark == GEOMEAN else name
+                note = ""
+                if row.method == "welch-t" and row.benchmark == GEOMEAN:
+                    note = f"  {C.WARNING}includes benchmarks with fewer than {MIN_BOOTSTRAP_RUNS} runs, Welch t-interval instead of bootstrap{C.ENDC}"
+                elif row.method == "welch-t":
+                    note = f"  {C.WARNING}fewer than {MIN_BOOTSTRAP_RUNS} runs, Welch t-interval instead of bootstrap{C.ENDC}"
+                print(f"  {name} {color}{row.speedup:>7.3f}x{C.ENDC if color else ''}  {args.confidence:.0%} CI: [{row.ci_low:.3f}, {row.ci_high:.3f}]  p = {row.p_value:.4f}  (n = {row.n_baseline}/{row.n_candidate}){note}")
+
+    if args.output is not None:
+        pd.concat(comparisons, ignore_index=True).to_csv(args.output, index=False)
+        print(f"Wrote comparisons to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
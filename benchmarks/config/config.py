@@ -5,21 +5,42 @@ from dataclasses import dataclass, field
 
 from benchmarks.benchmark import Benchmark
 from benchmarks.compiler import Compiler
-from benchmarks.job import BenchmarkJob
+from benchmarks.job import BenchmarkJob, parse_job_level
 from benchmarks.optimization_level import OptimizationLevel
 from config.options import ConfigOptions
+from profiling.filter import ProfileFilter
 
 
 @dataclass
 class Config:
+    """
+    A campaign: the benchmarks to run and the optimization levels to build
+    them with per compiler. A custom PGO level can name one of the
+    `profile_filters` ("CUSTOM_PGO_O3:top4") to be built from a pruned
+    profile instead of the full one.
+    """
     options: ConfigOptions = field(default_factory=ConfigOptions)
     benchmarks: list[str] = field(default_factory=list)
-    optimization_levels_by_compiler: dict[Compiler, list[OptimizationLevel]] = field(default_factory=dict)
+    optimization_levels_by_compiler: dict[Compiler, list[tuple[OptimizationLevel, ProfileFilter | None]]] = field(default_factory=dict)
+    profile_filters: dict[str, ProfileFilter] = field(default_factory=dict)
 
     def __post_init__(self):
         if isinstance(self.options, dict):
             self.options = ConfigOptions(**self.options)
 
+        self.profile_filters = {
+            name: ProfileFilter(name=name, **rules) if isinstance(rules, dict) else rules
+            for name, rules in self.profile_filters.items()
+        }
+
+        self.optimization_levels_by_compiler = {
+            Compiler[compiler] if isinstance(compiler, str) else compiler: [
+                parse_job_level(level, self.profile_filters) if isinstance(level, str) else level if isinstance(level, tuple) else (level, None)
+                for level in levels
+            ]
+            for compiler, levels in self.optimization_levels_by_compiler.items()
+        }
+
     @property
     def compilers(self) -> list[Compiler]:
         return list(self.optimization_levels_by_compiler.keys())
@@ -41,9 +62,8 @@ class Config:
                 raise ValueError(f"Benchmark '{benchmark_name}' not found in benchmarks.")
             benchmark = benchmarks[benchmark_name]
             for compiler, optimization_levels in self.optimization_levels_by_compiler.items():
-                for optimization_level in optimization_levels:
-                    from benchmarks.job import BenchmarkJob
-                    job = BenchmarkJob(benchmark=benchmark, optimization_level=optimization_level, compiler=compiler)
+                for optimization_level, profile_filter in optimization_levels:
+                    job = BenchmarkJob.create(benchmark=benchmark, optimization_level=optimization_level, compiler=compiler, profile_filter=profile_filter)
                     jobs[benchmark_name].append(job)
         return jobs
     
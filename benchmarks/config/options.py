@@ -14,11 +14,48 @@ class ConfigOptions:
     java_home: Path = field(default_factory=lambda: Path(os.environ.get("JAVA_HOME", "None")))
     benchmarks_file_path: Path = field(default=Path("configs") / "benchmarks.json")
     results_output_dir_base_path: Path = field(default=Path("results"))
+    build_workers: int = field(default=1)
+    build_memory_gb: float = field(default=8.0)
+    build_cores: int = field(default=4)
+    build_timeout_seconds: float | None = field(default=3 * 60 * 60)
+    run_timeout_seconds: float | None = field(default=60 * 60)
+    agent_timeout_seconds: float | None = field(default=60 * 60)
+    agent_workers: int | None = field(default=None)
+    agent_merge_existing_config: bool = field(default=False)
+    proc_status_sample_interval_seconds: float | None = field(default=None)
+    pin_measurements: bool = field(default=False)
+    concurrent_measurements: int = field(default=1)
+    measurement_cores_per_slot: int = field(default=1)
+    measurement_reserved_cores: int = field(default=1)
+    build_cache_dir: Path | None = field(default=None)
+    build_cache_max_gb: float | None = field(default=100.0)
+    build_cache_max_age_days: float | None = field(default=30.0)
+    adaptive_runs: bool = field(default=False)
+    adaptive_min_runs: int = field(default=3)
+    adaptive_max_runs: int = field(default=30)
+    adaptive_target_relative_ci: float = field(default=0.01)
+    adaptive_confidence: float = field(default=0.95)
+    profiling_runs: int = field(default=1)
+    profile_merge_normalize: bool = field(default=False)
+    profile_merge_decay: float = field(default=1.0)
+    binary_size_by_package: bool = field(default=False)
+    binary_package_depth: int = field(default=2)
+    hardware_counters: bool = field(default=False)
+    steady_state_window: int = field(default=3)
+    steady_state_threshold: float = field(default=0.02)
 
     @property
     def results_output_dir_path(self) -> Path:
         return self.results_output_dir_base_path / "current"
 
+    @property
+    def results_db_path(self) -> Path:
+        return self.results_output_dir_base_path / "results.db"
+
+    @property
+    def checkpoint_dir_path(self) -> Path:
+        return self.results_output_dir_path / "checkpoint"
+
     @property
     def profiling_data_output_dir_path(self) -> Path:
         return self.results_output_dir_path / "profiling-data"
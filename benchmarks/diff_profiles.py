@@ -0,0 +1,90 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from profiling.diff import diff_profiles
+from profiling.store import ProfileStore
+from util.color import ANSIColorCode as C
+
+BEFORE_PREFIX = "before."
+AFTER_PREFIX = "after."
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare call-site profiles: count deltas, rank changes and receiver-distribution shifts per (targetMethod, source).")
+    parser.add_argument("before", type=Path, help="Profile file, or directory of profile files")
+    parser.add_argument("after", type=Path, help="Profile file, or directory of profile files matched to the 'before' ones by name")
+    parser.add_argument("--store", type=Path, default=Path("results/current/profile-store"), help="Profile store both sets are ingested into")
+    parser.add_argument("--output", type=Path, default=Path("results/current/profile-diff.csv"), help="CSV file for the per-site diff")
+    parser.add_argument("--summary-output", type=Path, default=Path("results/current/profile-diff-summary.csv"), help="CSV file for the per-profile summary")
+    parser.add_argument("--top", type=int, default=10, help="Number of sites to list per change in the summary")
+    parser.add_argument("--force", action="store_true", help="Ingest the profiles again even if they are unchanged")
+    return parser.parse_args()
+
+
+def profile_pairs(before: Path, after: Path) -> list[tuple[str, Path, Path]]:
+    if before.is_file() and after.is_file():
+        return [(before.stem if before.stem == after.stem else f"{before.stem}..{after.stem}", before, after)]
+    if before.is_dir() and after.is_dir():
+        before_files = {file.stem: file for file in before.glob("*.json")}
+        after_files = {file.stem: file for file in after.glob("*.json")}
+        unmatched = before_files.keys() ^ after_files.keys()
+        if unmatched:
+            print(f"{C.WARNING}Skipping profiles that are only on one side: {', '.join(sorted(unmatched))}{C.ENDC}")
+        return [(name, before_files[name], after_files[name]) for name in sorted(before_files.keys() & after_files.keys())]
+
+    raise ValueError(f"Expected two profile files or two directories, got {before} and {after}")
+
+
+def print_sites(title: str, sites: pd.DataFrame, value: str, fmt: str) -> None:
+    if sites.empty:
+        return
+    print(f"  {C.BOLD}{title}{C.ENDC}")
+    for row in sites.itertuples():
+        print(f"    {format(getattr(row, value), fmt):>12}  {row.targetMethod} {C.GRAY}@ {row.source}{C.ENDC}")
+
+
+def print_summary(name: str, sites: pd.DataFrame, summary: dict, top: int) -> None:
+    print(f"{C.OKBLUE}{name}{C.ENDC}")
+    print(f"  sites: {summary['sites_before']} -> {summary['sites_after']} "
+          f"({C.OKGREEN}+{summary['added_sites']}{C.ENDC} / {C.FAIL}-{summary['removed_sites']}{C.ENDC}), "
+          f"calls: {summary['calls_before']} -> {summary['calls_after']}")
+    print(f"  mean |rank change|: {summary['mean_abs_rank_change']:.1f}, "
+          f"monomorphic -> polymorphic: {summary['monomorphic_to_polymorphic']}, polymorphic -> monomorphic: {summary['polymorphic_to_monomorphic']}, "
+          f"receivers appeared/vanished: {summary['receivers_appeared']}/{summary['receivers_vanished']}")
+    print(f"  receiver TV distance: mean {summary['mean_receiver_tv_distance']:.4f}, call-weighted {summary['weighted_receiver_tv_distance']:.4f}")
+
+    common = sites[sites["status"] == "common"]
+    print_sites("Hotter", common[common["count_delta"] > 0].nlargest(top, "count_delta"), "count_delta", "+d")
+    print_sites("Colder", common[common["count_delta"] < 0].nsmallest(top, "count_delta"), "count_delta", "+d")
+    print_sites("Became polymorphic", common[(common["morphism_before"] == "monomorphic") & (common["morphism_after"] == "polymorphic")].nlargest(top, "count_after"), "count_after", "d")
+    print_sites("Largest receiver shifts", common[common["receiver_tv_distance"] > 0].nlargest(top, "receiver_tv_distance"), "receiver_tv_distance", ".4f")
+
+
+def main():
+    args = parse_args()
+    pairs = profile_pairs(args.before, args.after)
+
+    # Both sides go into one store, so that their interned ids can be joined directly
+    store = ProfileStore(args.store)
+    store.ingest([before for _, before, _ in pairs], args.force, prefix=BEFORE_PREFIX)
+    store.ingest([after for _, _, after in pairs], args.force, prefix=AFTER_PREFIX)
+    strings = store.strings
+
+    diffs, summaries = [], {}
+    for name, before, after in pairs:
+        diff = diff_profiles(store.load(f"{BEFORE_PREFIX}{before.stem}"), store.load(f"{AFTER_PREFIX}{after.stem}"), strings)
+        summaries[name] = diff.summary()
+        print_summary(name, diff.sites, summaries[name], args.top)
+        diff.sites.insert(0, "profile", name)
+        diffs.append(diff.sites)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    pd.concat(diffs, ignore_index=True).to_csv(args.output, index=False)
+    pd.DataFrame.from_dict(summaries, orient="index").rename_axis("profile").to_csv(args.summary_output)
+    print(f"Wrote the site diff to {args.output} and the summary to {args.summary_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+from pathlib import Path
+
+from benchmarks.benchmark import read_benchmarks_from_file
+from benchmarks.cost import CampaignEstimate, CostModel, fit_to_budget, format_duration, parse_duration, print_estimate
+from benchmarks.result_store import ResultStore
+from config.config import Config
+from util.color import ANSIColorCode as C
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Estimate the wall time of a campaign from the builds and runs of earlier campaigns, without running anything.")
+    parser.add_argument("config_file_path", type=Path, help="Path of the campaign config file")
+    parser.add_argument("--db", type=Path, help="Results database to take the history from (default: the one of the config)")
+    parser.add_argument("--budget", type=parse_duration, metavar="DURATION", help="Show what run_benchmarks.py --budget would shorten or drop to fit this wall time")
+    parser.add_argument("--top", type=int, help="Only list this many of the longest jobs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    config = Config.from_file(args.config_file_path)
+    benchmarks = read_benchmarks_from_file(config.options.benchmarks_file_path, config.options)
+    jobs = [job for jobs in config.create_jobs(benchmarks).values() for job in jobs]
+
+    with ResultStore(args.db or config.options.results_db_path) as store:
+        estimate = CampaignEstimate.for_jobs(jobs, CostModel.from_store(store), config.options)
+
+    if args.budget is not None and estimate.wall_seconds > args.budget:
+        print(f"Without a budget: {format_duration(estimate.wall_seconds)}")
+        estimate, shortened, dropped = fit_to_budget(estimate, args.budget, shorten=not config.options.adaptive_runs)
+        for job, n_runs in shortened.items():
+            print(f"{C.WARNING}Would run {job.id} {n_runs} instead of {job.benchmark.n_runs} time(s){C.ENDC}")
+        for job in dropped:
+            print(f"{C.WARNING}Would drop {job.id}{C.ENDC}")
+
+    print_estimate(estimate, limit=args.top)
+
+
+if __name__ == "__main__":
+    main()
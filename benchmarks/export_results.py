@@ -0,0 +1,54 @@
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.result_store import ResultStore
+from config.options import ConfigOptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export stored benchmark results to the CSV layout read by plot_data.py.")
+    parser.add_argument("output_file", type=Path)
+    parser.add_argument("--db", type=Path, default=ConfigOptions().results_db_path, help="Path of the results database")
+    parser.add_argument("--campaign", type=int, help="Only export this campaign (default: the latest one)")
+    parser.add_argument("--all-campaigns", action="store_true", help="Export the runs of all campaigns")
+    parser.add_argument("--builds", action="store_true", help="Export the recorded builds and their phases instead of the runs")
+    parser.add_argument("--iterations", action="store_true", help="Export every iteration of the runs instead of one row per run")
+    parser.add_argument("--packages", action="store_true", help="With --builds, export the bytes of code per Java package of every build")
+    parser.add_argument("--benchmark")
+    parser.add_argument("--compiler")
+    parser.add_argument("--optimization-level")
+    parser.add_argument("--host")
+    parser.add_argument("--worker", help="Only export runs measured by this distributed worker")
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    with ResultStore(args.db) as store:
+        campaign_id = None if args.all_campaigns else (args.campaign if args.campaign is not None else store.latest_campaign_id())
+        if args.builds:
+            n_rows = store.export_builds_csv(args.output_file, campaign_id, args.packages)
+            print(f"Exported {n_rows} {'package row(s)' if args.packages else 'build(s)'} to {args.output_file}")
+            return
+        if args.iterations:
+            n_rows = store.export_iterations_csv(args.output_file, campaign_id)
+            print(f"Exported {n_rows} iteration(s) to {args.output_file}")
+            return
+
+        n_rows = store.export_csv(
+            args.output_file,
+            campaign_id=campaign_id,
+            benchmark=args.benchmark,
+            compiler=args.compiler,
+            optimization_level=args.optimization_level,
+            host=args.host,
+            worker=args.worker,
+            since=args.since,
+            until=args.until,
+        )
+
+    print(f"Exported {n_rows} run(s) to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
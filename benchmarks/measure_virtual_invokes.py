@@ -1,72 +1,34 @@
-import json
-import pandas as pd 
+import pandas as pd
 from pathlib import Path
 
-profile_data_dir = Path("results/current/profiling-data")
-files = list(profile_data_dir.glob("*.json"))
-
-def proportion_virtual_in_top_n_percent(call_sites: pd.DataFrame, n_percent: float) -> float:
-    n = int(len(call_sites) * n_percent / 100)
-    top_n = call_sites.nlargest(n, "totalCount")
-    virtual_counts = top_n["totalCount"].where(~top_n["isDirectCall"]).sum()
-    total_counts = top_n["totalCount"].sum()
-
-    return virtual_counts / total_counts
-
-def proportion_virtual_callsites_in_top_n_percent(call_sites: pd.DataFrame, n_percent: float) -> float:
-    n = int(len(call_sites) * n_percent / 100)
-    top_n = call_sites.nlargest(n, "totalCount")
-    return len(top_n[top_n["isDirectCall"] == False]) / len(top_n)
-
-def proportion_of_total_count_in_top_n_percent(call_sites: pd.DataFrame, n_percent: float) -> float:
-    n = int(len(call_sites) * n_percent / 100)
-    top_n = call_sites.nlargest(n, "totalCount")
-
-    return top_n["totalCount"].sum() / call_sites["totalCount"].sum()
+from profiling.analysis import CallSiteDistribution, analyse_store
+from profiling.store import ProfileStore
 
-def data_analysis(call_sites: pd.DataFrame) -> pd.DataFrame:
-    call_sites.sort_values(by="totalCount", ascending=False).reset_index(drop=True)
-
-    total_counts = call_sites["totalCount"].values
-    virtual_counts = call_sites["totalCount"].where(~call_sites["isDirectCall"], 0).values
-
-    total_callsites = len(total_counts)
-    total_virtual_callsites = len(call_sites[call_sites["isDirectCall"] == False])
-
-    total_virtual_calls = sum(virtual_counts)
-    total_calls_count = sum(total_counts)
-
-    virtual_calls_proportion = total_virtual_calls / total_calls_count
-    virtual_callsite_proportion = total_virtual_callsites / total_callsites
+profile_data_dir = Path("results/current/profiling-data")
+profile_store_dir = Path("results/current/profile-store")
+cdf_output_path = Path("results/current/callsite-cdf.csv")
 
-    res = pd.DataFrame({
-        "total_callsites": total_callsites,
-        "total_virtual_callsites": total_virtual_callsites,
-        "total_virtual_calls": total_virtual_calls,
-        "total_calls_count": total_calls_count,
-        "virtual_calls_proportion": virtual_calls_proportion,
-        "virtual_callsite_proportion": virtual_callsite_proportion
-    }, index=[0])
 
-    for percent in [1, 2, 3, 4, 10]:
-        res[f"prop_virtual_top_{percent}%"] = proportion_virtual_in_top_n_percent(call_sites, percent)
+def main():
+    files = list(profile_data_dir.glob("*.json"))
 
-    for percent in [1, 2, 3, 4, 10, 50, 75, 90, 100]:
-        res[f"prop_virtual_sites_top_{percent}%"] = proportion_virtual_callsites_in_top_n_percent(call_sites, percent)
+    store = ProfileStore(profile_store_dir)
+    store.ingest(files)
 
-    for percent in [1, 2, 3, 4, 10]:
-        res[f"prop_of_total_top_{percent}%"] = proportion_of_total_count_in_top_n_percent(call_sites, percent)
+    names = [file.stem for file in files]
+    results = analyse_store(store, names)
 
-    return res
+    pd.set_option('display.float_format', '{:.4f}'.format)
+    pd.set_option('display.width', None)
+    print(results.T)
 
-all_data = []
-for file in files:
-    with open(file, "r") as f:
-        data = json.load(f)
+    cdfs = []
+    for name in names:
+        cdf = CallSiteDistribution.from_columns(store.load(name)).cdf()
+        cdf.insert(0, "profile", name)
+        cdfs.append(cdf)
+    pd.concat(cdfs, ignore_index=True).to_csv(cdf_output_path, index=False)
 
-    all_data.extend(data)
 
-all_data = pd.DataFrame(all_data)
-all_data = all_data.sort_values(by="totalCount", ascending=False).reset_index(drop=True)
-pd.set_option('display.float_format', '{:.4f}'.format)
-print(data_analysis(all_data).T)
+if __name__ == "__main__":
+    main()
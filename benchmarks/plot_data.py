@@ -1,80 +1,113 @@
-import csv
-import sys
+import argparse
+import hashlib
+import json
 import matplotlib
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
+from matplotlib.ticker import MaxNLocator
+
+from benchmarks.benchmark import BenchmarkUnit, read_benchmark_units
+from benchmarks.binary_size import BINARY_SECTION_COLUMNS
+from benchmarks.speedup import GROUP_COLUMNS, HOST_COLUMN, group_columns, read_iterations_csv, read_results_csv, split_by_host
+from config.options import ConfigOptions
 
 COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f"]
 PATTERNS = ["", "/", ".", "\\", "*", "\\//\\", "-", "\\"]
-EXECUTION_TIME_BENCHMARKS = ["avrora", "batik", "biojava", "graphchi", "h2", "luindex", "luseach", "pmd", "sunflow", "xalan"]
-THROUGHPUT_BENCHMARKS = ["micronaut-hello-world", "micronaut-shopcart", "micronaut-similarity"]
+# Parts the binary size bars are stacked from, bottom up, and their opacity
+BINARY_SIZE_PARTS = [("code_bytes", "Code", 0.55), ("image_heap_bytes", "Image heap", 0.3), ("rest", "Other sections", 0.15)]
 
 
-def import_csv_data(filename: str) -> pd.DataFrame:
-    with open(filename, "r") as f:
-        reader = csv.DictReader(f)
-        data = []
-        for row in reader:
-            row["result"] = float(row["result"])
-            row["binary_size"] = float(row["binary_size"])
-            data.append(row)
-    return pd.DataFrame(data)
+BASELINE_OPTIMIZATION_LEVEL = "-O0"
 
 
 def calculate_speedup(df: pd.DataFrame, inverse: bool = False) -> pd.DataFrame:
-    result = []
-    for benchmark in df["benchmark"].unique():
-        bench_data = df[df["benchmark"] == benchmark]
-        baseline_mean = bench_data[bench_data["optimization_level"] == "-O0"]["result"].mean()
-
-        for _, row in bench_data.iterrows():
-            speedup = row["result"] / baseline_mean if inverse else baseline_mean / row["result"]
-            result.append({"benchmark": benchmark, "optimization_level": row["optimization_level"], "result": speedup, "binary_size": row["binary_size"]})
+    """
+    Speedup of every run over the mean of the -O0 runs of the same compiler
+    and benchmark on the same host: the ratio of the results for
+    higher-is-better units (`inverse`), and the inverse ratio otherwise.
+    """
+    keys = [df[column] for column in group_columns(df) if column != "optimization_level"]
+    baseline = df["result"].where(df["optimization_level"] == BASELINE_OPTIMIZATION_LEVEL).groupby(keys, observed=True).transform("mean")
+    speedup = df["result"] / baseline if inverse else baseline / df["result"]
 
-    return pd.DataFrame(result)
+    return df.assign(result=speedup)
 
 
 def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
-    return df.groupby(["benchmark", "optimization_level"]).agg({"result": ["mean", "std"], "binary_size": "mean"}).round(2)
+    section_columns = [column for column in BINARY_SECTION_COLUMNS if column in df.columns]
+    return df.groupby(GROUP_COLUMNS, observed=True).agg({"result": ["mean", "std"], "binary_size": "mean", **{column: "mean" for column in section_columns}}).round(2)
+
+
+def binary_size_parts(data: pd.DataFrame, benchmarks: list[str], optimization_levels: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    Mean binary size split into the parts of BINARY_SIZE_PARTS, one row per
+    benchmark and one column per optimization level. Results without a
+    breakdown by section count entirely as other sections.
+    """
+    def unstack(column: str) -> pd.DataFrame:
+        if (column, "mean") not in data.columns:
+            return pd.DataFrame(0.0, index=benchmarks, columns=optimization_levels)
+        return data[(column, "mean")].unstack("optimization_level").reindex(index=benchmarks, columns=optimization_levels).fillna(0.0)
+
+    total = data[("binary_size", "mean")].unstack("optimization_level").reindex(index=benchmarks, columns=optimization_levels)
+    parts = {column: unstack(column) for column, _, _ in BINARY_SIZE_PARTS[:-1]}
+    parts["rest"] = (total - sum(parts.values())).clip(lower=0)
+
+    return parts
+
+
+def compiler_slice(aggregated: pd.DataFrame, compiler: str, benchmarks: list[str]) -> pd.DataFrame:
+    if compiler not in aggregated.index.get_level_values("compiler"):
+        return aggregated.iloc[0:0].droplevel("compiler")
+
+    data = aggregated.xs(compiler, level="compiler")
+    return data[data.index.get_level_values("benchmark").isin(benchmarks)]
 
 
 def plot_benchmarks(data: pd.DataFrame, title: str, ylabel: str, plot_type: str):
     ax = plt.gca()
+    ax.set_title(title)
+    if data.empty:
+        ax.text(0.5, 0.5, "No data", ha="center", va="center", transform=ax.transAxes)
+        ax.set_axis_off()
+        return
+
     ax_twin = ax.twinx()
 
     benchmarks = sorted(data.index.get_level_values("benchmark").unique())
     optimization_levels = sorted(data.index.get_level_values("optimization_level").unique())
 
-    x_positions = range(len(benchmarks))
+    # One row per benchmark and one column per optimization level (NaN where missing)
+    means = data[("result", "mean")].unstack("optimization_level").reindex(index=benchmarks, columns=optimization_levels)
+    errors = data[("result", "std")].unstack("optimization_level").reindex(index=benchmarks, columns=optimization_levels)
+    binary_sizes = binary_size_parts(data, benchmarks, optimization_levels)
+
+    x_positions = np.arange(len(benchmarks))
     bar_width = 0.8 / len(optimization_levels)
 
     for i, optimization_level in enumerate(optimization_levels):
-        y_values = []
-        errors = []
-        binary_sizes = []
-
-        for benchmark in benchmarks:
-            row = data.loc[(benchmark, optimization_level)]
-            y_values.append(row[("result", "mean")])
-            errors.append(row[("result", "std")])
-            binary_sizes.append(row[("binary_size", "mean")])
-
         offset = (i - len(optimization_levels) / 2) * bar_width + bar_width / 2
-        bar_positions = [x + offset for x in x_positions]
+        bar_positions = x_positions + offset
 
-        metric_bar_positions = [p - bar_width / 4 for p in bar_positions]
-        binary_bar_positions = [p + bar_width / 4 for p in bar_positions]
+        metric_bar_positions = bar_positions - bar_width / 4
+        binary_bar_positions = bar_positions + bar_width / 4
 
+        y_values = means[optimization_level].to_numpy()
         ax.bar(metric_bar_positions, y_values, bar_width / 2, label=optimization_level, color=COLORS[i], alpha=0.8, hatch=PATTERNS[i] * 2, hatch_linewidth=0.25)
-        ax_twin.bar(binary_bar_positions, binary_sizes, bar_width / 2, color=COLORS[i], alpha=0.4, hatch=PATTERNS[i] * 2, hatch_linewidth=0.25)
-        ax.errorbar(metric_bar_positions, y_values, yerr=errors, fmt="none", color="black", capsize=3, alpha=0.7)
+        bottom = np.zeros(len(benchmarks))
+        for column, _, alpha in BINARY_SIZE_PARTS:
+            heights = binary_sizes[column][optimization_level].to_numpy()
+            ax_twin.bar(binary_bar_positions, heights, bar_width / 2, bottom=bottom, color=COLORS[i], alpha=alpha, hatch=PATTERNS[i] * 2, hatch_linewidth=0.25)
+            bottom = bottom + np.nan_to_num(heights)
+        ax.errorbar(metric_bar_positions, y_values, yerr=errors[optimization_level].to_numpy(), fmt="none", color="black", capsize=3, alpha=0.7)
 
     ax.set_xticks(x_positions)
     ax.set_xticklabels(benchmarks, rotation=0)
     ax.set_ylabel(ylabel)
-    ax.set_title(title)
     ax.grid(True, axis="y", alpha=0.3)
 
     ax_twin.set_ylabel("Binary Size (bytes)", color="grey")
@@ -84,7 +117,8 @@ def plot_benchmarks(data: pd.DataFrame, title: str, ylabel: str, plot_type: str)
         ax.axhline(y=1.0, color="black", linestyle="--", alpha=0.5)
 
 
-def create_plot(execution_data: pd.DataFrame, throughput_data: pd.DataFrame, compiler: str, plot_type: str):
+def create_plot(execution_data: pd.DataFrame, throughput_data: pd.DataFrame, compiler: str, plot_type: str, output_path: Path):
+    matplotlib.use("Agg")
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
 
     plt.sca(ax1)
@@ -96,44 +130,156 @@ def create_plot(execution_data: pd.DataFrame, throughput_data: pd.DataFrame, com
     plot_benchmarks(throughput_data, "Throughput Benchmarks", ylabel, plot_type)
 
     handles = []
-    optimization_levels = sorted(execution_data.index.get_level_values("optimization_level").unique())
+    optimization_levels = sorted(set(execution_data.index.get_level_values("optimization_level")) | set(throughput_data.index.get_level_values("optimization_level")))
     for i, label in enumerate(optimization_levels):
         handles.append(Patch(facecolor=COLORS[i], hatch=PATTERNS[i] * 3, label=label))
-    handles.append(Patch(facecolor="lightgrey", label="Binary Size"))
+    for _, label, alpha in BINARY_SIZE_PARTS:
+        handles.append(Patch(facecolor="grey", alpha=alpha, label=f"Binary Size: {label}"))
 
     fig.legend(handles=handles, title="Optimization Level", loc="lower center", ncol=len(handles))
     fig.suptitle(f'Benchmark results for {compiler.replace("_", " ").lower()} compiler', fontsize=16)
 
     plt.tight_layout(rect=(0, 0.1, 1, 1))
 
-    (Path("results") / "plots").mkdir(exist_ok=True, parents=True)
-    plt.savefig(f"results/plots/{plot_type}_{compiler.lower()}.png", dpi=300, bbox_inches="tight")
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    plt.savefig(output_path, dpi=300, bbox_inches="tight")
     plt.close()
 
+    return output_path
 
-def main():
+
+def aggregate_iterations(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean value of every iteration over the runs of a configuration on a
+    host, and the median iteration the runs reached steady state in (NaN if
+    none did).
+    """
+    columns = group_columns(df)
+    steady_start = df[df["steady_state"].astype(bool)].groupby(["run_id", *columns], observed=True)["iteration"].min()
+    curves = df.groupby([*columns, "iteration"], observed=True)["value"].mean().reset_index()
+    steady = steady_start.groupby(columns, observed=True).median().rename("steady_state_iteration")
+
+    return curves.merge(steady.reset_index(), on=columns, how="left")
+
+
+def create_warmup_plot(curves: pd.DataFrame, compiler: str, output_path: Path):
+    """One panel per benchmark with the warmup curve of every optimization level."""
     matplotlib.use("Agg")
+    benchmarks = sorted(curves["benchmark"].unique())
+    optimization_levels = sorted(curves["optimization_level"].unique())
+    n_columns = min(len(benchmarks), 4)
+    n_rows = -(-len(benchmarks) // n_columns)
+    fig, axes = plt.subplots(n_rows, n_columns, figsize=(5 * n_columns, 3.5 * n_rows), squeeze=False)
+
+    for ax, benchmark in zip(axes.flat, benchmarks):
+        ax.set_title(benchmark)
+        for i, optimization_level in enumerate(optimization_levels):
+            curve = curves[(curves["benchmark"] == benchmark) & (curves["optimization_level"] == optimization_level)]
+            if curve.empty:
+                continue
+            ax.plot(curve["iteration"] + 1, curve["value"], marker="o", markersize=3, color=COLORS[i], label=optimization_level)
+            if not np.isnan(steady := curve["steady_state_iteration"].iloc[0]):
+                ax.axvline(steady + 1, color=COLORS[i], linestyle="--", alpha=0.5)
+        ax.set_xlabel("Iteration")
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        ax.grid(True, alpha=0.3)
+    for ax in axes.flat[len(benchmarks):]:
+        ax.set_axis_off()
+
+    handles = [Patch(facecolor=COLORS[i], label=label) for i, label in enumerate(optimization_levels)]
+    fig.legend(handles=handles, title="Optimization Level (dashed: steady state)", loc="lower center", ncol=len(handles))
+    fig.suptitle(f'Warmup curves for {compiler.replace("_", " ").lower()} compiler', fontsize=16)
+    plt.tight_layout(rect=(0, 0.08, 1, 1))
+
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    plt.savefig(output_path, dpi=200, bbox_inches="tight")
+    plt.close()
+
+    return output_path
 
-    if len(sys.argv) != 2:
-        print(f"Usage: python {sys.argv[0]} <data_file.csv>")
-        sys.exit(1)
 
-    df = import_csv_data(sys.argv[1])
+def slice_hash(*frames: pd.DataFrame) -> str:
+    """
+    Hash of the data a figure is drawn from and of this script, so a figure
+    is only redrawn when either changed.
+    """
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+        digest.update(repr(list(frame.columns)).encode())
 
-    for compiler in df["compiler"].unique():
-        compiler_data = df[df["compiler"] == compiler]
+    return digest.hexdigest()
 
-        execution_raw = compiler_data[compiler_data["benchmark"].isin(EXECUTION_TIME_BENCHMARKS)]
-        throughput_raw = compiler_data[compiler_data["benchmark"].isin(THROUGHPUT_BENCHMARKS)]
 
-        execution_absolute = aggregate_data(execution_raw)
-        throughput_absolute = aggregate_data(throughput_raw)
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Plot the absolute results and speedups over -O0 of every compiler.")
+    parser.add_argument("data_file", type=Path, help="CSV file with the results, as exported by run_benchmarks.py")
+    parser.add_argument("--output-dir", type=Path, default=Path("results") / "plots")
+    parser.add_argument("--benchmarks-file", type=Path, default=ConfigOptions().benchmarks_file_path, help="Benchmarks file the units of the benchmarks are taken from")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes rendering figures (default: one per CPU)")
+    parser.add_argument("--iterations-file", type=Path, help="CSV file with every iteration of the runs, as exported by run_benchmarks.py, to draw warmup curves from")
+    parser.add_argument("--force", action="store_true", help="Redraw every figure, even if its data did not change")
+    return parser.parse_args()
 
-        execution_speedup = aggregate_data(calculate_speedup(execution_raw, inverse=False))
-        throughput_speedup = aggregate_data(calculate_speedup(throughput_raw, inverse=True))
 
-        create_plot(execution_absolute, throughput_absolute, compiler, "absolute")
-        create_plot(execution_speedup, throughput_speedup, compiler, "speedup")
+def main():
+    args = parse_args()
+
+    units = read_benchmark_units(args.benchmarks_file)
+    execution_time_benchmarks = [name for name, unit in units.items() if unit == BenchmarkUnit.EXECUTION_TIME]
+    throughput_benchmarks = [name for name, unit in units.items() if unit == BenchmarkUnit.THROUGHPUT]
+
+    df = read_results_csv(args.data_file)
+    # Results of several hosts are plotted apart, one set of figures per host
+    hosts = split_by_host(df)
+
+    manifest_path = args.output_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() and not args.force else {}
+
+    figures = []
+    for host, host_df in hosts:
+        suffix = f"_{host}" if len(hosts) > 1 else ""
+        is_throughput = host_df["benchmark"].isin(throughput_benchmarks)
+        absolute = aggregate_data(host_df)
+        speedup = aggregate_data(pd.concat([
+            calculate_speedup(host_df[~is_throughput], inverse=False),
+            calculate_speedup(host_df[is_throughput], inverse=True),
+        ]))
+
+        for compiler in df["compiler"].cat.categories:
+            for plot_type, aggregated in (("absolute", absolute), ("speedup", speedup)):
+                execution_data = compiler_slice(aggregated, compiler, execution_time_benchmarks)
+                throughput_data = compiler_slice(aggregated, compiler, throughput_benchmarks)
+                output_path = args.output_dir / f"{plot_type}_{compiler.lower()}{suffix}.png"
+
+                digest = slice_hash(execution_data, throughput_data)
+                if manifest.get(output_path.name) == digest and output_path.exists():
+                    continue
+                figures.append((digest, create_plot, (execution_data, throughput_data, compiler, plot_type, output_path)))
+
+    n_figures = 2 * len(df["compiler"].cat.categories) * len(hosts)
+    if args.iterations_file is not None:
+        iterations = aggregate_iterations(read_iterations_csv(args.iterations_file))
+        by_host = HOST_COLUMN in iterations.columns and iterations[HOST_COLUMN].nunique() > 1
+        for key, curves in iterations.groupby(["compiler", HOST_COLUMN] if by_host else ["compiler"], observed=True):
+            compiler, suffix = (key[0], f"_{key[1]}") if by_host else (key[0], "")
+            output_path = args.output_dir / f"warmup_{compiler.lower()}{suffix}.png"
+            n_figures += 1
+            digest = slice_hash(curves.reset_index(drop=True))
+            if manifest.get(output_path.name) == digest and output_path.exists():
+                continue
+            figures.append((digest, create_warmup_plot, (curves, compiler, output_path)))
+
+    print(f"Drawing {len(figures)} figure(s), {n_figures - len(figures)} unchanged")
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(function, *figure): digest for digest, function, figure in figures}
+        for future in as_completed(futures):
+            output_path = future.result()
+            manifest[output_path.name] = futures[future]
+            print(f"Saved {output_path}")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from profiling.store import ProfileColumns, ProfileStore
+
+TOP_PERCENTAGES = [1, 2, 3, 4, 10]
+TOP_SITE_PERCENTAGES = [1, 2, 3, 4, 10, 50, 75, 90, 100]
+
+
+@dataclass
+class CallSiteDistribution:
+    """
+    Call sites sorted once by descending `totalCount`, with cumulative call
+    and virtual-call counts, so statistics over the top N% of call sites are
+    array lookups for any set of N.
+    """
+    counts: np.ndarray
+    cumulative_counts: np.ndarray
+    cumulative_virtual_counts: np.ndarray
+    cumulative_virtual_sites: np.ndarray
+
+    @classmethod
+    def from_arrays(cls, total_count: np.ndarray, is_direct_call: np.ndarray) -> "CallSiteDistribution":
+        order = np.argsort(-np.asarray(total_count), kind="stable")
+        counts = np.asarray(total_count, dtype=np.int64)[order]
+        is_virtual = ~np.asarray(is_direct_call, dtype=bool)[order]
+
+        return cls(
+            counts=counts,
+            cumulative_counts=np.cumsum(counts),
+            cumulative_virtual_counts=np.cumsum(np.where(is_virtual, counts, 0)),
+            cumulative_virtual_sites=np.cumsum(is_virtual),
+        )
+
+    @classmethod
+    def from_columns(cls, columns: ProfileColumns) -> "CallSiteDistribution":
+        return cls.from_arrays(columns.total_count, columns.is_direct_call)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def total_calls(self) -> int:
+        return int(self.cumulative_counts[-1]) if len(self) else 0
+
+    @property
+    def total_virtual_calls(self) -> int:
+        return int(self.cumulative_virtual_counts[-1]) if len(self) else 0
+
+    @property
+    def total_virtual_callsites(self) -> int:
+        return int(self.cumulative_virtual_sites[-1]) if len(self) else 0
+
+    def _top_n(self, percentages: Iterable[float]) -> np.ndarray:
+        return (len(self) * np.asarray(list(percentages), dtype=float) / 100).astype(np.int64)
+
+    def _at(self, cumulative: np.ndarray, n: np.ndarray) -> np.ndarray:
+        values = np.zeros(len(n), dtype=float)
+        values[n > 0] = cumulative[n[n > 0] - 1]
+        return values
+
+    def proportion_virtual_in_top(self, percentages: Iterable[float]) -> np.ndarray:
+        """Share of the calls made by the top N% of call sites that is virtual."""
+        n = self._top_n(percentages)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._at(self.cumulative_virtual_counts, n) / self._at(self.cumulative_counts, n)
+
+    def proportion_virtual_sites_in_top(self, percentages: Iterable[float]) -> np.ndarray:
+        """Share of the top N% of call sites that is virtual."""
+        n = self._top_n(percentages)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._at(self.cumulative_virtual_sites, n) / n
+
+    def proportion_of_total_in_top(self, percentages: Iterable[float]) -> np.ndarray:
+        """Share of all calls made by the top N% of call sites."""
+        n = self._top_n(percentages)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._at(self.cumulative_counts, n) / self.total_calls
+
+    def cdf(self, n_points: int = 1001) -> pd.DataFrame:
+        percentages = np.linspace(0, 100, n_points)
+        return pd.DataFrame({
+            "top_percent": percentages,
+            "prop_of_total": self.proportion_of_total_in_top(percentages),
+            "prop_of_virtual": self._at(self.cumulative_virtual_counts, self._top_n(percentages)) / max(self.total_virtual_calls, 1),
+            "prop_virtual": self.proportion_virtual_in_top(percentages),
+        })
+
+    def summary(self, top_percentages: list[float] = TOP_PERCENTAGES, top_site_percentages: list[float] = TOP_SITE_PERCENTAGES) -> dict[str, float]:
+        res = {
+            "total_callsites": len(self),
+            "total_virtual_callsites": self.total_virtual_callsites,
+            "total_virtual_calls": self.total_virtual_calls,
+            "total_calls_count": self.total_calls,
+            "virtual_calls_proportion": self.total_virtual_calls / self.total_calls if self.total_calls else np.nan,
+            "virtual_callsite_proportion": self.total_virtual_callsites / len(self) if len(self) else np.nan,
+        }
+
+        for percent, value in zip(top_percentages, self.proportion_virtual_in_top(top_percentages)):
+            res[f"prop_virtual_top_{percent}%"] = value
+
+        for percent, value in zip(top_site_percentages, self.proportion_virtual_sites_in_top(top_site_percentages)):
+            res[f"prop_virtual_sites_top_{percent}%"] = value
+
+        for percent, value in zip(top_percentages, self.proportion_of_total_in_top(top_percentages)):
+            res[f"prop_of_total_top_{percent}%"] = value
+
+        return res
+
+
+def _analyse_profile(store_path: Path, name: str) -> dict[str, float]:
+    return CallSiteDistribution.from_columns(ProfileStore(store_path).load(name)).summary()
+
+
+def analyse_store(store: ProfileStore, names: list[str] | None = None, max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Summarise every profile in the store, one row per profile, in a process
+    pool, plus a pooled row ("all") over the call sites of all profiles.
+    """
+    names = names if names is not None else store.profiles
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        rows = dict(zip(names, executor.map(_analyse_profile, [store.path] * len(names), names)))
+
+    profiles = [store.load(name) for name in names]
+    pooled = CallSiteDistribution.from_arrays(
+        np.concatenate([p.total_count for p in profiles]) if profiles else np.zeros(0, dtype=np.int64),
+        np.concatenate([p.is_direct_call for p in profiles]) if profiles else np.zeros(0, dtype=bool),
+    )
+    rows["all"] = pooled.summary()
+
+    return pd.DataFrame.from_dict(rows, orient="index")
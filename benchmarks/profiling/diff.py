@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from profiling.store import ProfileColumns, StringTable
+
+MORPHISM_LABELS = np.array(["none", "monomorphic", "polymorphic"], dtype=object)
+
+
+def _pack(high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """Pack two arrays of non-negative 32-bit ids into one int64 key."""
+    return (np.asarray(high, dtype=np.int64) << 32) | np.asarray(low, dtype=np.int64)
+
+
+def _morphism(n_receivers: np.ndarray) -> np.ndarray:
+    return MORPHISM_LABELS[np.minimum(n_receivers, 2)]
+
+
+@dataclass
+class SiteTable:
+    """
+    Call sites of a profile aggregated on (targetMethod, source), with the
+    receivers of each site aggregated by type. `receiver_site` holds the
+    index of the site each receiver belongs to.
+    """
+    keys: np.ndarray
+    total_count: np.ndarray
+    is_direct_call: np.ndarray
+    receiver_site: np.ndarray
+    receiver_ids: np.ndarray
+    receiver_counts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_columns(cls, columns: ProfileColumns) -> "SiteTable":
+        # factorize hashes the keys, so aggregation stays linear in the number of sites
+        site_codes, keys = pd.factorize(_pack(columns.target_method, columns.source))
+        sites = pd.DataFrame({"total_count": columns.total_count, "is_direct_call": columns.is_direct_call}).groupby(site_codes, sort=True)
+
+        receiver_codes, receiver_keys = pd.factorize(_pack(np.repeat(site_codes, columns.receivers_per_site), columns.receiver_ids))
+        receiver_counts = pd.Series(np.asarray(columns.receiver_counts)).groupby(receiver_codes, sort=True).sum()
+
+        return cls(
+            keys=np.asarray(keys, dtype=np.int64),
+            total_count=sites["total_count"].sum().to_numpy(np.int64),
+            is_direct_call=sites["is_direct_call"].all().to_numpy(bool),
+            receiver_site=(receiver_keys >> 32).astype(np.int64),
+            receiver_ids=(receiver_keys & 0xFFFFFFFF).astype(np.int64),
+            receiver_counts=receiver_counts.to_numpy(np.int64),
+        )
+
+    def ranks(self) -> np.ndarray:
+        """Rank of every site by descending total count, 1 being the hottest; ties share the best rank."""
+        return pd.Series(self.total_count).rank(method="min", ascending=False).to_numpy(np.int64)
+
+    def receivers_per_site(self) -> np.ndarray:
+        return np.bincount(self.receiver_site, minlength=len(self))
+
+    def receiver_totals(self) -> np.ndarray:
+        return np.bincount(self.receiver_site, weights=self.receiver_counts, minlength=len(self))
+
+
+@dataclass
+class ProfileDiff:
+    """
+    Site-by-site comparison of two profiles, one row per (targetMethod,
+    source) seen in either of them.
+    """
+    sites: pd.DataFrame
+
+    @property
+    def common(self) -> pd.DataFrame:
+        return self.sites[self.sites["status"] == "common"]
+
+    def summary(self) -> dict[str, float]:
+        sites, common = self.sites, self.common
+        calls_before, calls_after = sites["count_before"].sum(), sites["count_after"].sum()
+        with_receivers = common.dropna(subset=["receiver_tv_distance"])
+        weights = with_receivers["count_before"] + with_receivers["count_after"]
+
+        return {
+            "sites_before": int((sites["status"] != "added").sum()),
+            "sites_after": int((sites["status"] != "removed").sum()),
+            "common_sites": len(common),
+            "added_sites": int((sites["status"] == "added").sum()),
+            "removed_sites": int((sites["status"] == "removed").sum()),
+            "calls_before": int(calls_before),
+            "calls_after": int(calls_after),
+            "added_calls_proportion": sites.loc[sites["status"] == "added", "count_after"].sum() / calls_after if calls_after else np.nan,
+            "removed_calls_proportion": sites.loc[sites["status"] == "removed", "count_before"].sum() / calls_before if calls_before else np.nan,
+            "mean_abs_rank_change": common["rank_change"].abs().mean(),
+            "monomorphic_to_polymorphic": int(((common["morphism_before"] == "monomorphic") & (common["morphism_after"] == "polymorphic")).sum()),
+            "polymorphic_to_monomorphic": int(((common["morphism_before"] == "polymorphic") & (common["morphism_after"] == "monomorphic")).sum()),
+            "receivers_appeared": int(common["receivers_appeared"].sum()),
+            "receivers_vanished": int(common["receivers_vanished"].sum()),
+            "mean_receiver_tv_distance": with_receivers["receiver_tv_distance"].mean(),
+            "weighted_receiver_tv_distance": np.average(with_receivers["receiver_tv_distance"], weights=weights) if weights.sum() else np.nan,
+        }
+
+
+def diff_profiles(before: ProfileColumns, after: ProfileColumns, strings: StringTable) -> ProfileDiff:
+    """
+    Join two profiles from the same store on (targetMethod, source) and
+    compare their counts, ranks and receiver distributions.
+
+    Sites are joined through a hash index on their interned ids, so the
+    diff is linear in the number of call sites and receivers, apart from
+    ranking the sites of each profile. Receiver distributions are compared
+    by their total-variation distance, half the sum of the absolute
+    differences of the share of each receiver type, from 0 for identical
+    distributions to 1 for disjoint ones; it is only defined for sites with
+    receivers in both profiles.
+    """
+    a, b = SiteTable.from_columns(before), SiteTable.from_columns(after)
+
+    # Joined sites are the sites of `a`, followed by those only in `b`
+    positions = pd.Index(a.keys).get_indexer(b.keys)
+    only_b = positions < 0
+    b_to_joined = positions.copy()
+    b_to_joined[only_b] = len(a) + np.arange(np.count_nonzero(only_b))
+    keys = np.concatenate([a.keys, b.keys[only_b]])
+    n = len(keys)
+
+    in_a = np.arange(n) < len(a)
+    in_b = np.zeros(n, dtype=bool)
+    in_b[b_to_joined] = True
+
+    def scatter(values: np.ndarray, index: np.ndarray, fill) -> np.ndarray:
+        result = np.full(n, fill, dtype=np.result_type(values, type(fill)))
+        result[index] = values
+        return result
+
+    a_index = np.arange(len(a))
+    count_before = scatter(a.total_count, a_index, 0)
+    count_after = scatter(b.total_count, b_to_joined, 0)
+    rank_before = scatter(a.ranks().astype(float), a_index, np.nan)
+    rank_after = scatter(b.ranks().astype(float), b_to_joined, np.nan)
+    receivers_before = scatter(a.receivers_per_site(), a_index, 0)
+    receivers_after = scatter(b.receivers_per_site(), b_to_joined, 0)
+    is_direct_call = np.where(in_b, scatter(b.is_direct_call, b_to_joined, False), scatter(a.is_direct_call, a_index, False))
+
+    # Receiver shares of both profiles, joined on (site, receiver type)
+    a_totals, b_totals = a.receiver_totals(), b.receiver_totals()
+    a_receiver_site = a.receiver_site
+    b_receiver_site = b_to_joined[b.receiver_site]
+    receiver_codes, receiver_keys = pd.factorize(np.concatenate([_pack(a_receiver_site, a.receiver_ids), _pack(b_receiver_site, b.receiver_ids)]))
+    n_pairs = len(receiver_keys)
+    a_codes, b_codes = receiver_codes[:len(a.receiver_ids)], receiver_codes[len(a.receiver_ids):]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share_before = np.bincount(a_codes, weights=a.receiver_counts / a_totals[a.receiver_site], minlength=n_pairs)
+        share_after = np.bincount(b_codes, weights=b.receiver_counts / b_totals[b.receiver_site], minlength=n_pairs)
+    pair_site = receiver_keys >> 32
+
+    seen_before = np.bincount(a_codes, minlength=n_pairs) > 0
+    seen_after = np.bincount(b_codes, minlength=n_pairs) > 0
+    receivers_appeared = np.bincount(pair_site, weights=seen_after & ~seen_before, minlength=n).astype(np.int64)
+    receivers_vanished = np.bincount(pair_site, weights=seen_before & ~seen_after, minlength=n).astype(np.int64)
+    tv_distance = 0.5 * np.bincount(pair_site, weights=np.abs(share_before - share_after), minlength=n)
+    tv_distance[(receivers_before == 0) | (receivers_after == 0)] = np.nan
+    receivers_appeared[~(in_a & in_b)] = 0
+    receivers_vanished[~(in_a & in_b)] = 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        count_ratio = np.where(in_a & in_b, count_after / count_before, np.nan)
+
+    return ProfileDiff(pd.DataFrame({
+        "targetMethod": strings.lookup((keys >> 32).astype(np.int32)),
+        "source": strings.lookup((keys & 0xFFFFFFFF).astype(np.int32)),
+        "status": np.where(in_a & in_b, "common", np.where(in_a, "removed", "added")),
+        "is_direct_call": is_direct_call,
+        "count_before": count_before,
+        "count_after": count_after,
+        "count_delta": count_after - count_before,
+        "count_ratio": count_ratio,
+        "rank_before": rank_before,
+        "rank_after": rank_after,
+        "rank_change": rank_before - rank_after,
+        "receivers_before": receivers_before,
+        "receivers_after": receivers_after,
+        "morphism_before": _morphism(receivers_before),
+        "morphism_after": _morphism(receivers_after),
+        "receivers_appeared": receivers_appeared,
+        "receivers_vanished": receivers_vanished,
+        "receiver_tv_distance": tv_distance,
+    }))
@@ -0,0 +1,85 @@
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from profiling.reader import iter_call_sites
+
+
+@dataclass(frozen=True)
+class ProfileFilter:
+    """
+    Rules for pruning a profile before it is passed to a PGO build. Sites
+    are first restricted to virtual calls if `virtual_only`, then to the
+    top `top_percent`% of the remaining sites by `totalCount`, and to the
+    fewest hottest sites that make `coverage` of their calls. The receivers
+    of every kept site are cut to its `max_receivers` most frequent ones.
+    """
+    name: str
+    top_percent: float | None = field(default=None)
+    coverage: float | None = field(default=None)
+    virtual_only: bool = field(default=False)
+    max_receivers: int | None = field(default=None)
+
+    def __post_init__(self):
+        if self.top_percent is not None and not 0 < self.top_percent <= 100:
+            raise ValueError(f"top_percent of profile filter '{self.name}' must be in (0, 100], got {self.top_percent}")
+        if self.coverage is not None and not 0 < self.coverage <= 1:
+            raise ValueError(f"coverage of profile filter '{self.name}' must be in (0, 1], got {self.coverage}")
+        if self.max_receivers is not None and self.max_receivers < 0:
+            raise ValueError(f"max_receivers of profile filter '{self.name}' must not be negative, got {self.max_receivers}")
+
+    def select(self, total_count: np.ndarray, is_direct_call: np.ndarray) -> np.ndarray:
+        """
+        Mask of the call sites, in profile order, that the filter keeps. The
+        top percentage rounds up, so it keeps at least one site.
+        """
+        candidates = np.flatnonzero(~is_direct_call) if self.virtual_only else np.arange(len(total_count))
+        hottest = candidates[np.argsort(-total_count[candidates], kind="stable")]
+
+        n = len(hottest)
+        if self.top_percent is not None:
+            n = min(n, math.ceil(len(hottest) * self.top_percent / 100))
+        if self.coverage is not None and len(hottest):
+            cumulative = np.cumsum(total_count[hottest])
+            n = min(n, int(np.searchsorted(cumulative, self.coverage * cumulative[-1])) + 1)
+
+        keep = np.zeros(len(total_count), dtype=bool)
+        keep[hottest[:n]] = True
+        return keep
+
+    def apply(self, source: Path, destination: Path) -> tuple[int, int]:
+        """
+        Write the call sites of the profile at `source` that the filter keeps
+        to `destination`. The profile is streamed twice, once for the counts
+        the sites are ranked by and once to copy the kept sites, so only the
+        counts are held in memory. Returns the kept and total number of sites.
+        Raises ValueError rather than write an empty profile.
+        """
+        counts, direct = [], []
+        for call_site in iter_call_sites(source):
+            counts.append(call_site["totalCount"])
+            direct.append(call_site["isDirectCall"])
+        keep = self.select(np.asarray(counts, dtype=np.int64), np.asarray(direct, dtype=bool))
+        if counts and not keep.any():
+            raise ValueError(f"Profile filter '{self.name}' keeps none of the {len(counts)} call sites of {source}")
+
+        tmp_path = destination.with_name(f"{destination.name}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write("[")
+            written = 0
+            for kept, call_site in zip(keep, iter_call_sites(source)):
+                if not kept:
+                    continue
+                if self.max_receivers is not None:
+                    receivers = sorted(call_site["receiverCounts"].items(), key=lambda item: item[1], reverse=True)
+                    call_site = {**call_site, "receiverCounts": dict(receivers[:self.max_receivers])}
+                f.write(",\n" if written else "\n")
+                json.dump(call_site, f)
+                written += 1
+            f.write("\n]\n")
+        tmp_path.replace(destination)
+
+        return written, len(keep)
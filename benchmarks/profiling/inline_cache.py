@@ -0,0 +1,150 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from profiling.store import ProfileColumns, ProfileStore
+
+MAX_RECEIVERS = 8
+TOP_SITE_PERCENTAGES = [1, 2, 3, 4, 10, 50, 100]
+MIN_SHARES = [0.0, 0.01, 0.05, 0.1, 0.25]
+
+
+@dataclass
+class ReceiverTable:
+    """
+    Receiver counts of the virtual call sites of a profile, hottest site
+    first. `cumulative_counts[i, j]` is the number of calls of site `i` made
+    on its `j` most frequent receivers, and `sorted_shares` the share of
+    its site's calls of every receiver, most frequent first.
+    """
+    cumulative_counts: np.ndarray
+    site_totals: np.ndarray
+    sorted_shares: np.ndarray
+    share_sites: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.site_totals)
+
+    @classmethod
+    def from_columns(cls, columns: ProfileColumns, max_receivers: int = MAX_RECEIVERS) -> "ReceiverTable":
+        receivers_per_site = columns.receivers_per_site
+        receiver_site = np.repeat(np.arange(len(columns)), receivers_per_site)
+        receiver_counts = np.asarray(columns.receiver_counts, dtype=np.int64)
+
+        # Hottest virtual sites first
+        virtual = ~np.asarray(columns.is_direct_call, dtype=bool)
+        site_order = np.argsort(-np.asarray(columns.total_count), kind="stable")
+        site_order = site_order[virtual[site_order]]
+        site_rank = np.full(len(columns), -1, dtype=np.int64)
+        site_rank[site_order] = np.arange(len(site_order))
+
+        keep = site_rank[receiver_site] >= 0
+        receiver_site, receiver_counts = site_rank[receiver_site[keep]], receiver_counts[keep]
+        order = np.lexsort((-receiver_counts, receiver_site))
+        receiver_site, receiver_counts = receiver_site[order], receiver_counts[order]
+
+        n_sites = len(site_order)
+        starts = np.zeros(n_sites + 1, dtype=np.int64)
+        np.cumsum(np.bincount(receiver_site, minlength=n_sites), out=starts[1:])
+        position = np.arange(len(receiver_site)) - starts[receiver_site]
+
+        counts = np.zeros((n_sites, max_receivers + 1), dtype=np.int64)
+        capped = position < max_receivers
+        counts[receiver_site[capped], position[capped] + 1] = receiver_counts[capped]
+        site_totals = np.bincount(receiver_site, weights=receiver_counts, minlength=n_sites).astype(np.int64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = receiver_counts / site_totals[receiver_site]
+
+        return cls(
+            cumulative_counts=np.cumsum(counts, axis=1),
+            site_totals=site_totals,
+            sorted_shares=shares,
+            share_sites=receiver_site,
+        )
+
+    @property
+    def max_receivers(self) -> int:
+        return self.cumulative_counts.shape[1] - 1
+
+    def receivers_above(self, min_share: float) -> np.ndarray:
+        """Number of receivers of every site with at least `min_share` of its calls."""
+        return np.bincount(self.share_sites, weights=self.sorted_shares >= min_share, minlength=len(self)).astype(np.int64)
+
+
+def simulate(
+    table: ReceiverTable,
+    max_receivers: Iterable[int] = range(1, MAX_RECEIVERS + 1),
+    top_site_percentages: Iterable[float] = TOP_SITE_PERCENTAGES,
+    min_shares: Iterable[float] = MIN_SHARES,
+) -> pd.DataFrame:
+    """
+    Estimate the fast-path hit rate of every combination of inline-cache
+    policies: at most N guarded receivers per site, caches only at the top
+    K% hottest virtual call sites, and only receivers with at least a given
+    share of their site's calls. A call is served by the fast path when its
+    receiver is guarded at its site. Code size is estimated by the number of
+    guarded receivers emitted.
+
+    Every threshold costs one pass over the receivers; all receiver limits
+    and site percentages are then evaluated at once over the sites.
+    """
+    n = np.asarray(list(max_receivers), dtype=np.int64)
+    if len(n) and (n.min() < 0 or n.max() > table.max_receivers):
+        raise ValueError(f"Receiver limits must be between 0 and {table.max_receivers}, got {n.tolist()}")
+
+    percentages = np.asarray(list(top_site_percentages), dtype=float)
+    top_sites = (len(table) * percentages / 100).astype(np.int64)
+    total_calls = table.site_totals.sum()
+
+    rows = []
+    for min_share in min_shares:
+        # (receiver limits, sites)
+        guarded = np.minimum(n[:, None], table.receivers_above(min_share)[None, :])
+        served = np.take_along_axis(table.cumulative_counts.T, guarded, axis=0)
+
+        cumulative_served = np.concatenate([np.zeros((len(n), 1)), np.cumsum(served, axis=1)], axis=1)[:, top_sites]
+        cumulative_guarded = np.concatenate([np.zeros((len(n), 1), dtype=np.int64), np.cumsum(guarded, axis=1)], axis=1)[:, top_sites]
+        cumulative_cached = np.concatenate([np.zeros((len(n), 1), dtype=np.int64), np.cumsum(guarded > 0, axis=1)], axis=1)[:, top_sites]
+
+        grid_n, grid_percent = np.meshgrid(n, percentages, indexing="ij")
+        rows.append(pd.DataFrame({
+            "max_receivers": grid_n.ravel(),
+            "top_site_percent": grid_percent.ravel(),
+            "min_share": min_share,
+            "served_calls": cumulative_served.ravel(),
+            "virtual_calls": total_calls,
+            "guarded_receivers": cumulative_guarded.ravel(),
+            "cached_sites": cumulative_cached.ravel(),
+        }))
+
+    result = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["hit_rate"] = result["served_calls"] / result["virtual_calls"]
+
+    return result
+
+
+def simulate_store(store: ProfileStore, names: list[str] | None = None, **policies) -> pd.DataFrame:
+    """
+    Simulate the policies on every profile in the store, plus a pooled row
+    ("all") per policy over the calls of all profiles.
+    """
+    names = names if names is not None else store.profiles
+    max_receivers = max(policies.get("max_receivers", [MAX_RECEIVERS]), default=MAX_RECEIVERS)
+
+    results = []
+    for name in names:
+        result = simulate(ReceiverTable.from_columns(store.load(name), max_receivers), **policies)
+        result.insert(0, "profile", name)
+        results.append(result)
+
+    df = pd.concat(results, ignore_index=True)
+    policy_columns = ["max_receivers", "top_site_percent", "min_share"]
+    pooled = df.groupby(policy_columns, as_index=False)[["served_calls", "virtual_calls", "guarded_receivers", "cached_sites"]].sum()
+    pooled["hit_rate"] = pooled["served_calls"] / pooled["virtual_calls"]
+    pooled.insert(0, "profile", "all")
+
+    return pd.concat([df, pooled], ignore_index=True)
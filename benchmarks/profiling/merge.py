@@ -0,0 +1,98 @@
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from profiling.reader import iter_call_sites
+
+
+@dataclass
+class _MergedSite:
+    target_method: str
+    source: str
+    is_direct_call: bool
+    unique_callsites: int
+    run_counts: np.ndarray
+    receiver_counts: Counter = field(default_factory=Counter)
+
+
+def run_weights(totals: list[int], normalize: bool = False, decay: float = 1.0) -> np.ndarray:
+    """
+    Weight of every run in a merge, in run order. Normalization scales each
+    run to the mean number of calls of all runs, so a longer run does not
+    dominate the merged profile; decay weights run `i` of `k` by
+    `decay ** (k - 1 - i)`, favouring the latest runs.
+    """
+    totals = np.asarray(totals, dtype=float)
+    weights = decay ** np.arange(len(totals) - 1, -1, -1, dtype=float)
+    if normalize:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights *= np.where(totals > 0, totals.mean() / totals, 0)
+
+    return weights
+
+
+def merge_profiles(paths: list[Path], destination: Path, normalize: bool = False, decay: float = 1.0) -> pd.DataFrame:
+    """
+    Merge the profiles of several runs into one, summing the weighted
+    `totalCount` and `receiverCounts` of every (targetMethod, source), and
+    write it to `destination` hottest site first, like the profiler does.
+
+    The runs are streamed one after the other into a table of the merged
+    sites, so memory grows with the number of distinct call sites rather
+    than with the size of the profiles. Returns the spread of the count of
+    every site across the runs, normalized if the runs are but without
+    decay, where a run that did not reach a site counts as zero.
+    """
+    if not paths:
+        raise ValueError("No profiles to merge")
+    if decay <= 0:
+        raise ValueError(f"Decay must be positive, got {decay}")
+
+    totals = [sum(call_site["totalCount"] for call_site in iter_call_sites(path)) for path in paths] if normalize else [1] * len(paths)
+    weights = run_weights(totals, normalize, decay)
+
+    sites: dict[tuple[str, str], _MergedSite] = {}
+    for run, (path, weight) in enumerate(zip(paths, weights)):
+        for call_site in iter_call_sites(path):
+            key = (call_site["targetMethod"], call_site["source"])
+            if (site := sites.get(key)) is None:
+                site = sites[key] = _MergedSite(*key, call_site["isDirectCall"], call_site["uniqueCallsites"], np.zeros(len(paths)))
+            site.is_direct_call &= call_site["isDirectCall"]
+            site.unique_callsites = max(site.unique_callsites, call_site["uniqueCallsites"])
+            site.run_counts[run] += call_site["totalCount"]
+            for receiver, count in call_site["receiverCounts"].items():
+                site.receiver_counts[receiver] += weight * count
+
+    merged = sorted(sites.values(), key=lambda site: site.run_counts @ weights, reverse=True)
+
+    tmp_path = destination.with_name(f"{destination.name}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write("[")
+        for i, site in enumerate(merged):
+            f.write(",\n" if i else "\n")
+            json.dump({
+                "targetMethod": site.target_method,
+                "totalCount": int(round(site.run_counts @ weights)),
+                "uniqueCallsites": site.unique_callsites,
+                "source": site.source,
+                "isDirectCall": site.is_direct_call,
+                "receiverCounts": {receiver: int(round(count)) for receiver, count in site.receiver_counts.most_common()},
+            }, f)
+        f.write("\n]\n")
+    tmp_path.replace(destination)
+
+    run_counts = np.array([site.run_counts for site in merged]).reshape(len(merged), len(paths)) * run_weights(totals, normalize)
+    mean = run_counts.mean(axis=1)
+    std = run_counts.std(axis=1, ddof=1) if len(paths) > 1 else np.zeros(len(merged))
+    return pd.DataFrame({
+        "targetMethod": [site.target_method for site in merged],
+        "source": [site.source for site in merged],
+        "runs_reached": np.count_nonzero(run_counts, axis=1),
+        "mean_count": mean,
+        "std_count": std,
+        "cv": np.divide(std, mean, out=np.full(len(merged), np.nan), where=mean > 0),
+    })
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = " \t\n\r"
+
+
+def iter_call_sites(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Stream the call-site records of a profile file, which is a single JSON
+    array of objects, without loading the whole file into memory.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, "r") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE + ("," if started else ""):
+                pos += 1
+
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError(f"Unexpected end of profile file: {path}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError(f"Profile file does not contain a JSON array: {path}")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                return
+
+            try:
+                call_site, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+
+            yield call_site
+            pos = end
@@ -0,0 +1,217 @@
+import json
+import shutil
+from array import array
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from profiling.reader import iter_call_sites
+from util.hashing import hash_file
+
+
+@dataclass
+class ProfileColumns:
+    """
+    Columnar view of one profile file. Strings are ids into the store's
+    string table, and the receivers of call site `i` are
+    `receiver_ids[receiver_offsets[i]:receiver_offsets[i + 1]]`.
+    """
+    target_method: np.ndarray
+    source: np.ndarray
+    total_count: np.ndarray
+    unique_callsites: np.ndarray
+    is_direct_call: np.ndarray
+    receiver_offsets: np.ndarray
+    receiver_ids: np.ndarray
+    receiver_counts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.total_count)
+
+    @property
+    def receivers_per_site(self) -> np.ndarray:
+        return np.diff(self.receiver_offsets)
+
+    def to_frame(self, strings: "StringTable | None" = None) -> pd.DataFrame:
+        df = pd.DataFrame({
+            "targetMethod": self.target_method,
+            "totalCount": self.total_count,
+            "uniqueCallsites": self.unique_callsites,
+            "source": self.source,
+            "isDirectCall": self.is_direct_call,
+        })
+        if strings is not None:
+            df["targetMethod"] = strings.lookup(self.target_method)
+            df["source"] = strings.lookup(self.source)
+
+        return df
+
+
+class StringTable:
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode()
+
+    def lookup(self, ids: np.ndarray) -> np.ndarray:
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        return np.array([self[i] for i in unique_ids], dtype=object)[inverse]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class ProfileStore:
+    """
+    On-disk columnar store of call-site profiles.
+
+    Every ingested profile file becomes a directory of `.npy` columns that are
+    memory-mapped when loaded. Method, source and receiver names are interned
+    in a string table shared by all profiles. Ingestion is keyed on the hash
+    of each file, so only new or changed profiles are converted again.
+    """
+
+    MANIFEST_FILE_NAME = "manifest.json"
+    STRINGS_FILE_NAME = "strings.bin"
+    STRING_OFFSETS_FILE_NAME = "string_offsets.npy"
+
+    COLUMN_DTYPES = {
+        "target_method": np.int32,
+        "source": np.int32,
+        "total_count": np.int64,
+        "unique_callsites": np.int32,
+        "is_direct_call": np.bool_,
+        "receiver_offsets": np.int64,
+        "receiver_ids": np.int32,
+        "receiver_counts": np.int64,
+    }
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self.path / self.MANIFEST_FILE_NAME
+        if not manifest_path.exists():
+            return {"profiles": {}}
+
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    def _write_manifest(self) -> None:
+        tmp_path = self.path / f"{self.MANIFEST_FILE_NAME}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        tmp_path.replace(self.path / self.MANIFEST_FILE_NAME)
+
+    @property
+    def profiles(self) -> list[str]:
+        return sorted(self.manifest["profiles"])
+
+    @property
+    def strings(self) -> StringTable:
+        offsets_path = self.path / self.STRING_OFFSETS_FILE_NAME
+        if not offsets_path.exists():
+            return StringTable(np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.int64))
+
+        offsets = np.load(offsets_path, mmap_mode="r")
+        blob = np.memmap(self.path / self.STRINGS_FILE_NAME, dtype=np.uint8, mode="r") if offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+        return StringTable(blob, offsets)
+
+    def _profile_dir(self, name: str) -> Path:
+        return self.path / "profiles" / name
+
+    def load(self, name: str) -> ProfileColumns:
+        if name not in self.manifest["profiles"]:
+            raise KeyError(f"Profile '{name}' is not in the profile store at {self.path}")
+
+        profile_dir = self._profile_dir(name)
+        return ProfileColumns(**{f.name: np.load(profile_dir / f"{f.name}.npy", mmap_mode="r") for f in fields(ProfileColumns)})
+
+    def ingest(self, files: Iterable[Path], force: bool = False, prefix: str = "") -> list[str]:
+        """
+        Convert the given profile files into the store, skipping files whose
+        contents are unchanged since they were last ingested. Profiles are
+        named after their file, preceded by `prefix`. Returns the names of
+        the converted profiles.
+        """
+        interned = {s: i for i, s in enumerate(self.strings)}
+        new_strings: list[str] = []
+
+        def intern(s: str) -> int:
+            if (i := interned.get(s)) is None:
+                i = interned[s] = len(interned)
+                new_strings.append(s)
+            return i
+
+        converted = []
+        for file in files:
+            file = Path(file)
+            name = f"{prefix}{file.stem}"
+            file_hash = hash_file(file)
+            if not force and self.manifest["profiles"].get(name, {}).get("sha256") == file_hash:
+                continue
+
+            columns = {column: array("q") for column in self.COLUMN_DTYPES}
+            columns["receiver_offsets"].append(0)
+            for call_site in iter_call_sites(file):
+                columns["target_method"].append(intern(call_site["targetMethod"]))
+                columns["source"].append(intern(call_site["source"]))
+                columns["total_count"].append(call_site["totalCount"])
+                columns["unique_callsites"].append(call_site["uniqueCallsites"])
+                columns["is_direct_call"].append(call_site["isDirectCall"])
+                for receiver, count in call_site["receiverCounts"].items():
+                    columns["receiver_ids"].append(intern(receiver))
+                    columns["receiver_counts"].append(count)
+                columns["receiver_offsets"].append(len(columns["receiver_ids"]))
+
+            # Strings are written before the columns that refer to them.
+            self._append_strings(new_strings)
+            new_strings.clear()
+
+            profile_dir = self._profile_dir(name)
+            tmp_dir = profile_dir.with_name(f"{name}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+            for column, values in columns.items():
+                np.save(tmp_dir / f"{column}.npy", np.asarray(values, dtype=self.COLUMN_DTYPES[column]))
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            tmp_dir.rename(profile_dir)
+
+            self.manifest["profiles"][name] = {
+                "source_path": file.as_posix(),
+                "sha256": file_hash,
+                "n_call_sites": len(columns["total_count"]),
+                "n_receivers": len(columns["receiver_ids"]),
+            }
+            self._write_manifest()
+            converted.append(name)
+
+        return converted
+
+    def _append_strings(self, new_strings: list[str]) -> None:
+        if not new_strings:
+            return
+
+        offsets_path = self.path / self.STRING_OFFSETS_FILE_NAME
+        offsets = np.load(offsets_path) if offsets_path.exists() else np.zeros(1, dtype=np.int64)
+        encoded = [s.encode() for s in new_strings]
+
+        with open(self.path / self.STRINGS_FILE_NAME, "ab") as f:
+            f.truncate(offsets[-1])
+            f.write(b"".join(encoded))
+
+        new_offsets = offsets[-1] + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        tmp_path = self.path / f"{self.STRING_OFFSETS_FILE_NAME}.tmp.npy"
+        np.save(tmp_path, np.concatenate([offsets, new_offsets]))
+        tmp_path.replace(offsets_path)
@@ -1,85 +1,356 @@
-import csv
+import argparse
+import json
+import socket
+import subprocess
 import sys
+from concurrent.futures import as_completed
 from pathlib import Path
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from collections import defaultdict
-from benchmarks.compiler import Compiler
-from benchmarks.job import BenchmarkJob, read_jobs_from_config_file
-from benchmarks.optimization_level import OptimizationLevel
+from benchmarks.adaptive import MeasurementSummary, StoppingRule, run_benchmark
+from benchmarks.agent import collect_agent_configs, print_agent_outcomes
+from benchmarks.build_cache import BuildCache
+from benchmarks.build_stats import BuildStats
+from benchmarks.checkpoint import CampaignCheckpoint, job_fingerprint
+from benchmarks.cost import BASELINE_OPTIMIZATION_LEVEL, CampaignEstimate, CostModel, fit_to_budget, format_duration, parse_duration, print_estimate
+from benchmarks.distributed import Coordinator, Worker, parse_address
+from benchmarks.job import BenchmarkJob
+from benchmarks.measurement import CoreSlot, MeasurementExecutor, parse_slot_share
+from benchmarks.planner import CampaignPlan, PlannedTask
+from benchmarks.result_store import ResultStore
+from benchmarks.scheduler import BuildScheduler
 from util.color import ANSIColorCode as C
+from util.perf import HardwareCounters
+from util.resources import ResourceUsage
+from util.stats import mean_confidence_interval
+from util.telemetry import Telemetry
 from benchmarks.benchmark import Benchmark, BenchmarkResult, read_benchmarks_from_file
-from config.config import Config, ConfigOptions
-
-
-def run_benchmark(benchmark: Benchmark) -> list[BenchmarkResult]:
-    runs = []
-    for _ in range(benchmark.n_runs):
-        print(".", end="", flush=True)
-        runs.append(benchmark.run())
-    print("")
-
-    return runs
-
-
-def build_native_image(benchmark: Benchmark, optimization_level: OptimizationLevel, compiler: Compiler, config_options: ConfigOptions) -> None:
-    match optimization_level:
-        case OptimizationLevel.PGO:
-            benchmark.build_pgo_optimized_binary(compiler)  # Closed source PGO determines optimization level itself
-        case OptimizationLevel.CUSTOM_PGO:
-            benchmark.build_pgo_optimized_binary(compiler, additional_build_args=["-O0"])
-        case OptimizationLevel.CUSTOM_PGO_O3:
-            benchmark.build_pgo_optimized_binary(compiler, additional_build_args=["-O3"])
-        case OptimizationLevel.CUSTOM_PGO_FULL:
-            benchmark.build_pgo_optimized_binary(compiler, additional_build_args=["-J-DcombinedInlining=true", "-O0"])
-        case OptimizationLevel.CUSTOM_PGO_FULL_O3:
-            benchmark.build_pgo_optimized_binary(compiler, additional_build_args=["-J-DcombinedInlining=true", "-O3"])
-        case _:
-            benchmark.build_native_image(
-                compiler,
-                optimization_level,
-                additional_build_args=["-J-DdisableVirtualInvokeProfilingPhase=true"],
-            )
+from config.config import Config
 
 
-ResultsDict = dict[str, dict[BenchmarkJob, list[BenchmarkResult]]]
+def summarize_resource_usage(usages: list[ResourceUsage]) -> str:
+    if not usages:
+        return ""
+
+    def average(values) -> float:
+        values = list(values)
+        return sum(values) / len(values)
+
+    summary = (
+        f"max RSS: {average(u.max_rss_bytes for u in usages) / 2 ** 20:.1f} MiB (peak {max(u.max_rss_bytes for u in usages) / 2 ** 20:.1f})  "
+        f"CPU: {average(u.user_time_seconds for u in usages):.2f}s user + {average(u.system_time_seconds for u in usages):.2f}s sys  "
+        f"faults: {average(u.major_faults for u in usages):.0f} major / {average(u.minor_faults for u in usages):.0f} minor  "
+        f"context switches: {average(u.voluntary_context_switches for u in usages):.0f} voluntary / {average(u.involuntary_context_switches for u in usages):.0f} involuntary"
+    )
+    if sampled := [u.peak_sampled_rss_bytes for u in usages if u.peak_sampled_rss_bytes is not None]:
+        summary += f"  sampled tree RSS: {average(sampled) / 2 ** 20:.1f} MiB"
+
+    return summary
+
+
+def summarize_hardware_counters(counters: list[HardwareCounters]) -> str:
+    """Average counters of the runs, per thousand instructions where that applies."""
+    def average(name: str) -> float | None:
+        values = [getattr(c, name) for c in counters if getattr(c, name) is not None]
+        return sum(values) / len(values) if values else None
+
+    if (instructions := average("instructions")) is None:
+        return ""
+
+    summary = f"instructions: {instructions:.3g}"
+    if (cycles := average("cycles")) is not None:
+        summary += f"  IPC: {instructions / cycles:.2f}"
+    for name, label in (("branch_misses", "branch misses"), ("indirect_branch_misses", "indirect branch misses"), ("l1i_misses", "L1i misses"), ("itlb_misses", "iTLB misses")):
+        if (value := average(name)) is not None:
+            summary += f"  {label}: {1000 * value / instructions:.2f}/1k instr"
+
+    return summary
 
 
-def write_results_to_csv(results: ResultsDict, output_file: Path) -> None:
-    with open(output_file, "w", newline="") as csvfile:
-        fieldnames = [
-            "benchmark",
-            "optimization_level",
-            "result",
-            "binary_size",
-            "compiler",
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for name, result in results.items():
-            for job, benchmark_results in result.items():
-                for r in benchmark_results:
-                    writer.writerow(
-                        {
-                            "benchmark": name,
-                            "optimization_level": job.optimization_level.value,
-                            "result": r.result,
-                            "binary_size": r.binary_size,
-                            "compiler": job.compiler.name,
-                        }
-                    )
+def summarize_iterations(runs: list[BenchmarkResult]) -> str:
+    """
+    Warmup and steady-state performance of runs of several iterations: the
+    first iteration, the mean of the iterations before steady state and of
+    those after, averaged over the runs that reached it.
+    """
+    if not (runs := [r for r in runs if len(r.iterations) > 1]):
+        return ""
+
+    def average(values) -> float:
+        values = list(values)
+        return sum(values) / len(values)
+
+    summary = f"iterations: {average(len(r.iterations) for r in runs):.0f}  first iteration: {average(r.iterations[0] for r in runs):.2f}"
+    if not (steady := [r for r in runs if r.steady_state_iteration is not None]):
+        return summary + f"  no steady state in {len(runs)} run(s)"
+
+    summary += f"  steady state from iteration {average(r.steady_state_iteration for r in steady) + 1:.1f} in {len(steady)}/{len(runs)} run(s)"
+    if warmup := [r.warmup_result for r in steady if r.warmup_result is not None]:
+        summary += f"  warmup: {average(warmup):.2f}"
+    summary += f"  steady state: {average(r.steady_state_result for r in steady):.2f}"
+
+    return summary
+
+
+ResultsDict = dict[str, dict[BenchmarkJob, list[BenchmarkResult]]]
 
 
 def cur_time() -> str:
     return datetime.now(tz=ZoneInfo("Europe/Amsterdam")).strftime("%H:%M:%S")
 
 
+def job_fields(job: BenchmarkJob) -> dict[str, str]:
+    """What identifies a job in telemetry events and metric labels."""
+    return {"job": job.id, "benchmark": job.benchmark.name, "compiler": job.compiler.name, "optimization_level": job.optimization_level_label}
+
+
+def baseline_result(results: ResultsDict, job: BenchmarkJob) -> float | None:
+    """Mean result so far of the baseline (-O0) job of the same benchmark and compiler."""
+    measured = results.get(job.benchmark.name, {})
+    baseline = next((j for j in list(measured) if j.compiler == job.compiler and j.optimization_level == BASELINE_OPTIMIZATION_LEVEL and j.profile_filter is None), None)
+    if baseline is None or not (values := [r.result for r in measured[baseline] if not r.warmup]):
+        return None
+
+    return sum(values) / len(values)
+
+
+def report_run(telemetry: Telemetry, job: BenchmarkJob, run: BenchmarkResult, baseline: float | None) -> None:
+    telemetry.emit("run_result", **job_fields(job), result=run.result, unit=job.benchmark.unit.value, baseline=baseline, warmup=run.warmup,
+                   wall_time_seconds=run.wall_time_seconds, max_rss_bytes=run.resource_usage.max_rss_bytes if run.resource_usage is not None else None)
+    telemetry.increment("runs_total")
+    telemetry.set_gauge("last_result", run.result, **job_fields(job))
+    if baseline:
+        telemetry.set_gauge("last_result_vs_baseline", run.result / baseline, **job_fields(job))
+
+
+def report_error(telemetry: Telemetry, stage: str, error: BaseException, **fields) -> None:
+    telemetry.emit("error", stage=stage, error=str(error), error_type=type(error).__name__, **fields)
+    telemetry.increment("errors_total", stage=stage)
+
+
+def run_locally(config: Config, jobs_by_compiler: dict[str, list[BenchmarkJob]], completed_jobs: set[BenchmarkJob], built_jobs: set[BenchmarkJob],
+                fingerprints: dict[BenchmarkJob, str], checkpoint: CampaignCheckpoint, result_store: ResultStore, campaign_id: int,
+                stopping_rule: StoppingRule | None, results: ResultsDict, estimate: CampaignEstimate, telemetry: Telemetry) -> None:
+    confidence = stopping_rule.confidence if stopping_rule is not None else 0.95
+    estimates = {job_estimate.job: job_estimate for job_estimate in estimate.jobs}
+    # What is finished, for the remaining time on the metrics endpoint
+    built, done, profiled = set(built_jobs), set(completed_jobs), set()
+
+    def update_eta() -> None:
+        telemetry.set_gauge("eta_seconds", estimate.remaining(built, done, profiled).wall_seconds)
+
+    plan = CampaignPlan.from_jobs({
+        name: [job for job in jobs if job not in completed_jobs and job not in built_jobs]
+        for name, jobs in jobs_by_compiler.items()
+    })
+    plan.order_longest_first(lambda task: estimates[task.job].build_seconds if task.job in estimates else estimate.profile_seconds.get(task.id, 0.0))
+    build_tasks = plan.build_tasks
+    n_done = 0
+
+    def on_build_start(task: PlannedTask) -> None:
+        telemetry.emit("build_started", build=task.id, **(job_fields(task.job) if task.job is not None else {}))
+
+    def on_build_done(task: PlannedTask, error: BaseException | None) -> None:
+        nonlocal n_done
+        n_done += 1
+        prefix = f"{C.BOLD}[{n_done}/{len(plan.tasks)}] [{cur_time()}]{C.ENDC}"
+        fields = job_fields(task.job) if task.job is not None else {}
+        telemetry.increment("builds_done_total", status="failed" if error is not None else "built")
+        if error is not None:
+            print(f"{prefix} {C.FAIL}Failed to build {task.id}: {error}{C.ENDC}")
+            report_error(telemetry, "build", error, build=task.id, **fields)
+            if task.job is not None:
+                done.add(task.job)
+        else:
+            print(f"{prefix} Finished {task.id}")
+            stats = task.benchmark.build_stats if task.benchmark is not None else None
+            telemetry.emit("build_finished", build=task.id, **fields, wall_time_seconds=stats.wall_time_seconds if stats is not None else None,
+                           max_rss_bytes=stats.max_rss_bytes if stats is not None else None, cached=stats.cached if stats is not None else None)
+            if stats is not None:
+                result_store.add_build(campaign_id, task.id, task.benchmark.name, task.benchmark.build_command, stats)
+            if task.job is not None:
+                checkpoint.mark_built(task.job, fingerprints[task.job])
+                built.add(task.job)
+            else:
+                profiled.add(task.id)
+        update_eta()
+
+    print(C.BOLD + "=" * 20 + f" Building {len(build_tasks)} native image(s) in {len(plan.tasks)} task(s) with {config.options.build_workers} worker(s) " + "=" * 20 + C.ENDC)
+    start_time = datetime.now()
+    update_eta()
+
+    with BuildScheduler.from_options(config.options) as scheduler:
+        failed_tasks = plan.execute(scheduler, on_build_done, on_build_start)
+    build_errors = {job: failed_tasks[task] for job, task in build_tasks.items() if task in failed_tasks}
+
+    duration = (datetime.now() - start_time).seconds
+    print(f"{C.OKBLUE}Finished building in {duration // 60}m {duration % 60}s{C.ENDC}")
+
+    measurement_jobs = []
+    for name, jobs in jobs_by_compiler.items():
+        for job in jobs:
+            if job in build_errors:
+                print(f"{C.WARNING}Skipping {name} with {job.compiler.name.lower().replace('_', ' ')} native image with optimization level {job.optimization_level_label} because its build failed{C.ENDC}")
+                telemetry.emit("job_finished", **job_fields(job), status="skipped", reason=str(build_errors[job]))
+                telemetry.increment("jobs_done_total", status="skipped")
+            elif job not in completed_jobs:
+                measurement_jobs.append(job)
+
+    # Benchmarks that need every slot go last, so the slots are not drained
+    # over and over while single-threaded benchmarks are still waiting, and
+    # the longest jobs go first.
+    measurement_jobs.sort(key=lambda job: (not job.benchmark.single_threaded, -estimates[job].measure_seconds if job in estimates else 0.0))
+
+    def measure(job: BenchmarkJob, slot: CoreSlot | None) -> list[BenchmarkResult]:
+        n_runs = f"{stopping_rule.min_runs}-{stopping_rule.max_runs}" if stopping_rule is not None and job.benchmark.n_runs else job.benchmark.n_runs
+        pinning = f" on CPUs {slot.cpu_list}" if slot is not None else ""
+        print(f"{C.BOLD}[{cur_time()}]{C.ENDC} Running {C.BOLD}{job.benchmark.name}{C.ENDC} with {C.BOLD}{job.compiler.name.lower().replace('_', ' ')}{C.ENDC} native image with optimization level {C.BOLD}{job.optimization_level_label}{C.ENDC} {n_runs} time(s){pinning}")
+        print(f"{C.GRAY}Running benchmark {job.benchmark.name} with command: {' '.join(job.benchmark._get_run_command())}{C.ENDC}")
+        telemetry.emit("job_started", **job_fields(job), n_runs=n_runs, cpus=slot.cpu_list if slot is not None else None)
+        return run_benchmark(job.benchmark, stopping_rule, slot,
+                             on_run=lambda run: report_run(telemetry, job, run, baseline_result(results, job)))
+
+    with MeasurementExecutor.from_options(config.options) as executor:
+        print(C.BOLD + "=" * 20 + f" Measuring {len(measurement_jobs)} job(s) on {executor.concurrency} slot(s) " + "=" * 20 + C.ENDC)
+        start_time = datetime.now()
+
+        futures = {
+            executor.submit(lambda slot, job=job: measure(job, slot), exclusive=not job.benchmark.single_threaded): job
+            for job in measurement_jobs
+        }
+        for i, future in enumerate(as_completed(futures)):
+            job = futures[future]
+            prefix = f"{C.BOLD}[{i + 1}/{len(futures)}] [{cur_time()}]{C.ENDC}"
+            try:
+                runs = future.result()
+                results[job.benchmark.name][job].extend(runs)
+                result_store.add_runs(campaign_id, job, runs)
+                if runs:
+                    result_store.add_summary(campaign_id, job, MeasurementSummary.from_values([r.result for r in runs], sum(r.warmup for r in runs), confidence))
+                checkpoint.mark_measured(job, fingerprints[job], runs)
+                print(f"{prefix} Finished {job.id} ({len(runs)} run(s))")
+                telemetry.emit("job_finished", **job_fields(job), status="measured", n_runs=len(runs), n_warmup=sum(r.warmup for r in runs))
+                telemetry.increment("jobs_done_total", status="measured")
+            except Exception as e:
+                print(f"{prefix} {C.FAIL}Error while processing {job.benchmark.name} with {job.compiler.name} at optimization level {job.optimization_level_label}: {e}{C.ENDC}")
+                report_error(telemetry, "measurement", e, **job_fields(job))
+                telemetry.emit("job_finished", **job_fields(job), status="failed")
+                telemetry.increment("jobs_done_total", status="failed")
+            done.add(job)
+            update_eta()
+
+    duration = (datetime.now() - start_time).seconds
+    print(f"{C.OKBLUE}Finished measuring in {duration // 60}m {duration % 60}s{C.ENDC}")
+
+
+def run_distributed(args: argparse.Namespace, config_file_path: Path, jobs: list[BenchmarkJob], fingerprints: dict[BenchmarkJob, str],
+                    checkpoint: CampaignCheckpoint, result_store: ResultStore, campaign_id: int, confidence: float, results: ResultsDict,
+                    profiles_dir: Path, estimate: CampaignEstimate, telemetry: Telemetry) -> dict[BenchmarkJob, str]:
+    """
+    Hand the jobs out to workers connecting to the coordinator address, and
+    record what they send back tagged with the worker. Returns the worker
+    that measured each job.
+    """
+    workers = {}
+    local_workers = []
+    # Workers build and measure a job in one go, so a job is either left or done
+    done: set[BenchmarkJob] = set()
+    telemetry.set_gauge("eta_seconds", estimate.wall_seconds)
+
+    with Coordinator(jobs, campaign_id, json.loads(config_file_path.read_text()), parse_address(args.coordinator)) as coordinator:
+        host, port = coordinator.address
+        print(C.BOLD + "=" * 20 + f" Coordinating {len(jobs)} job(s) on {host}:{port} " + "=" * 20 + C.ENDC)
+        start_time = datetime.now()
+
+        for i in range(args.local_workers):
+            local_workers.append(subprocess.Popen([
+                sys.executable, Path(__file__).absolute().as_posix(),
+                "--worker", f"127.0.0.1:{port}", "--worker-id", f"{socket.gethostname()}-local-{i}", "--worker-slots", f"{i}/{args.local_workers}",
+            ]))
+
+        try:
+            outcomes = coordinator.outcomes(workers_alive=lambda: not local_workers or any(p.poll() is None for p in local_workers))
+            for i, outcome in enumerate(outcomes):
+                job = outcome.job
+                prefix = f"{C.BOLD}[{i + 1}/{len(jobs)}] [{cur_time()}]{C.ENDC}"
+                done.add(job)
+                telemetry.set_gauge("eta_seconds", estimate.remaining(set(), done).wall_seconds)
+                for build in outcome.builds:
+                    stats = BuildStats.from_dict(build["stats"])
+                    result_store.add_build(campaign_id, build["task"], build["benchmark"], build["build_command"], stats, outcome.host, outcome.worker)
+                    telemetry.emit("build_finished", build=build["task"], benchmark=build["benchmark"], worker=outcome.worker, wall_time_seconds=stats.wall_time_seconds,
+                                   max_rss_bytes=stats.max_rss_bytes, cached=stats.cached)
+                    telemetry.increment("builds_done_total", status="built")
+                for name, data in outcome.profiles.items():
+                    profiles_dir.mkdir(parents=True, exist_ok=True)
+                    (profiles_dir / f"{outcome.worker}-{name}").write_bytes(data)
+
+                if outcome.error is not None:
+                    print(f"{prefix} {C.FAIL}Error while processing {job.id} on {outcome.worker}: {outcome.error}{C.ENDC}")
+                    report_error(telemetry, "worker", RuntimeError(outcome.error), **job_fields(job), worker=outcome.worker)
+                    telemetry.emit("job_finished", **job_fields(job), status="failed", worker=outcome.worker)
+                    telemetry.increment("jobs_done_total", status="failed")
+                    continue
+
+                workers[job] = outcome.worker
+                # The job was built on the worker, so only it knows the command
+                job.benchmark.build_command = outcome.build_command
+                for run in outcome.runs:
+                    report_run(telemetry, job, run, baseline_result(results, job))
+                results[job.benchmark.name][job].extend(outcome.runs)
+                result_store.add_runs(campaign_id, job, outcome.runs, outcome.host, outcome.worker)
+                if outcome.runs:
+                    summary = MeasurementSummary.from_values([r.result for r in outcome.runs], sum(r.warmup for r in outcome.runs), confidence)
+                    result_store.add_summary(campaign_id, job, summary, outcome.worker)
+                checkpoint.mark_measured(job, fingerprints[job], outcome.runs)
+                print(f"{prefix} Finished {job.id} on {outcome.worker} ({len(outcome.runs)} run(s))")
+                telemetry.emit("job_finished", **job_fields(job), status="measured", worker=outcome.worker, n_runs=len(outcome.runs),
+                               n_warmup=sum(r.warmup for r in outcome.runs))
+                telemetry.increment("jobs_done_total", status="measured")
+        finally:
+            for process in local_workers:
+                process.wait()
+
+    duration = (datetime.now() - start_time).seconds
+    print(f"{C.OKBLUE}Finished campaign on workers in {duration // 60}m {duration % 60}s{C.ENDC}")
+
+    return workers
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config_file_path", type=Path, nargs="?", help="Path of the campaign config file (not needed for --worker)")
+    parser.add_argument("--resume", action="store_true", help="Skip jobs that already finished with the same inputs in the previous campaign")
+    parser.add_argument("--coordinator", metavar="HOST:PORT", help="Hand the jobs out to workers connecting to this address instead of running them here")
+    parser.add_argument("--local-workers", type=int, default=0, help="Start this many workers on this machine (with --coordinator)")
+    parser.add_argument("--worker", metavar="HOST:PORT", help="Run jobs for the coordinator at this address")
+    parser.add_argument("--worker-id", help="Name of this worker (default: hostname and process id)")
+    parser.add_argument("--worker-slots", type=parse_slot_share, metavar="INDEX/COUNT",
+                        help="Pin the measurements of this worker to its share of the core slots, as one of COUNT workers on this machine (set for --local-workers)")
+    parser.add_argument("--budget", type=parse_duration, metavar="DURATION",
+                        help="Fit the campaign into this wall time (e.g. 6h, 90m) by running the jobs listed last in the config fewer times, then dropping them")
+    parser.add_argument("--events", type=Path, metavar="PATH", help="Append the progress of the campaign as JSON lines to this file (default: events.jsonl in the results directory)")
+    parser.add_argument("--metrics", type=parse_address, metavar="HOST:PORT",
+                        help="Serve campaign metrics (jobs done, ETA, build memory, last results) for Prometheus on this address, e.g. 127.0.0.1:9464")
+    args = parser.parse_args()
+
+    if args.worker is None and args.config_file_path is None:
+        parser.error("the config file path is required unless running as a --worker")
+    if args.local_workers and args.coordinator is None:
+        parser.error("--local-workers requires --coordinator")
+
+    return args
+
+
 def main():
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <config_file_path.json>")
-        sys.exit(1)
+    args = parse_args()
 
-    config_file_path = Path(sys.argv[1])
+    if args.worker is not None:
+        Worker(parse_address(args.worker), args.worker_id, args.worker_slots).run()
+        return
+
+    config_file_path = args.config_file_path
     if not config_file_path.exists() or not config_file_path.is_file():
         print(f"Error: Config file '{config_file_path}' does not exist or is not a file.")
         sys.exit(1)
@@ -90,52 +361,117 @@ def main():
         config.options.profiling_data_output_dir_path.mkdir(parents=True, exist_ok=True)
 
     benchmarks = read_benchmarks_from_file(config.options.benchmarks_file_path, config.options)
-    jobs_by_compiler = read_jobs_from_config_file(config_file_path, benchmarks)
+    jobs_by_compiler = config.create_jobs(benchmarks)
 
     config.check_installations()
 
-    results: ResultsDict = defaultdict(lambda: defaultdict(list))
+    checkpoint = CampaignCheckpoint(config.options.checkpoint_dir_path)
+    if not args.resume:
+        checkpoint.reset()
 
-    for i, (name, jobs) in enumerate(jobs_by_compiler.items()):
-        print(C.BOLD + "=" * 20 + f" {name} ({i + 1}/{len(jobs_by_compiler)}) " + "=" * 20 + C.ENDC)
+    result_store = ResultStore(config.options.results_db_path)
+    if checkpoint.campaign_id is None:
+        checkpoint.campaign_id = result_store.start_campaign(config_file_path, json.loads(config_file_path.read_text()))
+    campaign_id = checkpoint.campaign_id
 
-        if not jobs:
-            continue
+    # Distributed workers run the agent themselves
+    if not config.options.skip_agent and args.coordinator is None:
+        agent_benchmarks = [jobs[0].benchmark for name, jobs in jobs_by_compiler.items() if jobs and not checkpoint.has_run_agent(name)]
+        if agent_benchmarks:
+            print(f"{C.BOLD}[{cur_time()}]{C.ENDC} Collecting agent configurations of {len(agent_benchmarks)} benchmark(s)...")
+            outcomes = collect_agent_configs(agent_benchmarks, config.options.java_bin_path.as_posix(), config.options.agent_workers, config.options.agent_merge_existing_config)
+            print_agent_outcomes(outcomes)
+            for name, outcome in outcomes.items():
+                if not isinstance(outcome, BaseException):
+                    checkpoint.mark_agent_run(name)
 
-        def line_prefix(idx) -> str:
-            return f"{C.BOLD}[{idx}/{len(jobs)}] [{cur_time()}]{C.ENDC}"
+    all_jobs = [job for jobs in jobs_by_compiler.values() for job in jobs]
+    fingerprints = {job: job_fingerprint(job) for job in all_jobs}
+    completed_runs = {job: runs for job in all_jobs if (runs := checkpoint.completed_runs(job, fingerprints[job])) is not None}
+    built_jobs = {job for job in all_jobs if job not in completed_runs and checkpoint.is_built(job, fingerprints[job])}
+    if args.resume:
+        print(f"{C.OKBLUE}Resuming campaign {campaign_id}: {len(completed_runs)} job(s) already finished, {len(built_jobs)} more already built{C.ENDC}")
 
-        if not config.options.skip_agent:
-            print(f"{line_prefix(0)} Running agent for {name}...")
-            jobs[0].benchmark.run_agent(vm_binary=config.options.java_bin_path.as_posix())
+    results: ResultsDict = defaultdict(lambda: defaultdict(list))
+    for job, runs in completed_runs.items():
+        print(f"{C.GRAY}Skipping {job.id}, which already finished{C.ENDC}")
+        results[job.benchmark.name][job].extend(runs)
 
-        start_time = datetime.now()
+    estimate = CampaignEstimate.for_jobs([job for job in all_jobs if job not in completed_runs], CostModel.from_store(result_store), config.options, built_jobs)
+    if args.budget is not None and estimate.wall_seconds > args.budget:
+        estimate, shortened, dropped = fit_to_budget(estimate, args.budget, shorten=not config.options.adaptive_runs)
+        for job, n_runs in shortened.items():
+            print(f"{C.WARNING}Running {job.id} {n_runs} instead of {job.benchmark.n_runs} time(s) to fit the budget of {format_duration(args.budget)}{C.ENDC}")
+            job.benchmark.n_runs = n_runs
+            fingerprints[job] = job_fingerprint(job)
+        for job in dropped:
+            print(f"{C.WARNING}Dropping {job.id} to fit the budget of {format_duration(args.budget)}{C.ENDC}")
+            jobs_by_compiler[job.benchmark.name].remove(job)
+        all_jobs = [job for job in all_jobs if job not in dropped]
+    print_estimate(estimate, limit=10)
+    if args.budget is not None and estimate.wall_seconds > args.budget:
+        print(f"{C.WARNING}The campaign does not fit the budget of {format_duration(args.budget)} even without the dropped jobs{C.ENDC}")
 
-        for i, job in enumerate(jobs):
-            try:
-                print(f"{line_prefix(i + 1)} Building using {C.BOLD}{job.compiler.name.lower().replace('_', ' ')}{C.ENDC} native image with optimization level {C.BOLD}{job.optimization_level.value}{C.ENDC}...")
-                build_native_image(job.benchmark, job.optimization_level, job.compiler, config.options)
+    stopping_rule = StoppingRule.from_options(config.options) if config.options.adaptive_runs else None
+    confidence = stopping_rule.confidence if stopping_rule is not None else 0.95
+    workers: dict[BenchmarkJob, str] = {}
 
-                print(f"{C.GRAY}Running benchmark {name} with command: {' '.join(job.benchmark._get_run_command())}{C.ENDC}")
-                print(f"{line_prefix(i + 1)} Running benchmark {name} {job.benchmark.n_runs} time(s)", end="", flush=True)
-                runs = run_benchmark(job.benchmark)
-                results[name][job].extend(runs)
-            except Exception as e:
-                print(f"{C.FAIL}\nError while processing {name} with {job.compiler.name} at optimization level {job.optimization_level.value}: {e}{C.ENDC}")
+    with Telemetry(args.events or config.options.results_output_dir_path / "events.jsonl", args.metrics, campaign_id) as telemetry:
+        if telemetry.address is not None:
+            host, port = telemetry.address
+            print(f"{C.OKBLUE}Serving campaign metrics on http://{host}:{port}/metrics{C.ENDC}")
+        queued_jobs = [job for job in estimate.longest_first() if job not in completed_runs]
+        telemetry.emit("campaign_started", jobs=len(queued_jobs), finished_jobs=len(completed_runs), estimated_seconds=estimate.wall_seconds, budget_seconds=args.budget)
+        telemetry.set_gauge("jobs", len(queued_jobs))
+        estimates = {job_estimate.job: job_estimate for job_estimate in estimate.jobs}
+        for job in queued_jobs:
+            telemetry.emit("job_queued", **job_fields(job), n_runs=job.benchmark.n_runs, built=job in built_jobs, estimated_seconds=estimates[job].total_seconds)
 
-        duration = (datetime.now() - start_time).seconds
-        print(f"{C.OKBLUE}Finished processing {name} in {duration // 60}m {duration % 60}s{C.ENDC}")
+        try:
+            if args.coordinator is not None:
+                workers = run_distributed(args, config_file_path, queued_jobs, fingerprints, checkpoint, result_store,
+                                          campaign_id, confidence, results, config.options.profiling_data_output_dir_path, estimate, telemetry)
+            else:
+                run_locally(config, jobs_by_compiler, set(completed_runs), built_jobs, fingerprints, checkpoint, result_store, campaign_id, stopping_rule, results, estimate, telemetry)
+        except BaseException as e:
+            telemetry.emit("campaign_finished", status="interrupted" if isinstance(e, KeyboardInterrupt) else "failed", error=str(e) or type(e).__name__)
+            raise
+        telemetry.emit("campaign_finished", status="finished")
 
-    for name, result in results.items():
+    for name, jobs in jobs_by_compiler.items():
+        if name not in results:
+            continue
         print(f"Results for {C.BOLD}{name}{C.BOLD}:")
-        for job, benchmark_results in result.items():
+        for job in jobs:
+            if not (benchmark_results := results[name].get(job)):
+                continue
+            n_warmup = sum(r.warmup for r in benchmark_results)
+            benchmark_results = [r for r in benchmark_results if not r.warmup]
             if not benchmark_results:
                 continue
             average_result = sum(r.result for r in benchmark_results) / len(benchmark_results)
             stddev_result = (sum((r.result - average_result) ** 2 for r in benchmark_results) / len(benchmark_results)) ** 0.5
-            print(f"  {job.compiler.name.replace('_', ' ').capitalize():<12} {job.optimization_level.value:>28}: {average_result:>10.2f} ± {stddev_result:>7.2f} {job.benchmark.unit.value:<5} size: {benchmark_results[0].binary_size:>10} bytes")
+            _, ci_half_width = mean_confidence_interval([r.result for r in benchmark_results], confidence)
+            print(f"  {job.compiler.name.replace('_', ' ').capitalize():<12} {job.optimization_level_label:>28}: {average_result:>10.2f} ± {stddev_result:>7.2f} {job.benchmark.unit.value:<5} size: {benchmark_results[0].binary_size:>10} bytes  runs: {len(benchmark_results):>2} (+{n_warmup} warmup)  {confidence:.0%} CI: ± {ci_half_width:.2f}" + (f"  worker: {workers[job]}" if job in workers else ""))
+            if resource_summary := summarize_resource_usage([r.resource_usage for r in benchmark_results if r.resource_usage is not None]):
+                print(f"  {'':<12} {'':>28}  {C.GRAY}{resource_summary}{C.ENDC}")
+            if iteration_summary := summarize_iterations(benchmark_results):
+                print(f"  {'':<12} {'':>28}  {C.GRAY}{iteration_summary}{C.ENDC}")
+            if counter_summary := summarize_hardware_counters([r.hardware_counters for r in benchmark_results if r.hardware_counters is not None]):
+                print(f"  {'':<12} {'':>28}  {C.GRAY}{counter_summary}{C.ENDC}")
+
+    if (build_cache := BuildCache.for_options(config.options)) is not None:
+        print(f"Build cache: {build_cache.stats}")
 
-    write_results_to_csv(results, config.options.results_output_dir_path / "results.csv")
+    result_store.finish_campaign(campaign_id)
+    config.options.results_output_dir_path.mkdir(parents=True, exist_ok=True)
+    n_rows = result_store.export_csv(config.options.results_output_dir_path / "results.csv", campaign_id=campaign_id)
+    print(f"Stored results of campaign {campaign_id} in {config.options.results_db_path} and exported {n_rows} run(s) to {config.options.results_output_dir_path / 'results.csv'}")
+    n_iterations = result_store.export_iterations_csv(config.options.results_output_dir_path / "iterations.csv", campaign_id)
+    print(f"Exported {n_iterations} iteration(s) to {config.options.results_output_dir_path / 'iterations.csv'}")
+    n_builds = result_store.export_builds_csv(config.options.results_output_dir_path / "builds.csv", campaign_id)
+    print(f"Exported {n_builds} build(s) to {config.options.results_output_dir_path / 'builds.csv'}")
+    result_store.close()
 
 if __name__ == "__main__":
     main()
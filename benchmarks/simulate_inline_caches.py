@@ -0,0 +1,53 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from profiling.inline_cache import MAX_RECEIVERS, MIN_SHARES, TOP_SITE_PERCENTAGES, simulate_store
+from profiling.store import ProfileStore
+from util.color import ANSIColorCode as C
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Estimate the share of virtual calls served by inline caches under different caching policies, from the receiver counts of call-site profiles.")
+    parser.add_argument("--profiles-dir", type=Path, default=Path("results/current/profiling-data"), help="Directory of profile files")
+    parser.add_argument("--store", type=Path, default=Path("results/current/profile-store"), help="Profile store the profiles are ingested into")
+    parser.add_argument("--max-receivers", type=int, default=MAX_RECEIVERS, help="Simulate caches of 1 up to this many receivers")
+    parser.add_argument("--top-percent", type=float, nargs="+", default=TOP_SITE_PERCENTAGES, help="Only cache at the top K%% hottest virtual call sites")
+    parser.add_argument("--min-share", type=float, nargs="+", default=MIN_SHARES, help="Only cache receivers with at least this share of their site's calls")
+    parser.add_argument("--output", type=Path, default=Path("results/current/inline-cache-policies.csv"))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    files = list(args.profiles_dir.glob("*.json"))
+    if not files:
+        raise FileNotFoundError(f"No profiles found in {args.profiles_dir}")
+
+    store = ProfileStore(args.store)
+    store.ingest(files)
+
+    results = simulate_store(
+        store,
+        [file.stem for file in files],
+        max_receivers=range(1, args.max_receivers + 1),
+        top_site_percentages=args.top_percent,
+        min_shares=args.min_share,
+    )
+
+    pd.set_option('display.float_format', '{:.4f}'.format)
+    pd.set_option('display.width', None)
+    pooled = results[results["profile"] == "all"]
+    print(f"{C.BOLD}Fast-path hit rate over all profiles{C.ENDC} (rows: top K% of sites, min share; columns: max receivers)")
+    print(pooled.pivot_table(index=["top_site_percent", "min_share"], columns="max_receivers", values="hit_rate"))
+    print(f"{C.BOLD}Guarded receivers over all profiles{C.ENDC}")
+    print(pooled.pivot_table(index=["top_site_percent", "min_share"], columns="max_receivers", values="guarded_receivers").astype(int))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(args.output, index=False)
+    print(f"Wrote {len(results)} policy results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
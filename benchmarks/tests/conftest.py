@@ -0,0 +1,17 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.compiler import Compiler
+from benchmarks.dacapobench import DacapoBenchmark
+from benchmarks.job import BenchmarkJob
+from benchmarks.optimization_level import OptimizationLevel
+
+
+@pytest.fixture
+def make_job(tmp_path: Path):
+    """Make a job of a DaCapo benchmark whose files live under the test's temporary directory."""
+    def make(name: str, optimization_level: OptimizationLevel, compiler: Compiler = Compiler.CUSTOM_OPEN, n_runs: int = 5) -> BenchmarkJob:
+        return BenchmarkJob.create(DacapoBenchmark(name=name, context_path=tmp_path, n_runs=n_runs), optimization_level, compiler)
+
+    return make
@@ -0,0 +1,80 @@
+import os
+import struct
+import sys
+
+import pytest
+
+from benchmarks.binary_size import BinarySections, java_package
+from util.elf import SHF_ALLOC, SHF_EXECINSTR, SHF_WRITE, SHT_NOBITS, SHT_STRTAB, ElfError, ElfFile
+
+SHT_PROGBITS = 1
+# (name, type, flags, bytes in the file)
+SECTIONS = [
+    (".text", SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR, 100),
+    (".svm_heap", SHT_PROGBITS, SHF_ALLOC | SHF_WRITE, 200),
+    (".rodata", SHT_PROGBITS, SHF_ALLOC, 30),
+    (".data", SHT_PROGBITS, SHF_ALLOC | SHF_WRITE, 50),
+    (".bss", SHT_NOBITS, SHF_ALLOC | SHF_WRITE, 1000),
+    (".debug_info", SHT_PROGBITS, 0, 40),
+]
+
+
+def write_elf(path) -> int:
+    """A little-endian ELF64 file with SECTIONS and a section name table. Returns the size of the names."""
+    names = b"\0" + b"".join(name.encode() + b"\0" for name, *_ in SECTIONS) + b".shstrtab\0"
+    body, headers, offset, name_offset = b"", [struct.pack("<IIQQQQIIQQ", *[0] * 10)], 64, 1
+    for name, type, flags, size in SECTIONS:
+        headers.append(struct.pack("<IIQQQQIIQQ", name_offset, type, flags, 0, offset, size, 0, 0, 1, 0))
+        if type != SHT_NOBITS:
+            body += b"\xaa" * size
+            offset += size
+        name_offset += len(name) + 1
+    headers.append(struct.pack("<IIQQQQIIQQ", name_offset, SHT_STRTAB, 0, 0, offset, len(names), 0, 0, 1, 0))
+    body += names
+
+    ident = b"\x7fELF" + bytes([2, 1, 1]) + b"\0" * 9
+    header = ident + struct.pack("<HHIQQQIHHHHHH", 2, 62, 1, 0, 0, 64 + len(body), 0, 64, 0, 0, 64, len(headers), len(headers) - 1)
+    path.write_bytes(header + body + b"".join(headers))
+
+    return len(names)
+
+
+def test_sections_are_parsed(tmp_path):
+    write_elf(tmp_path / "binary")
+    with ElfFile(tmp_path / "binary") as elf:
+        assert [section.name for section in elf.sections] == ["", *(name for name, *_ in SECTIONS), ".shstrtab"]
+        assert elf.section(".bss").size == 1000 and elf.section(".bss").file_size == 0
+        assert elf.section(".text").offset == 64
+
+
+def test_sections_add_up_to_the_file_size(tmp_path):
+    names_size = write_elf(tmp_path / "binary")
+    sections = BinarySections.read(tmp_path / "binary")
+
+    assert (sections.code_bytes, sections.image_heap_bytes, sections.rodata_bytes, sections.data_bytes, sections.debug_bytes) == (100, 200, 30, 50, 40)
+    # The ELF header, the section headers and the section names
+    assert sections.other_bytes == 64 + 8 * 64 + names_size
+    assert sections.total_bytes == os.path.getsize(tmp_path / "binary")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs an ELF executable")
+def test_sections_of_a_real_binary_add_up_to_its_size():
+    path = os.path.realpath(sys.executable)
+    assert BinarySections.read(path).total_bytes == os.path.getsize(path)
+
+
+def test_non_elf_files_are_rejected(tmp_path):
+    (tmp_path / "script").write_text("#!/bin/sh\n")
+    with pytest.raises(ElfError):
+        BinarySections.read(tmp_path / "script")
+
+
+@pytest.mark.parametrize("symbol, depth, expected", [
+    ("java.util.HashMap::get", None, "java.util"),
+    ("java.util.concurrent.ConcurrentHashMap::get", 2, "java.util"),
+    ("_ZN4java4util7HashMap3getEJP", None, "java.util"),
+    ("Main::main", None, None),
+    ("memcpy", None, None),
+])
+def test_java_package(symbol, depth, expected):
+    assert java_package(symbol, depth) == expected
@@ -0,0 +1,89 @@
+import pytest
+
+from benchmarks.cost import CampaignEstimate, JobEstimate, fit_to_budget, makespan, parse_duration
+from benchmarks.optimization_level import OptimizationLevel
+
+
+def test_makespan_of_independent_tasks():
+    durations = {"a": 4.0, "b": 3.0, "c": 2.0, "d": 1.0}
+    assert makespan(durations, 1) == 10.0
+    # Longest first: a | b, then c after b, d after a
+    assert makespan(durations, 2) == 5.0
+    assert makespan(durations, 8) == 4.0
+    assert makespan({}, 2) == 0.0
+
+
+def test_makespan_waits_for_dependencies():
+    durations = {"profile": 5.0, "pgo": 2.0, "other": 1.0}
+    assert makespan(durations, 2, {"pgo": ["profile"]}) == 7.0
+    assert makespan(durations, 1, {"pgo": ["profile"]}) == 8.0
+
+
+def test_makespan_starts_the_longest_chain_first():
+    # Starting `long` before `short` would leave `after` to run alone at the end
+    durations = {"short": 2.0, "long": 3.0, "after": 3.0}
+    assert makespan(durations, 2, {"after": ["short"]}) == 5.0
+
+
+@pytest.fixture
+def estimate(make_job):
+    """Three jobs measured one at a time, in priority order, each run taking 10 seconds, already built."""
+    jobs = [make_job("fop", OptimizationLevel.O0), make_job("fop", OptimizationLevel.O3), make_job("fop", OptimizationLevel.O2)]
+    return CampaignEstimate([JobEstimate(job, 0.0, 10.0, 5, "built", "job") for job in jobs])
+
+
+def test_estimate_wall_time(estimate):
+    assert estimate.wall_seconds == 150.0
+    assert estimate.remaining(built=set(), done={estimate.jobs[0].job}).wall_seconds == 100.0
+
+
+def test_fit_to_budget_within_budget(estimate):
+    fitted, shortened, dropped = fit_to_budget(estimate, 150.0)
+    assert fitted.wall_seconds == 150.0
+    assert (shortened, dropped) == ({}, [])
+
+
+def test_fit_to_budget_shortens_the_last_jobs_first(estimate):
+    o0, o3, o2 = (e.job for e in estimate.jobs)
+    fitted, shortened, dropped = fit_to_budget(estimate, 110.0)
+
+    assert shortened == {o2: 2, o3: 4}
+    assert dropped == []
+    assert fitted.wall_seconds == 110.0
+
+
+def test_fit_to_budget_drops_jobs_below_the_minimum_runs(estimate):
+    o0, o3, o2 = (e.job for e in estimate.jobs)
+    fitted, shortened, dropped = fit_to_budget(estimate, 50.0)
+
+    assert dropped == [o2]
+    assert shortened == {o0: 2, o3: 2}
+    assert fitted.wall_seconds == 40.0
+
+
+def test_fit_to_budget_keeps_the_baseline(estimate):
+    o0, o3, o2 = (e.job for e in estimate.jobs)
+    fitted, _, dropped = fit_to_budget(estimate, 1.0)
+
+    assert dropped == [o2, o3]
+    assert [e.job for e in fitted.jobs] == [o0]
+    # Still over budget, the speedups need the baseline
+    assert fitted.wall_seconds == 20.0
+
+
+def test_fit_to_budget_without_shortening(estimate):
+    fitted, shortened, dropped = fit_to_budget(estimate, 110.0, shorten=False)
+    assert shortened == {}
+    assert dropped == [estimate.jobs[2].job]
+    assert fitted.wall_seconds == 100.0
+
+
+@pytest.mark.parametrize("text, seconds", [("6h", 6 * 3600), ("90m", 5400), ("1h30m", 5400), ("45s", 45), ("1.5", 5400)])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "h", "1d", "30m1h"])
+def test_parse_duration_rejects(text):
+    with pytest.raises(ValueError):
+        parse_duration(text)
@@ -0,0 +1,57 @@
+import pytest
+
+from util.perf import HARDWARE_COUNTER_COLUMNS, HardwareCounters, PerfStat, _parse_perf_stat
+
+
+def test_counts_and_enabled_percentages():
+    counts, enabled = _parse_perf_stat(
+        "# started on Mon Jan  1 00:00:00 2024\n"
+        "\n"
+        "1000,,cycles,500,100.00,,\n"
+        "2000,,instructions,250,50.00,2.00,insn per cycle\n"
+    )
+    assert counts == {"cycles": 1000, "instructions": 2000}
+    assert enabled == {"cycles": 100.0, "instructions": 50.0}
+
+
+def test_hybrid_cpus_are_summed_over_core_types():
+    counts, enabled = _parse_perf_stat(
+        "300,,cpu_core/branches:u/,400,80.00,,\n"
+        "20,,cpu_atom/branches:u/,100,20.00,,\n"
+    )
+    assert counts == {"branches:u": 320}
+    # Counted on one core type or the other for the whole run
+    assert enabled == {"branches:u": pytest.approx(100.0)}
+
+
+def test_multiplexed_hybrid_counters():
+    _, enabled = _parse_perf_stat(
+        "300,,cpu_core/cycles/,300,60.00,,\n"
+        "20,,cpu_atom/cycles/,50,10.00,,\n"
+    )
+    assert enabled == {"cycles": pytest.approx(70.0)}
+
+
+def test_uncounted_events():
+    counts, enabled = _parse_perf_stat(
+        "<not supported>,,br_misp_retired.indirect,0,100.00,,\n"
+        "<not counted>,,cpu_atom/cycles/,0,0.00,,\n"
+        "100,,cpu_core/cycles/,500,100.00,,\n"
+    )
+    assert counts == {"br_misp_retired.indirect": None, "cycles": 100}
+    assert enabled == {"cycles": 100.0}
+
+
+def test_read_maps_events_to_counters(tmp_path):
+    (tmp_path / "perf-stat").write_text("1000,,cycles,500,62.50,,\n2000,,instructions,800,100.00,,\n")
+    counters = PerfStat({"cycles": "cycles", "instructions": "instructions", "itlb_misses": "iTLB-load-misses"}, tmp_path / "perf-stat").read()
+
+    assert (counters.cycles, counters.instructions, counters.itlb_misses) == (1000, 2000, None)
+    assert counters.instructions_per_cycle == 2.0
+    assert counters.multiplexed == {"cycles": 62.5}
+    assert counters.min_enabled_percent == 62.5
+
+
+def test_enabled_percentages_are_not_a_counter_column():
+    assert "enabled_percent" not in HARDWARE_COUNTER_COLUMNS
+    assert HardwareCounters().min_enabled_percent is None
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from benchmarks.optimization_level import OptimizationLevel
+from benchmarks.planner import CampaignPlan, DependencyFailedError, PlannedTask
+from benchmarks.scheduler import BuildScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = BuildScheduler(max_workers=4, memory_per_build=0, cores_per_build=0, poll_interval=0.01)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_pgo_jobs_of_a_benchmark_share_one_profiling_task(make_job):
+    o3 = make_job("h2", OptimizationLevel.O3)
+    pgo = make_job("h2", OptimizationLevel.CUSTOM_PGO)
+    pgo_o3 = make_job("h2", OptimizationLevel.CUSTOM_PGO_O3)
+    other = make_job("lusearch", OptimizationLevel.CUSTOM_PGO)
+
+    plan = CampaignPlan.from_jobs({"h2": [o3, pgo, pgo_o3], "lusearch": [other]})
+    tasks = plan.build_tasks
+
+    assert [task.id for task in plan.tasks if task.job is None] == ["h2-custom_open-profile", "lusearch-custom_open-profile"]
+    assert tasks[o3].dependencies == []
+    assert tasks[pgo].dependencies == tasks[pgo_o3].dependencies
+    assert [task.id for task in tasks[pgo].dependencies] == ["h2-custom_open-profile"]
+    assert [task.id for task in tasks[other].dependencies] == ["lusearch-custom_open-profile"]
+
+
+def recording_plan(order: list[str], fail: set[str] = frozenset()) -> tuple[CampaignPlan, dict[str, PlannedTask]]:
+    """profile -> (build_a, build_b), and an independent build_c."""
+    lock = threading.Lock()
+
+    def action(task_id: str):
+        def run():
+            with lock:
+                order.append(task_id)
+            if task_id in fail:
+                raise RuntimeError(f"{task_id} failed")
+        return run
+
+    profile = PlannedTask("profile", action("profile"))
+    tasks = {
+        "profile": profile,
+        "build_a": PlannedTask("build_a", action("build_a"), dependencies=[profile]),
+        "build_b": PlannedTask("build_b", action("build_b"), dependencies=[profile]),
+        "build_c": PlannedTask("build_c", action("build_c")),
+    }
+    return CampaignPlan(list(tasks.values())), tasks
+
+
+def test_execute_runs_tasks_after_their_dependencies(scheduler):
+    order = []
+    plan, _ = recording_plan(order)
+
+    assert plan.execute(scheduler) == {}
+    assert sorted(order) == ["build_a", "build_b", "build_c", "profile"]
+    assert order.index("profile") < order.index("build_a")
+    assert order.index("profile") < order.index("build_b")
+
+
+def test_execute_skips_the_dependents_of_a_failed_task(scheduler):
+    order, done = [], []
+    plan, tasks = recording_plan(order, fail={"profile"})
+
+    errors = plan.execute(scheduler, on_done=lambda task, error: done.append(task.id))
+
+    assert sorted(order) == ["build_c", "profile"]
+    assert set(errors) == {tasks["profile"], tasks["build_a"], tasks["build_b"]}
+    assert isinstance(errors[tasks["build_a"]], DependencyFailedError)
+    assert sorted(done) == ["build_a", "build_b", "build_c", "profile"]
+
+
+def test_execute_rejects_dependencies_outside_of_the_plan(scheduler):
+    outside = PlannedTask("outside", lambda: None)
+    plan = CampaignPlan([PlannedTask("build", lambda: None, dependencies=[outside])])
+
+    with pytest.raises(ValueError, match="outside of the plan"):
+        plan.execute(scheduler)
+
+
+def test_order_longest_first_puts_long_chains_first():
+    plan, tasks = recording_plan([])
+    seconds = {"profile": 10, "build_a": 30, "build_b": 5, "build_c": 35}
+
+    plan.order_longest_first(lambda task: seconds[task.id])
+
+    # profile starts the longest chain (10 + 30), ahead of the single longest build
+    assert [task.id for task in plan.tasks] == ["profile", "build_c", "build_a", "build_b"]
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import pytest
+
+from profiling.diff import diff_profiles
+from profiling.store import ProfileStore
+
+
+def call_site(target: str, count: int, receivers: dict[str, int]) -> dict:
+    return {"targetMethod": target, "totalCount": count, "uniqueCallsites": 1, "source": f"Caller.{target}@1", "isDirectCall": not receivers, "receiverCounts": receivers}
+
+
+@pytest.fixture
+def diff(tmp_path):
+    before, after = tmp_path / "before.json", tmp_path / "after.json"
+    before.write_text(json.dumps([
+        call_site("a", 100, {"A": 50, "B": 50}),
+        call_site("b", 50, {"A": 10}),
+        call_site("c", 10, {}),
+        # Sites that appear twice are aggregated
+        call_site("a", 20, {"A": 20}),
+    ]))
+    after.write_text(json.dumps([
+        call_site("b", 80, {"A": 5, "C": 5}),
+        call_site("a", 60, {"A": 60}),
+        call_site("d", 30, {}),
+    ]))
+
+    store = ProfileStore(tmp_path / "store")
+    store.ingest([before, after])
+    return diff_profiles(store.load("before"), store.load("after"), store.strings)
+
+
+def site(diff, target: str):
+    return diff.sites.set_index("targetMethod").loc[target]
+
+
+def test_sites_are_joined_on_method_and_source(diff):
+    assert dict(zip(diff.sites["targetMethod"], diff.sites["status"])) == {"a": "common", "b": "common", "c": "removed", "d": "added"}
+    assert (site(diff, "a")["count_before"], site(diff, "a")["count_after"]) == (120, 60)
+    assert site(diff, "a")["count_ratio"] == 0.5
+    assert (site(diff, "c")["count_after"], site(diff, "d")["count_before"]) == (0, 0)
+    assert np.isnan(site(diff, "d")["count_ratio"])
+
+
+def test_ranks(diff):
+    assert (site(diff, "a")["rank_before"], site(diff, "a")["rank_after"], site(diff, "a")["rank_change"]) == (1, 2, -1)
+    assert (site(diff, "b")["rank_before"], site(diff, "b")["rank_after"], site(diff, "b")["rank_change"]) == (2, 1, 1)
+    assert np.isnan(site(diff, "c")["rank_after"])
+
+
+def test_receiver_total_variation_distance(diff):
+    # Shares of A and B go from 70/120 and 50/120 to 1 and 0
+    assert site(diff, "a")["receiver_tv_distance"] == pytest.approx(50 / 120)
+    # A only, then half A and half C
+    assert site(diff, "b")["receiver_tv_distance"] == pytest.approx(0.5)
+    assert np.isnan(site(diff, "c")["receiver_tv_distance"])
+
+
+def test_receivers_and_morphism(diff):
+    a, b = site(diff, "a"), site(diff, "b")
+    assert (a["morphism_before"], a["morphism_after"], a["receivers_vanished"]) == ("polymorphic", "monomorphic", 1)
+    assert (b["morphism_before"], b["morphism_after"], b["receivers_appeared"]) == ("monomorphic", "polymorphic", 1)
+
+
+def test_summary(diff):
+    summary = diff.summary()
+    assert (summary["sites_before"], summary["sites_after"], summary["common_sites"]) == (3, 3, 2)
+    assert (summary["added_sites"], summary["removed_sites"]) == (1, 1)
+    assert (summary["calls_before"], summary["calls_after"]) == (180, 170)
+    assert summary["added_calls_proportion"] == pytest.approx(30 / 170)
+    assert summary["removed_calls_proportion"] == pytest.approx(10 / 180)
+    assert (summary["monomorphic_to_polymorphic"], summary["polymorphic_to_monomorphic"]) == (1, 1)
+    # Weighted by the calls of the site in both profiles
+    assert summary["weighted_receiver_tv_distance"] == pytest.approx((180 * 50 / 120 + 130 * 0.5) / 310)
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from profiling.filter import ProfileFilter
+from profiling.reader import iter_call_sites
+
+
+def select(profile_filter: ProfileFilter, counts: list[int], direct: list[bool] | None = None) -> list[int]:
+    """Indices of the sites the filter keeps."""
+    keep = profile_filter.select(np.asarray(counts, dtype=np.int64), np.asarray(direct or [False] * len(counts), dtype=bool))
+    return np.flatnonzero(keep).tolist()
+
+
+def test_top_percent_keeps_the_hottest_sites():
+    counts = [5, 50, 1, 40, 3, 30, 2, 20, 4, 10]
+    assert select(ProfileFilter("top30", top_percent=30), counts) == [1, 3, 5]
+
+
+def test_top_percent_rounds_up_to_at_least_one_site():
+    counts = list(range(20, 0, -1))
+    # 4% of 20 sites is 0.8 of a site
+    assert select(ProfileFilter("top4", top_percent=4), counts) == [0]
+    assert select(ProfileFilter("top6", top_percent=6), counts) == [0, 1]
+
+
+def test_coverage_keeps_the_fewest_sites_that_make_it():
+    counts = [10, 60, 30]
+    assert select(ProfileFilter("cov60", coverage=0.6), counts) == [1]
+    assert select(ProfileFilter("cov61", coverage=0.61), counts) == [1, 2]
+    assert select(ProfileFilter("cov100", coverage=1.0), counts) == [0, 1, 2]
+
+
+def test_coverage_of_sites_without_calls_keeps_one():
+    assert select(ProfileFilter("cov", coverage=0.5), [0, 0, 0]) == [0]
+
+
+def test_ties_keep_profile_order():
+    assert select(ProfileFilter("top50", top_percent=50), [7, 7, 7, 7]) == [0, 1]
+
+
+def test_virtual_only_drops_direct_calls_before_ranking():
+    counts = [100, 10, 50, 5]
+    direct = [True, False, True, False]
+    assert select(ProfileFilter("virtual", virtual_only=True, top_percent=50), counts, direct) == [1]
+
+
+def test_filters_combine_to_the_smaller_selection():
+    counts = [40, 30, 20, 10]
+    assert select(ProfileFilter("both", top_percent=75, coverage=0.5), counts) == [0, 1]
+    assert select(ProfileFilter("both", top_percent=25, coverage=0.9), counts) == [0]
+
+
+@pytest.mark.parametrize("arguments", [{"top_percent": 0}, {"top_percent": 101}, {"coverage": 0}, {"coverage": 1.5}, {"max_receivers": -1}])
+def test_invalid_filters_are_rejected(arguments):
+    with pytest.raises(ValueError):
+        ProfileFilter("invalid", **arguments)
+
+
+def call_site(target: str, count: int, direct: bool = False, receivers: dict[str, int] | None = None) -> dict:
+    return {"targetMethod": target, "totalCount": count, "uniqueCallsites": 1, "source": f"{target}@1", "isDirectCall": direct, "receiverCounts": receivers or {}}
+
+
+def test_apply_writes_the_kept_sites_with_their_top_receivers(tmp_path):
+    source, destination = tmp_path / "profile.json", tmp_path / "filtered.json"
+    source.write_text(json.dumps([
+        call_site("a", 10, receivers={"A": 1, "B": 9}),
+        call_site("b", 90, receivers={"A": 50, "B": 30, "C": 10}),
+        call_site("c", 5, direct=True),
+    ]))
+
+    kept, total = ProfileFilter("top", top_percent=50, max_receivers=1).apply(source, destination)
+
+    assert (kept, total) == (2, 3)
+    assert [(site["targetMethod"], site["receiverCounts"]) for site in iter_call_sites(destination)] == [("a", {"B": 9}), ("b", {"A": 50})]
+
+
+def test_apply_refuses_to_write_an_empty_profile(tmp_path):
+    source, destination = tmp_path / "profile.json", tmp_path / "filtered.json"
+    source.write_text(json.dumps([call_site("a", 10, direct=True)]))
+
+    with pytest.raises(ValueError, match="keeps none"):
+        ProfileFilter("virtual", virtual_only=True).apply(source, destination)
+    assert not destination.exists()
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+
+from profiling.merge import merge_profiles, run_weights
+from profiling.reader import iter_call_sites
+
+
+def test_run_weights_default_to_one():
+    assert run_weights([10, 20, 30]).tolist() == [1.0, 1.0, 1.0]
+
+
+def test_run_weights_normalize_every_run_to_the_mean():
+    weights = run_weights([100, 300, 0], normalize=True)
+    assert weights.tolist() == pytest.approx([4 / 3, 4 / 9, 0.0])
+    assert weights[:2] @ np.array([100, 300]) == pytest.approx(2 * np.mean([100, 300, 0]))
+
+
+def test_run_weights_decay_favours_the_latest_runs():
+    assert run_weights([1, 1, 1], decay=0.5).tolist() == [0.25, 0.5, 1.0]
+    assert run_weights([100, 300], normalize=True, decay=0.5).tolist() == pytest.approx([0.5 * 2, 2 / 3])
+
+
+def write_profile(path, sites: list[tuple[str, int, dict[str, int]]]):
+    path.write_text(json.dumps([
+        {"targetMethod": target, "totalCount": count, "uniqueCallsites": 1, "source": "Caller.call@1", "isDirectCall": not receivers, "receiverCounts": receivers}
+        for target, count, receivers in sites
+    ]))
+    return path
+
+
+def test_merge_sums_the_weighted_counts_of_every_site(tmp_path):
+    first = write_profile(tmp_path / "1.json", [("a", 100, {"A": 60, "B": 40}), ("b", 10, {})])
+    second = write_profile(tmp_path / "2.json", [("a", 300, {"A": 300}), ("c", 500, {"C": 500})])
+
+    spread = merge_profiles([first, second], tmp_path / "merged.json", decay=0.5)
+    merged = {site["targetMethod"]: site for site in iter_call_sites(tmp_path / "merged.json")}
+
+    assert [site["targetMethod"] for site in iter_call_sites(tmp_path / "merged.json")] == ["c", "a", "b"]
+    assert merged["a"]["totalCount"] == 0.5 * 100 + 300
+    assert merged["a"]["receiverCounts"] == {"A": 330, "B": 20}
+    assert merged["b"]["totalCount"] == 5
+    assert merged["c"]["totalCount"] == 500
+    assert not merged["a"]["isDirectCall"] and merged["b"]["isDirectCall"]
+
+    # The spread is without decay, and a run that missed a site counts zero
+    a = spread.set_index("targetMethod").loc["a"]
+    assert (a["runs_reached"], a["mean_count"]) == (2, 200)
+    assert a["std_count"] == pytest.approx(np.std([100, 300], ddof=1))
+    assert spread.set_index("targetMethod").loc["b", "runs_reached"] == 1
+
+
+def test_merge_with_normalization_weighs_runs_equally(tmp_path):
+    short = write_profile(tmp_path / "short.json", [("a", 10, {}), ("b", 10, {})])
+    long = write_profile(tmp_path / "long.json", [("a", 1000, {})])
+
+    merge_profiles([short, long], tmp_path / "merged.json", normalize=True)
+    merged = {site["targetMethod"]: site["totalCount"] for site in iter_call_sites(tmp_path / "merged.json")}
+
+    # Both runs count as the mean of 510 calls
+    assert merged == {"a": round(10 * 510 / 20 + 1000 * 510 / 1000), "b": round(10 * 510 / 20)}
+
+
+def test_merge_needs_profiles(tmp_path):
+    with pytest.raises(ValueError):
+        merge_profiles([], tmp_path / "merged.json")
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import speedup
+from benchmarks.benchmark import BenchmarkUnit
+from benchmarks.speedup import GEOMEAN, MIN_BOOTSTRAP_RUNS, compare, parse_configuration
+
+BASELINE = ("CLOSED", "-O0")
+CANDIDATE = ("CLOSED", "-O3")
+
+
+def results(values: dict[tuple[str, str], list[float]], host: str | None = None) -> pd.DataFrame:
+    """Results of (benchmark, optimization level) on the CLOSED compiler."""
+    rows = [
+        {"compiler": "CLOSED", "benchmark": benchmark, "optimization_level": level, "result": value, **({"host": host} if host else {})}
+        for (benchmark, level), level_values in values.items() for value in level_values
+    ]
+    return pd.DataFrame(rows)
+
+
+def row(comparison: pd.DataFrame, benchmark: str) -> pd.Series:
+    return comparison.set_index("benchmark").loc[benchmark]
+
+
+def test_speedup_of_execution_time_is_inverted():
+    df = results({("h2", "-O0"): [200.0] * 6, ("h2", "-O3"): [100.0] * 6})
+    comparison = compare(df, BASELINE, CANDIDATE, {"h2": BenchmarkUnit.EXECUTION_TIME})
+    assert row(comparison, "h2")["speedup"] == pytest.approx(2.0)
+
+
+def test_speedup_of_throughput_is_the_ratio():
+    df = results({("barista", "-O0"): [100.0] * 6, ("barista", "-O3"): [150.0] * 6})
+    comparison = compare(df, BASELINE, CANDIDATE, {"barista": BenchmarkUnit.THROUGHPUT})
+    assert row(comparison, "barista")["speedup"] == pytest.approx(1.5)
+
+
+def test_bootstrap_interval_covers_a_clear_speedup():
+    rng = np.random.default_rng(0)
+    df = results({("h2", "-O0"): list(rng.normal(200, 5, 20)), ("h2", "-O3"): list(rng.normal(100, 5, 20))})
+    h2 = row(compare(df, BASELINE, CANDIDATE, {}), "h2")
+    assert h2["method"] == "bootstrap"
+    assert h2["ci_low"] < h2["speedup"] < h2["ci_high"]
+    assert h2["ci_low"] > 1.8 and h2["ci_high"] < 2.2
+    assert h2["p_value"] < 0.01
+
+
+def test_bootstrap_of_equal_configurations_is_not_significant():
+    rng = np.random.default_rng(1)
+    values = list(rng.normal(100, 5, 40))
+    df = results({("h2", "-O0"): values[:20], ("h2", "-O3"): values[20:]})
+    h2 = row(compare(df, BASELINE, CANDIDATE, {}), "h2")
+    assert h2["ci_low"] < 1 < h2["ci_high"]
+    assert h2["p_value"] > 0.05
+
+
+def test_small_samples_get_a_welch_interval():
+    n = MIN_BOOTSTRAP_RUNS - 1
+    df = results({("h2", "-O0"): [190.0, 200.0, 210.0, 200.0][:n], ("h2", "-O3"): [95.0, 100.0, 105.0, 100.0][:n]})
+    h2 = row(compare(df, BASELINE, CANDIDATE, {}), "h2")
+    assert h2["method"] == "welch-t"
+    assert h2["speedup"] == pytest.approx(2.0)
+    assert h2["ci_low"] < 2.0 < h2["ci_high"]
+
+
+def test_single_runs_get_an_unbounded_interval():
+    df = results({("h2", "-O0"): [200.0], ("h2", "-O3"): [100.0]})
+    h2 = row(compare(df, BASELINE, CANDIDATE, {}), "h2")
+    assert h2["method"] == "welch-t"
+    assert (h2["ci_low"], h2["ci_high"], h2["p_value"]) == (0.0, np.inf, 1.0)
+
+
+def test_geomean_is_bootstrapped_over_large_samples():
+    rng = np.random.default_rng(2)
+    df = results({
+        ("a", "-O0"): list(rng.normal(200, 5, 10)), ("a", "-O3"): list(rng.normal(100, 5, 10)),
+        ("b", "-O0"): list(rng.normal(100, 5, 10)), ("b", "-O3"): list(rng.normal(100, 5, 10)),
+    })
+    comparison = compare(df, BASELINE, CANDIDATE, {})
+    geomean = row(comparison, GEOMEAN)
+    assert geomean["method"] == "bootstrap"
+    assert geomean["speedup"] == pytest.approx(np.sqrt(row(comparison, "a")["speedup"] * row(comparison, "b")["speedup"]))
+    assert geomean["n_baseline"] == 20
+
+
+def test_geomean_over_a_small_sample_is_not_bootstrapped(monkeypatch):
+    rng = np.random.default_rng(3)
+    df = results({
+        ("a", "-O0"): list(rng.normal(200, 5, 10)), ("a", "-O3"): list(rng.normal(100, 5, 10)),
+        ("b", "-O0"): [100.0, 120.0], ("b", "-O3"): [90.0, 110.0],
+    })
+    geomean = row(compare(df, BASELINE, CANDIDATE, {}), GEOMEAN)
+    monkeypatch.setattr(speedup, "MIN_BOOTSTRAP_RUNS", 1)
+    bootstrapped = row(compare(df, BASELINE, CANDIDATE, {}), GEOMEAN)
+
+    assert geomean["method"] == "welch-t"
+    assert geomean["speedup"] == pytest.approx(bootstrapped["speedup"])
+    # Resampling two runs understates how uncertain the geomean is
+    assert geomean["ci_high"] / geomean["ci_low"] > bootstrapped["ci_high"] / bootstrapped["ci_low"]
+    assert geomean["p_value"] > bootstrapped["p_value"]
+
+
+def test_only_benchmarks_measured_in_both_configurations_are_compared():
+    df = results({("a", "-O0"): [1.0] * 5, ("a", "-O3"): [1.0] * 5, ("b", "-O0"): [1.0] * 5})
+    assert list(compare(df, BASELINE, CANDIDATE, {})["benchmark"]) == ["a", GEOMEAN]
+
+
+def test_results_of_several_hosts_are_not_compared():
+    df = pd.concat([
+        results({("a", "-O0"): [1.0] * 5, ("a", "-O3"): [1.0] * 5}, host="one"),
+        results({("a", "-O0"): [2.0] * 5, ("a", "-O3"): [2.0] * 5}, host="two"),
+    ])
+    with pytest.raises(ValueError, match="different hosts"):
+        compare(df, BASELINE, CANDIDATE, {})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("CLOSED:O3", ("CLOSED", "-O3")),
+    ("OPEN:-O3", ("OPEN", "-O3")),
+    ("CUSTOM_OPEN:CUSTOM_PGO_O3:top4", ("CUSTOM_OPEN", "--custom-pgo -O3 [top4]")),
+])
+def test_parse_configuration(text, expected):
+    assert parse_configuration(text) == expected
+
+
+def test_parse_configuration_needs_a_level():
+    with pytest.raises(ValueError):
+        parse_configuration("CLOSED")
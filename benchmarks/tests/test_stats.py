@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from util.stats import mean_confidence_interval, t_quantile, t_two_sided_p
+
+# Two-sided 95% critical values of Student's t
+T_975 = {1: 12.7062, 2: 4.3027, 3: 3.1824, 5: 2.5706, 10: 2.2281, 30: 2.0423}
+
+
+@pytest.mark.parametrize("df, expected", T_975.items())
+def test_t_quantile_matches_tables(df, expected):
+    assert t_quantile(0.975, df) == pytest.approx(expected, abs=5e-3)
+
+
+@pytest.mark.parametrize("df", [1, 2, 4, 25])
+def test_t_quantile_is_symmetric(df):
+    assert t_quantile(0.1, df) == pytest.approx(-t_quantile(0.9, df))
+    assert t_quantile(0.5, df) == pytest.approx(0.0, abs=1e-12)
+
+
+@pytest.mark.parametrize("p, df", [(0, 3), (1, 3), (0.5, 0)])
+def test_t_quantile_rejects_invalid_arguments(p, df):
+    with pytest.raises(ValueError):
+        t_quantile(p, df)
+
+
+@pytest.mark.parametrize("df, t", T_975.items())
+def test_t_two_sided_p_of_critical_values(df, t):
+    assert t_two_sided_p(t, df) == pytest.approx(0.05, abs=1e-3)
+
+
+@pytest.mark.parametrize("df", [1, 2, 3, 8])
+def test_t_two_sided_p_bounds(df):
+    assert t_two_sided_p(0.0, df) == pytest.approx(1.0)
+    assert t_two_sided_p(1e6, df) == pytest.approx(0.0, abs=1e-5)
+    assert t_two_sided_p(-2.0, df) == t_two_sided_p(2.0, df)
+
+
+def test_t_two_sided_p_rejects_no_degrees_of_freedom():
+    with pytest.raises(ValueError):
+        t_two_sided_p(1.0, 0)
+
+
+def test_mean_confidence_interval():
+    mean, half_width = mean_confidence_interval([1.0, 2.0, 3.0, 4.0])
+    assert mean == 2.5
+    # t(0.975, 3) * stdev / sqrt(n)
+    assert half_width == pytest.approx(3.1824 * math.sqrt(5 / 3) / 2, rel=2e-3)
+
+
+def test_mean_confidence_interval_of_one_value_is_unbounded():
+    assert mean_confidence_interval([3.0]) == (3.0, math.inf)
+    with pytest.raises(ValueError):
+        mean_confidence_interval([])
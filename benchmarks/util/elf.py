@@ -0,0 +1,150 @@
+import mmap
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+ELF_MAGIC = b"\x7fELF"
+
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_RELA = 4
+SHT_NOBITS = 8
+SHT_REL = 9
+SHT_DYNSYM = 11
+SHT_RELR = 19
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+STT_FUNC = 2
+SHN_XINDEX = 0xFFFF
+
+# Header fields after e_ident, section header and symbol layouts per ELF class
+HEADER_FORMATS = {1: "HHIIIIIHHHHHH", 2: "HHIQQQIHHHHHH"}
+SECTION_FORMATS = {1: "IIIIIIIIII", 2: "IIQQQQIIQQ"}
+SYMBOL_FIELDS = {
+    1: [("name", "u4"), ("value", "u4"), ("size", "u4"), ("info", "u1"), ("other", "u1"), ("shndx", "u2")],
+    2: [("name", "u4"), ("info", "u1"), ("other", "u1"), ("shndx", "u2"), ("value", "u8"), ("size", "u8")],
+}
+
+
+class ElfError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ElfSection:
+    index: int
+    name: str
+    type: int
+    flags: int
+    address: int
+    offset: int
+    size: int
+    link: int
+
+    @property
+    def file_size(self) -> int:
+        """Bytes the section occupies in the file, which is none for .bss-like sections."""
+        return 0 if self.type == SHT_NOBITS else self.size
+
+
+class ElfFile:
+    """
+    Read-only view of an ELF file through a memory map. Only the headers are
+    parsed up front; the symbol table is decoded on request as arrays.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise ElfError(f"Cannot map {self.path}: {e}") from e
+
+        try:
+            self._parse_header()
+            self.sections = self._parse_sections()
+        except (struct.error, IndexError) as e:
+            self.close()
+            raise ElfError(f"Malformed ELF file {self.path}: {e}") from e
+        except ElfError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "ElfFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def size(self) -> int:
+        return len(self._map)
+
+    def _parse_header(self) -> None:
+        if self._map[:4] != ELF_MAGIC:
+            raise ElfError(f"Not an ELF file: {self.path}")
+
+        self.elf_class, data = self._map[4], self._map[5]
+        if self.elf_class not in HEADER_FORMATS or data not in (1, 2):
+            raise ElfError(f"Unsupported ELF class {self.elf_class} or data encoding {data}: {self.path}")
+
+        self.byte_order = "<" if data == 1 else ">"
+        (_, self.machine, _, _, _, self._shoff, _, _, _, _, self._shentsize, self._shnum, self._shstrndx) = struct.unpack_from(
+            self.byte_order + HEADER_FORMATS[self.elf_class], self._map, 16)
+
+    def _section_header(self, index: int) -> tuple:
+        return struct.unpack_from(self.byte_order + SECTION_FORMATS[self.elf_class], self._map, self._shoff + index * self._shentsize)
+
+    def _parse_sections(self) -> list[ElfSection]:
+        if self._shoff == 0:
+            return []
+
+        # Files with many sections keep the real counts in section 0
+        shnum, shstrndx = self._shnum, self._shstrndx
+        first = self._section_header(0)
+        if shnum == 0:
+            shnum = first[5]
+        if shstrndx == SHN_XINDEX:
+            shstrndx = first[6]
+
+        headers = [self._section_header(i) for i in range(shnum)]
+        names_offset = headers[shstrndx][4] if shstrndx < len(headers) else None
+
+        return [
+            ElfSection(i, self._string(names_offset + name) if names_offset is not None else "", type, flags, address, offset, size, link)
+            for i, (name, type, flags, address, offset, size, link, _, _, _) in enumerate(headers)
+        ]
+
+    def _string(self, offset: int) -> str:
+        end = self._map.find(b"\0", offset)
+        return self._map[offset:end if end >= 0 else len(self._map)].decode("utf-8", errors="replace")
+
+    def section(self, name: str) -> ElfSection | None:
+        return next((section for section in self.sections if section.name == name), None)
+
+    def symbols(self, dynamic: bool = False) -> tuple[np.ndarray, list[str]]:
+        """
+        The symbol table (or the dynamic symbol table) as a structured array
+        with the fields of the ELF symbol, and the names of its symbols.
+        """
+        dtype = np.dtype([(name, self.byte_order + kind) for name, kind in SYMBOL_FIELDS[self.elf_class]])
+        table = next((s for s in self.sections if s.type == (SHT_DYNSYM if dynamic else SHT_SYMTAB)), None)
+        if table is None:
+            return np.zeros(0, dtype=dtype), []
+
+        symbols = np.frombuffer(self._map, dtype=dtype, count=table.size // dtype.itemsize, offset=table.offset).copy()
+
+        strings = self.sections[table.link]
+        blob = self._map[strings.offset:strings.offset + strings.size]
+        names = [blob[start:blob.find(b"\0", start)].decode("utf-8", errors="replace") for start in symbols["name"].tolist()]
+
+        return symbols, names
@@ -0,0 +1,28 @@
+import subprocess
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).resolve().parents[2]
+GRAAL_SUBMODULE_PATH = REPOSITORY_ROOT / "graal"
+
+
+def get_commit(repository: Path) -> str | None:
+    try:
+        return subprocess.check_output(["git", "-C", Path(repository).as_posix(), "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_diff(repository: Path) -> bytes:
+    try:
+        return subprocess.check_output(["git", "-C", Path(repository).as_posix(), "diff", "HEAD"], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return b""
+
+
+def get_graal_commit() -> str | None:
+    # An uninitialized submodule is an empty directory inside this repository,
+    # which git would happily report the commit of.
+    if not (GRAAL_SUBMODULE_PATH / ".git").exists():
+        return None
+
+    return get_commit(GRAAL_SUBMODULE_PATH)
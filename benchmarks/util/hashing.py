@@ -0,0 +1,38 @@
+import hashlib
+import json
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def hash_path(path: Path) -> str:
+    """
+    Hash the contents of a file, or of every file below a directory together
+    with its path relative to that directory.
+    """
+    path = Path(path)
+    if path.is_file():
+        return hash_file(path)
+    if not path.is_dir():
+        raise FileNotFoundError(f"Cannot hash non-existent path: {path}")
+
+    digest = hashlib.sha256()
+    for file in sorted(p for p in path.rglob("*") if p.is_file()):
+        digest.update(file.relative_to(path).as_posix().encode())
+        digest.update(b"\0")
+        digest.update(hash_file(file).encode())
+
+    return digest.hexdigest()
+
+
+def hash_json(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,155 @@
+import re
+import shutil
+import subprocess
+from dataclasses import dataclass, field, fields
+from functools import cache
+from pathlib import Path
+
+from util.color import ANSIColorCode as C
+
+# perf events that measure every counter, in order of preference. The
+# indirect branch events are model specific (Intel, older Intel, AMD Zen).
+COUNTER_EVENTS = {
+    "cycles": ["cycles"],
+    "instructions": ["instructions"],
+    "branches": ["branches"],
+    "branch_misses": ["branch-misses"],
+    "indirect_branch_misses": ["br_misp_retired.indirect", "br_misp_exec.indirect", "ex_ret_brn_ind_misp"],
+    "l1i_misses": ["L1-icache-load-misses"],
+    "itlb_misses": ["iTLB-load-misses"],
+}
+UNCOUNTED_VALUES = ("<not supported>", "<not counted>")
+PROBE_TIMEOUT_SECONDS = 10
+# Hybrid CPUs count an event once per core type, e.g. cpu_core/cycles:u/
+PMU_EVENT_PATTERN = re.compile(r"^\w+/(?P<event>[^/]+)/$")
+
+
+@dataclass
+class HardwareCounters:
+    """
+    Hardware performance counters of a run as counted by `perf stat`, None
+    for the counters the machine does not have or does not let us read.
+    """
+    cycles: int | None = field(default=None)
+    instructions: int | None = field(default=None)
+    branches: int | None = field(default=None)
+    branch_misses: int | None = field(default=None)
+    indirect_branch_misses: int | None = field(default=None)
+    l1i_misses: int | None = field(default=None)
+    itlb_misses: int | None = field(default=None)
+    # Share of the run every counter was counting for, below 100 when perf
+    # multiplexed more events than the machine has counters; perf then scales
+    # the count up to an estimate for the whole run
+    enabled_percent: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def multiplexed(self) -> dict[str, float]:
+        """The enabled percentage of the counters that did not count the whole run."""
+        return {counter: percent for counter, percent in self.enabled_percent.items() if percent < 100}
+
+    @property
+    def min_enabled_percent(self) -> float | None:
+        return min(self.enabled_percent.values(), default=None)
+
+    @property
+    def instructions_per_cycle(self) -> float | None:
+        if self.instructions is None or not self.cycles:
+            return None
+
+        return self.instructions / self.cycles
+
+
+HARDWARE_COUNTER_COLUMNS = [f.name for f in fields(HardwareCounters) if f.name in COUNTER_EVENTS]
+
+
+def _parse_perf_stat(output: str) -> tuple[dict[str, int | None], dict[str, float]]:
+    """
+    Counts by event of `perf stat -x,` output, summed over the core types of
+    hybrid CPUs, and None for events that were not counted; and the
+    percentage of the run every counted event was counting for. On hybrid
+    CPUs that is the time counted on any core type over the time enabled.
+    """
+    counts, running, enabled = {}, {}, {}
+    for line in output.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        # value,unit,event,time counted (ns),percentage of the time enabled,...
+        value, _, event, run_time, percent, *_ = line.split(",") + ["", "", "", ""]
+        if m := PMU_EVENT_PATTERN.match(event):
+            event = m.group("event")
+        if value in UNCOUNTED_VALUES:
+            counts.setdefault(event, None)
+            continue
+        try:
+            counts[event] = (counts.get(event) or 0) + int(float(value))
+        except ValueError:
+            continue
+        try:
+            if float(percent) > 0:
+                running[event] = running.get(event, 0) + float(run_time)
+                enabled[event] = max(enabled.get(event, 0), float(run_time) * 100 / float(percent))
+        except ValueError:
+            pass
+
+    return counts, {event: min(100.0, 100 * running[event] / enabled[event]) for event in running if enabled[event] > 0}
+
+
+def _event_readable(perf: str, event: str) -> bool:
+    try:
+        process = subprocess.run([perf, "stat", "-x", ",", "-e", event, "--", "true"], capture_output=True, text=True, timeout=PROBE_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+    return process.returncode == 0 and _parse_perf_stat(process.stderr)[0].get(event) is not None
+
+
+@cache
+def available_counter_events(perf: str = "perf") -> dict[str, str]:
+    """
+    The perf event every counter is read with on this machine. Counters
+    with no readable event are left out, trying the user-space-only variant
+    of an event where kernel events are restricted (perf_event_paranoid).
+    The result is cached, so the machine is probed and warned about once.
+    """
+    perf_path = shutil.which(perf)
+    if perf_path is None:
+        print(f"{C.WARNING}perf not found, hardware counters will not be collected{C.ENDC}")
+        return {}
+
+    events = {}
+    for counter, candidates in COUNTER_EVENTS.items():
+        event = next((event for candidate in candidates for event in (candidate, f"{candidate}:u") if _event_readable(perf_path, event)), None)
+        if event is not None:
+            events[counter] = event
+
+    if missing := [counter for counter in COUNTER_EVENTS if counter not in events]:
+        print(f"{C.WARNING}Cannot read hardware counter(s) {', '.join(missing)} with perf, see /proc/sys/kernel/perf_event_paranoid{C.ENDC}")
+
+    return events
+
+
+class PerfStat:
+    """
+    Counts hardware events of a command by running it under `perf stat`,
+    which writes the counts to a file so the output of the command is left
+    as is.
+    """
+
+    def __init__(self, events: dict[str, str], output_path: Path, perf: str = "perf"):
+        self.events = events
+        self.output_path = output_path
+        self.perf = perf
+
+    @classmethod
+    def detect(cls, output_path: Path, perf: str = "perf") -> "PerfStat | None":
+        """A PerfStat for the counters this machine can read, if it can read any."""
+        events = available_counter_events(perf)
+        return cls(events, output_path, perf) if events else None
+
+    def wrap(self, command: list[str]) -> list[str]:
+        return [self.perf, "stat", "-x", ",", "-o", self.output_path.as_posix(), "-e", ",".join(self.events.values()), "--", *command]
+
+    def read(self) -> HardwareCounters:
+        counts, enabled_percent = _parse_perf_stat(self.output_path.read_text())
+        return HardwareCounters(**{counter: counts.get(event) for counter, event in self.events.items()},
+                                enabled_percent={counter: enabled_percent[event] for counter, event in self.events.items() if event in enabled_percent})
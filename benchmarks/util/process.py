@@ -0,0 +1,189 @@
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable
+
+from util.resources import ProcStatusSampler, ResourceUsage, StatusSample
+from util.system import format_cpu_list
+
+KILL_GRACE_PERIOD = 10.0
+
+
+class ProcessTimeoutError(RuntimeError):
+    pass
+
+
+class LineMatcher:
+    """
+    Collects the groups of every match of a regex in a stream of output
+    lines. The regex may span several lines (joined by newlines); only the
+    last few lines are kept, and only matches that end on the newest line are
+    considered, so every match is found exactly once.
+    """
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.regex = re.compile(f"(?:{pattern})[^\\n]*\\n?\\Z", flags)
+        self.window: deque[str] = deque(maxlen=pattern.count("\\n") + 1)
+        self.matches: list[tuple[str, ...]] = []
+
+    def feed(self, line: str) -> None:
+        self.window.append(line if line.endswith("\n") else line + "\n")
+        if m := self.regex.search("".join(self.window)):
+            self.matches.append(m.groups())
+
+
+@dataclass
+class ProcessResult:
+    returncode: int
+    wall_time_seconds: float
+    resource_usage: ResourceUsage | None = field(default=None)
+    status_samples: list[StatusSample] = field(default_factory=list)
+
+
+def _signal_process_group(pid: int, sig: signal.Signals) -> None:
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def _wait(process: subprocess.Popen) -> tuple[int, ResourceUsage | None]:
+    """
+    Reap the process with wait4(2), which also reports the resource usage of
+    the process and its reaped descendants.
+    """
+    while True:
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            return process.wait(), None
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, ResourceUsage.from_rusage(usage)
+
+
+def pin_command(command: list[str], cpus: Iterable[int], numa_node: int | None = None) -> tuple[list[str], bool]:
+    """
+    Prefix the command so that it runs on the given CPUs (and allocates its
+    memory on the given NUMA node) with numactl, or taskset if numactl is
+    not installed. The second value is False if neither is available and
+    the affinity has to be set after starting the process instead.
+    """
+    cpu_list = format_cpu_list(cpus)
+    if shutil.which("numactl"):
+        return ["numactl", f"--physcpubind={cpu_list}", *([f"--membind={numa_node}"] if numa_node is not None else []), *command], True
+    if shutil.which("taskset"):
+        return ["taskset", "--cpu-list", cpu_list, *command], True
+
+    return command, False
+
+
+def run_streaming(
+    command: list[str],
+    log_path: Path | None = None,
+    cwd: Path | None = None,
+    timeout: float | None = None,
+    on_line: Callable[[str], None] | None = None,
+    sample_interval: float | None = None,
+    cpus: Iterable[int] | None = None,
+    numa_node: int | None = None,
+    on_sample: Callable[[StatusSample], None] | None = None,
+) -> ProcessResult:
+    """
+    Run a command with its stdout and stderr appended to `log_path` line by
+    line as they are produced, and passed to `on_line`, without keeping the
+    output in memory. The command runs in its own process group, which is
+    killed as a whole when it runs for longer than `timeout` seconds or when
+    the caller is interrupted. With a `sample_interval`, the memory of the
+    process tree is also sampled from /proc while it runs, and every sample
+    passed to `on_sample`. With `cpus`, the
+    command is pinned to those CPUs (see `pin_command`).
+    """
+    pinned = True
+    if cpus is not None:
+        cpus = list(cpus)
+        command, pinned = pin_command(command, cpus, numa_node)
+
+    log_file = open(log_path, "a") if log_path is not None else None
+    try:
+        if log_file is not None:
+            log_file.write(f"$ {' '.join(command)}\n")
+            log_file.flush()
+
+        start_time = time.monotonic()
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            cwd=Path(cwd).as_posix() if cwd is not None else None,
+            text=True,
+            errors="replace",
+            start_new_session=True,
+        )
+        if not pinned:
+            os.sched_setaffinity(process.pid, cpus)
+        sampler = ProcStatusSampler(process.pid, sample_interval, on_sample).start() if sample_interval is not None else None
+
+        timed_out, reaped = threading.Event(), threading.Event()
+
+        def on_timeout() -> None:
+            # Only signals the process group: reaping is left to the caller's
+            # thread so that it gets the resource usage.
+            timed_out.set()
+            _signal_process_group(process.pid, signal.SIGTERM)
+            if not reaped.wait(KILL_GRACE_PERIOD):
+                _signal_process_group(process.pid, signal.SIGKILL)
+
+        timer = threading.Timer(timeout, on_timeout) if timeout is not None else None
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+
+        try:
+            for line in process.stdout:
+                if log_file is not None:
+                    log_file.write(line)
+                if on_line is not None:
+                    on_line(line)
+            if sampler is not None:
+                sampler.stop()
+            returncode, resource_usage = _wait(process)
+            reaped.set()
+        except BaseException:
+            _signal_process_group(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=KILL_GRACE_PERIOD)
+            except subprocess.TimeoutExpired:
+                _signal_process_group(process.pid, signal.SIGKILL)
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if sampler is not None:
+                sampler.stop()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise ProcessTimeoutError(f"Command timed out after {timeout:.0f}s and was killed: {' '.join(command)}")
+
+        if resource_usage is not None and sampler is not None:
+            resource_usage.peak_sampled_rss_bytes = sampler.peak_rss_bytes
+
+        return ProcessResult(
+            returncode=returncode,
+            wall_time_seconds=time.monotonic() - start_time,
+            resource_usage=resource_usage,
+            status_samples=sampler.samples if sampler is not None else [],
+        )
+    finally:
+        if log_file is not None:
+            log_file.close()
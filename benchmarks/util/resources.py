@@ -0,0 +1,127 @@
+import resource
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+
+@dataclass
+class ResourceUsage:
+    """
+    Resource usage of a process and all of its descendants that were waited
+    for, as reported by wait4(2). `max_rss_bytes` is the peak resident set
+    of the largest single process in the tree.
+    """
+    max_rss_bytes: int
+    user_time_seconds: float
+    system_time_seconds: float
+    major_faults: int
+    minor_faults: int
+    voluntary_context_switches: int
+    involuntary_context_switches: int
+    peak_sampled_rss_bytes: int | None = field(default=None)
+
+    @property
+    def cpu_time_seconds(self) -> float:
+        return self.user_time_seconds + self.system_time_seconds
+
+    @classmethod
+    def from_rusage(cls, usage: resource.struct_rusage) -> "ResourceUsage":
+        return cls(
+            max_rss_bytes=usage.ru_maxrss * 1024,
+            user_time_seconds=usage.ru_utime,
+            system_time_seconds=usage.ru_stime,
+            major_faults=usage.ru_majflt,
+            minor_faults=usage.ru_minflt,
+            voluntary_context_switches=usage.ru_nvcsw,
+            involuntary_context_switches=usage.ru_nivcsw,
+        )
+
+
+@dataclass
+class StatusSample:
+    elapsed_seconds: float
+    rss_bytes: int
+    threads: int
+    processes: int
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        for children_file in Path(f"/proc/{current}/task").glob("*/children"):
+            try:
+                stack.extend(int(child) for child in children_file.read_text().split())
+            except OSError:
+                pass
+
+    return pids
+
+
+def _read_status(pid: int) -> dict[str, str]:
+    status = {}
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.strip()
+
+    return status
+
+
+class ProcStatusSampler:
+    """
+    Samples the total resident set size and thread count of a process tree
+    from /proc/<pid>/status every `interval` seconds on a background thread,
+    until stopped, passing every sample to `on_sample` as it is taken.
+    """
+
+    def __init__(self, pid: int, interval: float, on_sample: Callable[[StatusSample], None] | None = None):
+        self.pid = pid
+        self.interval = interval
+        self.on_sample = on_sample
+        self.samples: list[StatusSample] = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "ProcStatusSampler":
+        self._start_time = time.monotonic()
+        self._thread.start()
+        return self
+
+    def stop(self) -> list[StatusSample]:
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+    @property
+    def peak_rss_bytes(self) -> int | None:
+        return max((s.rss_bytes for s in self.samples), default=None)
+
+    def sample(self) -> StatusSample | None:
+        rss_bytes = threads = processes = 0
+        for pid in _process_tree(self.pid):
+            try:
+                status = _read_status(pid)
+            except OSError:
+                continue
+            # Zombies and kernel threads have no VmRSS
+            rss_bytes += int(status.get("VmRSS", "0 kB").split()[0]) * 1024
+            threads += int(status.get("Threads", "0"))
+            processes += 1
+
+        if processes == 0:
+            return None
+
+        return StatusSample(time.monotonic() - self._start_time, rss_bytes, threads, processes)
+
+    def _run(self) -> None:
+        while True:
+            if (sample := self.sample()) is not None:
+                self.samples.append(sample)
+                if self.on_sample is not None:
+                    self.on_sample(sample)
+            if self._stopped.wait(self.interval):
+                return
@@ -0,0 +1,111 @@
+import math
+from statistics import NormalDist, mean, median, stdev
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Quantile of Student's t distribution. Exact for one and two degrees of
+    freedom, and a Cornish-Fisher expansion around the normal quantile
+    (accurate to about 1e-3 from three degrees of freedom) otherwise.
+    """
+    if not 0 < p < 1:
+        raise ValueError(f"Probability must be in (0, 1), got {p}")
+    if df < 1:
+        raise ValueError(f"Degrees of freedom must be at least 1, got {df}")
+
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) * math.sqrt(2 / (4 * p * (1 - p)))
+
+    z = NormalDist().inv_cdf(p)
+    return (
+        z
+        + (z ** 3 + z) / (4 * df)
+        + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+        + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+        + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4)
+    )
+
+
+def t_two_sided_p(t: float, df: int) -> float:
+    """
+    Probability that Student's t with `df` degrees of freedom is at least
+    |t| away from zero, exact for integer degrees of freedom (Abramowitz
+    and Stegun 26.7.3 and 26.7.4).
+    """
+    if df < 1:
+        raise ValueError(f"Degrees of freedom must be at least 1, got {df}")
+
+    theta = math.atan(abs(t) / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    if df % 2 == 1:
+        term, total = 1.0, 1.0 if df > 1 else 0.0
+        for k in range(3, df - 1, 2):
+            term *= (k - 1) / k * cos2
+            total += term
+        inside = 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total)
+    else:
+        term, total = 1.0, 1.0
+        for k in range(2, df - 1, 2):
+            term *= (k - 1) / k * cos2
+            total += term
+        inside = math.sin(theta) * total
+
+    return min(1.0, max(0.0, 1 - inside))
+
+
+def mean_confidence_interval(values: list[float], confidence: float = 0.95) -> tuple[float, float]:
+    """
+    Mean of the values and the half-width of its two-sided Student's t
+    confidence interval (infinite for fewer than two values).
+    """
+    if not values:
+        raise ValueError("Cannot compute a confidence interval of no values")
+    if len(values) < 2:
+        return values[0], math.inf
+
+    half_width = t_quantile(0.5 + confidence / 2, len(values) - 1) * stdev(values) / math.sqrt(len(values))
+    return mean(values), half_width
+
+
+def count_leading_outliers(values: list[float], threshold: float = 3.5, max_outliers: int | None = None) -> int:
+    """
+    Number of leading values that are outliers with respect to the values
+    after them, by modified z-score (deviation from the median in units of
+    1.4826 times the median absolute deviation).
+    """
+    n = 0
+    limit = len(values) - 2 if max_outliers is None else min(max_outliers, len(values) - 2)
+
+    while n < limit:
+        rest = values[n + 1:]
+        center = median(rest)
+        mad = 1.4826 * median(abs(v - center) for v in rest)
+        if mad == 0:
+            if values[n] == center:
+                break
+        elif abs(values[n] - center) / mad <= threshold:
+            break
+        n += 1
+
+    return n
+
+
+def steady_state_start(values: list[float], window: int = 3, threshold: float = 0.02) -> int | None:
+    """
+    Index of the first iteration of a run in steady state: the start of the
+    first `window` consecutive iterations whose coefficient of variation is
+    at most `threshold` (Georges et al., 2007). None if the iterations never
+    settle or there are fewer than `window` of them.
+    """
+    if window < 2:
+        raise ValueError(f"Steady-state window must be at least 2 iterations, got {window}")
+
+    for start in range(len(values) - window + 1):
+        iterations = values[start:start + window]
+        center = mean(iterations)
+        if center and stdev(iterations) / abs(center) <= threshold:
+            return start
+
+    return None
@@ -0,0 +1,107 @@
+import os
+import platform
+from pathlib import Path
+
+MEMINFO_PATH = Path("/proc/meminfo")
+CPUINFO_PATH = Path("/proc/cpuinfo")
+
+
+def _read_meminfo_field(name: str) -> int | None:
+    try:
+        with open(MEMINFO_PATH, "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == name:
+                    return int(value.split()[0]) * 1024
+    except OSError:
+        pass
+
+    return None
+
+
+def total_memory_bytes() -> int:
+    if (total := _read_meminfo_field("MemTotal")) is not None:
+        return total
+
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def available_memory_bytes() -> int:
+    if (available := _read_meminfo_field("MemAvailable")) is not None:
+        return available
+
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def cpu_model() -> str:
+    try:
+        with open(CPUINFO_PATH, "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() == "model name":
+                    return value.strip()
+    except OSError:
+        pass
+
+    return platform.processor() or platform.machine()
+
+
+SYSFS_CPU_PATH = Path("/sys/devices/system/cpu")
+SYSFS_NODE_PATH = Path("/sys/devices/system/node")
+
+
+def parse_cpu_list(text: str) -> list[int]:
+    """
+    Parse a kernel CPU list such as "0-3,8,10-11".
+    """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+
+    return cpus
+
+
+def format_cpu_list(cpus) -> str:
+    return ",".join(str(cpu) for cpu in sorted(cpus))
+
+
+def _cpu_nodes() -> dict[int, int]:
+    nodes = {}
+    for node_dir in SYSFS_NODE_PATH.glob("node[0-9]*"):
+        try:
+            for cpu in parse_cpu_list((node_dir / "cpulist").read_text()):
+                nodes[cpu] = int(node_dir.name[len("node"):])
+        except OSError:
+            pass
+
+    return nodes
+
+
+def physical_cores() -> list[tuple[int | None, tuple[int, ...]]]:
+    """
+    The physical cores this process may run on, as their NUMA node (None if
+    unknown) and the logical CPUs (SMT siblings) of the core, sorted by node
+    and CPU number.
+    """
+    allowed = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set(range(os.cpu_count() or 1))
+    nodes = _cpu_nodes()
+
+    cores = set()
+    for cpu in allowed:
+        try:
+            siblings = parse_cpu_list((SYSFS_CPU_PATH / f"cpu{cpu}" / "topology" / "thread_siblings_list").read_text())
+        except OSError:
+            siblings = [cpu]
+        cores.add((nodes.get(cpu), tuple(sibling for sibling in siblings if sibling in allowed)))
+
+    return sorted(cores, key=lambda core: (core[0] if core[0] is not None else -1, core[1]))
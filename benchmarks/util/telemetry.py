@@ -0,0 +1,186 @@
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TextIO
+
+METRIC_PREFIX = "campaign_"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Metrics served on the endpoint: Prometheus type and help text
+METRICS = {
+    "jobs": ("gauge", "Jobs in the campaign that were not finished before it started"),
+    "jobs_done_total": ("counter", "Jobs that finished, by status"),
+    "builds_done_total": ("counter", "Build tasks that finished, by status"),
+    "runs_total": ("counter", "Benchmark runs measured"),
+    "errors_total": ("counter", "Failed builds and measurements"),
+    "eta_seconds": ("gauge", "Estimated wall time until the campaign finishes"),
+    "build_rss_bytes": ("gauge", "Resident set size of the process tree of every running build"),
+    "last_result": ("gauge", "Result of the last run of every job, in the unit of its benchmark"),
+    "last_result_vs_baseline": ("gauge", "Result of the last run of every job relative to the mean result of its baseline job"),
+}
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 5.0
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    """A sample value at full precision, spelled as Prometheus expects."""
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+class Telemetry:
+    """
+    Structured progress of a campaign, for watching unattended campaigns:
+    every event is appended to `events_path` as one JSON object per line,
+    and the metrics derived from the events are served in the Prometheus
+    text format on `metrics_address` (at any path, usually /metrics). Both
+    are optional; a Telemetry with neither drops everything.
+    """
+
+    def __init__(self, events_path: Path | None = None, metrics_address: tuple[str, int] | None = None, campaign_id: int | None = None,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        self.events_path = events_path
+        self.metrics_address = metrics_address
+        self.campaign_id = campaign_id
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._events_file: TextIO | None = None
+        self._server: ThreadingHTTPServer | None = None
+        self._values: dict[str, dict[tuple[tuple[str, str], ...], float]] = {name: {} for name in METRICS}
+
+    @property
+    def enabled(self) -> bool:
+        return self._events_file is not None or self._server is not None
+
+    @property
+    def serves_metrics(self) -> bool:
+        return self._server is not None
+
+    @property
+    def address(self) -> tuple[str, int] | None:
+        """Address the metrics are served on, with the port bound if 0 was asked for."""
+        return self._server.server_address[:2] if self._server is not None else None
+
+    def start(self) -> "Telemetry":
+        if self.events_path is not None:
+            self.events_path.parent.mkdir(parents=True, exist_ok=True)
+            self._events_file = open(self.events_path, "a")
+
+        if self.metrics_address is not None:
+            self._server = ThreadingHTTPServer(self.metrics_address, _metrics_handler(self))
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+        return self
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.close()
+                self._events_file = None
+
+    def __enter__(self) -> "Telemetry":
+        set_telemetry(self.start())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        set_telemetry(None)
+        self.close()
+
+    def emit(self, event: str, **fields) -> None:
+        """Append an event, with the time and the campaign, to the event stream."""
+        if self._events_file is None:
+            return
+
+        record = {"timestamp": datetime.now(timezone.utc).isoformat(), "event": event}
+        if self.campaign_id is not None:
+            record["campaign_id"] = self.campaign_id
+        line = json.dumps({**record, **fields}, default=str)
+
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.write(line + "\n")
+                self._events_file.flush()
+
+    def _key(self, name: str, labels: dict[str, object]) -> tuple[tuple[str, str], ...]:
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric '{name}', known metrics: {', '.join(METRICS)}")
+        return tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[name][key] = value
+
+    def remove_gauge(self, name: str, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[name].pop(key, None)
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[name][key] = self._values[name].get(key, 0) + amount
+
+    def render_metrics(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, description) in METRICS.items():
+                lines += [f"# HELP {METRIC_PREFIX}{name} {description}", f"# TYPE {METRIC_PREFIX}{name} {kind}"]
+                lines += [f"{METRIC_PREFIX}{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self._values[name].items()]
+
+        return "\n".join(lines) + "\n"
+
+
+def _metrics_handler(telemetry: Telemetry) -> type[BaseHTTPRequestHandler]:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = telemetry.render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # Scrapes would otherwise be logged to stderr between the progress output
+            pass
+
+    return MetricsHandler
+
+
+_disabled = Telemetry()
+_current = _disabled
+
+
+def get_telemetry() -> Telemetry:
+    """
+    The telemetry of the running campaign, for code that runs deep inside
+    jobs (builds, runs) to report to; one that drops everything otherwise.
+    """
+    return _current
+
+
+def set_telemetry(telemetry: Telemetry | None) -> None:
+    global _current
+    _current = telemetry if telemetry is not None else _disabled